@@ -4,6 +4,18 @@ from typing import Optional
 class Settings(BaseSettings):
     # Database Configuration (supports both SQLite and PostgreSQL/Supabase)
     DATABASE_URL: str = "sqlite:///./campuseats.db"
+    # Async engine for routes using get_async_db (defaults to DATABASE_URL with aiosqlite/asyncpg)
+    ASYNC_DATABASE_URL: Optional[str] = None
+    # Read replica for read-only endpoints (stall/menu/review listings, admin analytics); unset = primary
+    DATABASE_READ_URL: Optional[str] = None
+
+    # Connection pool (per engine, per worker process)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30  # seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = 300  # seconds; reconnect before the Supabase pooler drops idle connections
+    DB_POOL_PRE_PING: bool = True  # test connections on checkout, replacing ones dropped while idle
+    DB_STATEMENT_TIMEOUT_MS: int = 0  # PostgreSQL statement_timeout, set per transaction; 0 = no limit
 
     # Supabase Configuration (optional, for future Supabase Auth integration)
     SUPABASE_URL: Optional[str] = None
@@ -23,6 +35,8 @@ class Settings(BaseSettings):
 
     # Environment
     ENVIRONMENT: str = "development"  # development, staging, production
+    # Timezone stall opening hours are written in
+    CAMPUS_TIMEZONE: str = "Asia/Singapore"
 
     # Email Configuration
     EMAIL_TESTING_MODE: bool = True  # Set to False to send real emails
@@ -36,6 +50,26 @@ class Settings(BaseSettings):
     SMTP_FROM_NAME: str = "CampusEats"
     APP_URL: str = "http://localhost:5173"
 
+    # Idempotency-Key handling for POST /api/orders/
+    IDEMPOTENCY_BACKEND: str = "memory"  # memory (single worker) or database (shared across workers)
+    IDEMPOTENCY_TTL_SECONDS: int = 86400
+    IDEMPOTENCY_LOCK_SECONDS: int = 60  # how long an unfinished request holds its key
+    IDEMPOTENCY_MAX_KEYS: int = 10000  # memory backend only
+
+    # In-process queue index: seconds between checks against queue_entries, 0 = never
+    QUEUE_INDEX_RECONCILE_SECONDS: int = 60
+    # Minutes an order may await payment confirmation before it is cancelled, 0 = never
+    PENDING_PAYMENT_TIMEOUT_MINUTES: int = 30
+
+    # ETA model: weight of each newly observed prep time in the per-stall/per-item moving averages
+    PREP_TIME_EWMA_ALPHA: float = 0.2
+    # Length of the pickup slots orders are booked into by their pickup window start
+    PICKUP_SLOT_MINUTES: int = 15
+
+    # Live update events (SSE order board, queue positions)
+    EVENT_BROKER: str = "memory"  # memory (single worker) or postgres (LISTEN/NOTIFY, shared across workers)
+    EVENT_BROKER_URL: Optional[str] = None  # direct PostgreSQL connection for LISTEN; defaults to DATABASE_URL
+
     class Config:
         env_file = ".env"
         case_sensitive = True
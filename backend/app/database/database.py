@@ -1,14 +1,60 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.config import settings
+from app.database.pool import TimedQueuePool, TimedAsyncQueuePool
 
 SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False} if SQLALCHEMY_DATABASE_URL.startswith("sqlite") else {}
-)
+def is_in_memory_sqlite(url: str) -> bool:
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:")
+
+def pool_options(url: str, poolclass) -> dict:
+    """
+    Pool class and sizing shared by the sync and async engines (see
+    Settings.DB_POOL_*). In-memory SQLite keeps SQLAlchemy's default pool:
+    every new connection to it would be a separate, empty database.
+    """
+    if is_in_memory_sqlite(url):
+        return {}
+    return {
+        "poolclass": poolclass,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+def sync_connect_args(url: str) -> dict:
+    if url.startswith("sqlite"):
+        return {"check_same_thread": False}
+    return {}
+
+def apply_statement_timeout(engine: Engine) -> None:
+    """
+    Cap every PostgreSQL statement at DB_STATEMENT_TIMEOUT_MS.
+
+    Set with SET LOCAL at the start of each transaction rather than as a
+    connection startup parameter: the Supabase transaction pooler (PgBouncer,
+    port 6543) drops startup parameters, and session-level SETs would leak to
+    whichever client gets the server connection next.
+    """
+    if engine.dialect.name != "postgresql" or not settings.DB_STATEMENT_TIMEOUT_MS:
+        return
+
+    @event.listens_for(engine, "begin")
+    def set_statement_timeout(conn):
+        conn.exec_driver_sql(f"SET LOCAL statement_timeout = {int(settings.DB_STATEMENT_TIMEOUT_MS)}")
+
+def create_sync_engine_for(url: str) -> Engine:
+    sync_engine = create_engine(url, connect_args=sync_connect_args(url), **pool_options(url, TimedQueuePool))
+    apply_statement_timeout(sync_engine)
+    return sync_engine
+
+engine = create_sync_engine_for(SQLALCHEMY_DATABASE_URL)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -21,3 +67,99 @@ def get_db():
     finally:
         db.close()
 
+# Read replica for read-only endpoints; falls back to the primary when DATABASE_READ_URL is unset
+SQLALCHEMY_READ_DATABASE_URL = settings.DATABASE_READ_URL
+
+if SQLALCHEMY_READ_DATABASE_URL:
+    read_engine = create_sync_engine_for(SQLALCHEMY_READ_DATABASE_URL)
+else:
+    read_engine = engine
+
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+def get_read_db():
+    """Session for endpoints that only read and can tolerate replica lag"""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Async drivers for the same database, used by routes that depend on get_async_db
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
+
+def to_async_url(url: str) -> str:
+    """
+    Swap the driver of a sync database URL for its async counterpart
+
+    Example:
+        >>> to_async_url("postgresql://user:pw@host:5432/postgres")
+        'postgresql+asyncpg://user:pw@host:5432/postgres'
+    """
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for '{backend}' databases")
+    if backend != "sqlite" and "sslmode" in parsed.query:
+        # asyncpg spells libpq's sslmode as ssl
+        parsed = parsed.difference_update_query(["sslmode"]).update_query_dict({"ssl": parsed.query["sslmode"]})
+    return parsed.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+ASYNC_SQLALCHEMY_DATABASE_URL = settings.ASYNC_DATABASE_URL or to_async_url(SQLALCHEMY_DATABASE_URL)
+ASYNC_SQLALCHEMY_READ_DATABASE_URL = (
+    to_async_url(SQLALCHEMY_READ_DATABASE_URL) if SQLALCHEMY_READ_DATABASE_URL else None
+)
+
+# Built on first use so the sync app still starts without aiosqlite/asyncpg installed
+async_engine = None
+AsyncSessionLocal = None
+async_read_engine = None
+AsyncReadSessionLocal = None
+
+def create_async_engine_for(url: str):
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    connect_args = {}
+    if url.startswith("postgresql+asyncpg"):
+        # The Supabase pooler (PgBouncer, transaction mode) can't keep prepared statements
+        connect_args = {"statement_cache_size": 0}
+
+    async_db_engine = create_async_engine(url, connect_args=connect_args, **pool_options(url, TimedAsyncQueuePool))
+    apply_statement_timeout(async_db_engine.sync_engine)
+    return async_db_engine
+
+def get_async_engine():
+    global async_engine, AsyncSessionLocal, async_read_engine, AsyncReadSessionLocal
+    if async_engine is None:
+        from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+        async_engine = create_async_engine_for(ASYNC_SQLALCHEMY_DATABASE_URL)
+        if ASYNC_SQLALCHEMY_READ_DATABASE_URL:
+            async_read_engine = create_async_engine_for(ASYNC_SQLALCHEMY_READ_DATABASE_URL)
+        else:
+            async_read_engine = async_engine
+        # expire_on_commit=False: attributes can't be lazily refreshed outside an await
+        AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+        AsyncReadSessionLocal = async_sessionmaker(async_read_engine, class_=AsyncSession, expire_on_commit=False)
+    return async_engine
+
+async def get_async_db():
+    get_async_engine()
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_async_read_db():
+    """Async counterpart of get_read_db"""
+    get_async_engine()
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
+async def dispose_async_engine():
+    if async_engine is not None:
+        await async_engine.dispose()
+    if async_read_engine is not None and async_read_engine is not async_engine:
+        await async_read_engine.dispose()
@@ -3,13 +3,21 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
 from contextlib import asynccontextmanager
+import asyncio
 import uvicorn
 import logging
 import traceback
 
-from app.database.database import Base, engine
+from app.database.database import Base, engine, SessionLocal, dispose_async_engine
 from app.routes import auth, auth_otp, stalls, orders, menu, queue, users, admin, reviews
 from app.config import settings
+from app.services.spatial_index import stall_spatial_index
+from app.services.stall_events import stall_event_hub
+from app.services.queue_index import stall_queue_index
+from app.services.prep_times import prep_time_model
+from app.services.menu_search import menu_search_index
+from app.services.admission import NEXT_PICKUP_WINDOW_END_HEADER, NEXT_PICKUP_WINDOW_START_HEADER
+from app.utils.pagination import NEXT_CURSOR_HEADER
 
 # Configure logging
 logging.basicConfig(
@@ -21,11 +29,37 @@ logger = logging.getLogger(__name__)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Import models to ensure they're registered
-    from app.models import user, stall, menu, order, queue, otp, review
+    from app.models import user, stall, menu, order, queue, otp, review, idempotency
     # Create tables
     Base.metadata.create_all(bind=engine)
+    # Warm in-process indexes
+    db = SessionLocal()
+    try:
+        stall_spatial_index.rebuild(db)
+        stall_queue_index.rebuild(db)
+        prep_time_model.rebuild(db)
+        menu_search_index.rebuild(db)
+    finally:
+        db.close()
+    stall_event_hub.start()
+    reconcile_task = None
+    if settings.QUEUE_INDEX_RECONCILE_SECONDS > 0:
+        reconcile_task = asyncio.create_task(
+            stall_queue_index.reconcile_periodically(SessionLocal, settings.QUEUE_INDEX_RECONCILE_SECONDS)
+        )
+    expiry_task = None
+    if settings.PENDING_PAYMENT_TIMEOUT_MINUTES > 0:
+        expiry_task = asyncio.create_task(
+            orders.expire_unpaid_orders_periodically(SessionLocal, settings.PENDING_PAYMENT_TIMEOUT_MINUTES)
+        )
     logger.info(f"CampusEats API started in {settings.ENVIRONMENT} mode")
     yield
+    if reconcile_task is not None:
+        reconcile_task.cancel()
+    if expiry_task is not None:
+        expiry_task.cancel()
+    stall_event_hub.stop()
+    await dispose_async_engine()
     logger.info("CampusEats API shutting down")
 
 app = FastAPI(
@@ -44,6 +78,10 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[
+        NEXT_CURSOR_HEADER, "Idempotent-Replayed", "Retry-After", "ETag",
+        NEXT_PICKUP_WINDOW_START_HEADER, NEXT_PICKUP_WINDOW_END_HEADER
+    ],
 )
 
 # Global exception handlers
@@ -2,7 +2,7 @@ from app.models.user import User
 from app.models.stall import Stall
 from app.models.menu import MenuItem
 from app.models.order import Order, OrderItem
-from app.models.queue import QueueEntry
-from app.models.review import Review
+from app.models.queue import QueueEntry, StallQueueCounter
+from app.models.review import Review, StallRatingTotals
 
-__all__ = ["User", "Stall", "MenuItem", "Order", "OrderItem", "QueueEntry", "Review"]
\ No newline at end of file
+__all__ = ["User", "Stall", "MenuItem", "Order", "OrderItem", "QueueEntry", "StallQueueCounter", "Review", "StallRatingTotals"]
\ No newline at end of file
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text
+from datetime import datetime
+from app.database.database import Base
+
+class IdempotencyRecord(Base):
+    """Stored response for an Idempotency-Key (database idempotency backend)"""
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String, primary_key=True)  # "<user_id>:<Idempotency-Key header>"
+    request_hash = Column(String, nullable=False)
+    status_code = Column(Integer)            # NULL while the first request is in flight
+    locked_until = Column(DateTime)          # Lease on an in-flight reservation; a retry may take it over after
+    response_body = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
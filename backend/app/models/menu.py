@@ -6,7 +6,7 @@ class MenuItem(Base):
     __tablename__ = "menu_items"
 
     id = Column(Integer, primary_key=True, index=True)
-    stall_id = Column(Integer, ForeignKey("stalls.id"), nullable=False)
+    stall_id = Column(Integer, ForeignKey("stalls.id"), nullable=False, index=True)
     name = Column(String, nullable=False)
     price = Column(Float, nullable=False)
     prep_time = Column(Integer, default=10)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Enum, Text
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Enum, Text, Index, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database.database import Base
@@ -17,8 +17,20 @@ class PaymentStatus(enum.Enum):
     CONFIRMED = "confirmed"              # Payment received
     FAILED = "failed"                    # Payment failed
 
+# Predicate of the partial stall orders index on PostgreSQL (orders the stall still has to handle)
+ACTIVE_ORDER_PREDICATE = "status IN ('pending_payment', 'confirmed', 'preparing', 'ready')"
+
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        # Student order listings (newest first)
+        Index("ix_orders_user_created", "user_id", "created_at"),
+        # Stall owner order board filtered by status
+        Index(
+            "ix_orders_stall_status_created", "stall_id", "status", "created_at",
+            postgresql_where=text(ACTIVE_ORDER_PREDICATE)
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
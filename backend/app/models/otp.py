@@ -19,7 +19,7 @@ class OTPVerification(Base):
 
     # OTP metadata
     created_at = Column(DateTime, default=datetime.utcnow)
-    expires_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
     attempts = Column(Integer, default=0)
     is_used = Column(Boolean, default=False)
 
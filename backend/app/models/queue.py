@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, DateTime, Enum
+from sqlalchemy import Column, Integer, ForeignKey, Date, DateTime, Enum, Index, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database.database import Base
@@ -11,18 +11,45 @@ class QueueStatus(enum.Enum):
     COLLECTED = "collected"
     CANCELLED = "cancelled"
 
+# Predicate of the partial queue index on PostgreSQL (entries still on the board)
+ACTIVE_QUEUE_ENTRY_PREDICATE = "status IN ('waiting', 'preparing', 'ready')"
+
 class QueueEntry(Base):
     __tablename__ = "queue_entries"
+    __table_args__ = (
+        # Stall queue board, queue depth and position lookups
+        Index(
+            "ix_queue_entries_stall_status_position", "stall_id", "status", "queue_position",
+            postgresql_where=text(ACTIVE_QUEUE_ENTRY_PREDICATE)
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     stall_id = Column(Integer, ForeignKey("stalls.id"), nullable=False)
     order_id = Column(Integer, ForeignKey("orders.id"), unique=True, nullable=False)
+    # Ticket: the order's daily queue number (see services/queue_numbers.py),
+    # restarting each campus day and never renumbered, so completions and
+    # failed checkouts leave gaps; place in line is derived from
+    # (ready_by, ticket) order (see services/queue_index.py)
     queue_position = Column(Integer, nullable=False)
     estimated_wait_time = Column(Integer)
+    # Expected minutes to prepare this order alone, from the prep time model at checkout
+    prep_minutes = Column(Integer)
+    # Deadline (the order's pickup window start); the prep queue runs earliest deadline first
+    ready_by = Column(DateTime)
     status = Column(Enum(QueueStatus, name='queue_status', values_callable=lambda x: [e.value for e in x]), default=QueueStatus.WAITING)
     joined_at = Column(DateTime, default=datetime.utcnow)
     ready_at = Column(DateTime)
     collected_at = Column(DateTime)
 
     order = relationship("Order", back_populates="queue_entry")
-    stall = relationship("Stall", back_populates="queue_entries")
\ No newline at end of file
+    stall = relationship("Stall", back_populates="queue_entries")
+
+class StallQueueCounter(Base):
+    """Last queue number handed out per stall today, bumped atomically on checkout"""
+    __tablename__ = "stall_queue_counters"
+
+    stall_id = Column(Integer, ForeignKey("stalls.id"), primary_key=True)
+    last_number = Column(Integer, nullable=False, default=0)
+    # Campus service day last_number counts within; numbering restarts at 1 each day
+    day = Column(Date)
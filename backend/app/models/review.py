@@ -1,10 +1,14 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Text
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Text, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database.database import Base
 
 class Review(Base):
     __tablename__ = "reviews"
+    __table_args__ = (
+        # Stall review listings (newest first)
+        Index("ix_reviews_stall_created", "stall_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -19,3 +23,17 @@ class Review(Base):
     user = relationship("User", back_populates="reviews")
     stall = relationship("Stall", back_populates="reviews")
     order = relationship("Order", back_populates="review", uselist=False)
+
+class StallRatingTotals(Base):
+    """Running review aggregates per stall, kept in step with every review write"""
+    __tablename__ = "stall_rating_stats"
+
+    stall_id = Column(Integer, ForeignKey("stalls.id"), primary_key=True)
+    review_count = Column(Integer, nullable=False, default=0)
+    rating_sum = Column(Float, nullable=False, default=0.0)
+    # Histogram of ratings rounded to whole stars
+    stars_1 = Column(Integer, nullable=False, default=0)
+    stars_2 = Column(Integer, nullable=False, default=0)
+    stars_3 = Column(Integer, nullable=False, default=0)
+    stars_4 = Column(Integer, nullable=False, default=0)
+    stars_5 = Column(Integer, nullable=False, default=0)
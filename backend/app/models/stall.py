@@ -1,9 +1,13 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Float, Time
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Float, Time, Index
 from sqlalchemy.orm import relationship
 from app.database.database import Base
 
 class Stall(Base):
     __tablename__ = "stalls"
+    __table_args__ = (
+        # Bounding-box prefilter for /api/stalls/nearby?radius_km=
+        Index("ix_stalls_latitude_longitude", "latitude", "longitude"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
@@ -28,4 +32,5 @@ class Stall(Base):
     menu_items = relationship("MenuItem", back_populates="stall", cascade="all, delete-orphan")
     orders = relationship("Order", back_populates="stall")
     queue_entries = relationship("QueueEntry", back_populates="stall")
-    reviews = relationship("Review", back_populates="stall", cascade="all, delete-orphan")
\ No newline at end of file
+    reviews = relationship("Review", back_populates="stall", cascade="all, delete-orphan")
+    rating_totals = relationship("StallRatingTotals", uselist=False, cascade="all, delete-orphan")
\ No newline at end of file
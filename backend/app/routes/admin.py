@@ -3,22 +3,30 @@ from sqlalchemy.orm import Session
 from sqlalchemy import func, and_
 from typing import List, Optional
 from datetime import datetime, date
-from app.database.database import get_db
+from app.database import database
+from app.database.database import get_db, get_read_db
+from app.database.pool import pool_status
 from app.models.user import User, UserRole
 from app.models.stall import Stall
 from app.models.menu import MenuItem
 from app.models.order import Order, OrderItem, OrderStatus
-from app.models.queue import QueueEntry, QueueStatus
 from app.schemas.admin import (
     UserUpdate, StallCreate, StallUpdate, MenuItemCreate, MenuItemUpdate,
     OrderStatusUpdate, UserListResponse, StallListResponse, MenuItemResponse,
     OrderListResponse, AnalyticsResponse, DashboardStats
 )
 from app.routes.auth import get_current_user, get_password_hash
+from app.routes.orders import set_order_status
+from app.services.queue_events import remove_from_queue
+from app.services.queue_index import stall_queue_index
+from app.services.menu_cache import menu_cache
+from app.services.menu_search import menu_search_index
+from app.services.prep_times import prep_time_model
+from app.services.spatial_index import stall_spatial_index
 
 router = APIRouter()
 
-async def get_admin_user(current_user: User = Depends(get_current_user)):
+def get_admin_user(current_user: User = Depends(get_current_user)):
     if current_user.role != UserRole.ADMIN:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -27,7 +35,7 @@ async def get_admin_user(current_user: User = Depends(get_current_user)):
     return current_user
 
 @router.get("/users", response_model=List[UserListResponse])
-async def get_all_users(
+def get_all_users(
     skip: int = 0,
     limit: int = 100,
     role: Optional[str] = None,
@@ -46,7 +54,7 @@ async def get_all_users(
     return users
 
 @router.get("/users/{user_id}", response_model=UserListResponse)
-async def get_user(
+def get_user(
     user_id: int,
     admin_user: User = Depends(get_admin_user),
     db: Session = Depends(get_db)
@@ -57,7 +65,7 @@ async def get_user(
     return user
 
 @router.put("/users/{user_id}", response_model=UserListResponse)
-async def update_user(
+def update_user(
     user_id: int,
     user_update: UserUpdate,
     admin_user: User = Depends(get_admin_user),
@@ -81,7 +89,7 @@ async def update_user(
     return db_user
 
 @router.delete("/users/{user_id}")
-async def delete_user(
+def delete_user(
     user_id: int,
     admin_user: User = Depends(get_admin_user),
     db: Session = Depends(get_db)
@@ -98,7 +106,7 @@ async def delete_user(
     return {"message": "User deleted successfully"}
 
 @router.get("/stalls", response_model=List[StallListResponse])
-async def get_all_stalls(
+def get_all_stalls(
     skip: int = 0,
     limit: int = 100,
     admin_user: User = Depends(get_admin_user),
@@ -108,7 +116,7 @@ async def get_all_stalls(
     return stalls
 
 @router.post("/stalls", response_model=StallListResponse)
-async def create_stall(
+def create_stall(
     stall: StallCreate,
     admin_user: User = Depends(get_admin_user),
     db: Session = Depends(get_db)
@@ -124,10 +132,12 @@ async def create_stall(
     db.add(db_stall)
     db.commit()
     db.refresh(db_stall)
+    stall_spatial_index.upsert(db_stall.id, db_stall.latitude, db_stall.longitude)
+    prep_time_model.seed_stall(db_stall.id, db_stall.avg_prep_time, db_stall.max_concurrent_orders)
     return db_stall
 
 @router.put("/stalls/{stall_id}", response_model=StallListResponse)
-async def update_stall(
+def update_stall(
     stall_id: int,
     stall_update: StallUpdate,
     admin_user: User = Depends(get_admin_user),
@@ -151,10 +161,12 @@ async def update_stall(
 
     db.commit()
     db.refresh(db_stall)
+    stall_spatial_index.upsert(db_stall.id, db_stall.latitude, db_stall.longitude)
+    prep_time_model.seed_stall(db_stall.id, db_stall.avg_prep_time, db_stall.max_concurrent_orders)
     return db_stall
 
 @router.delete("/stalls/{stall_id}")
-async def delete_stall(
+def delete_stall(
     stall_id: int,
     admin_user: User = Depends(get_admin_user),
     db: Session = Depends(get_db)
@@ -165,10 +177,13 @@ async def delete_stall(
 
     db.delete(db_stall)
     db.commit()
+    stall_spatial_index.remove(stall_id)
+    menu_cache.invalidate([stall_id])
+    menu_search_index.refresh_stalls(db, [stall_id])
     return {"message": "Stall deleted successfully"}
 
 @router.get("/menu-items", response_model=List[MenuItemResponse])
-async def get_all_menu_items(
+def get_all_menu_items(
     stall_id: Optional[int] = None,
     skip: int = 0,
     limit: int = 100,
@@ -183,7 +198,7 @@ async def get_all_menu_items(
     return items
 
 @router.post("/menu-items", response_model=MenuItemResponse)
-async def create_menu_item(
+def create_menu_item(
     menu_item: MenuItemCreate,
     admin_user: User = Depends(get_admin_user),
     db: Session = Depends(get_db)
@@ -196,10 +211,12 @@ async def create_menu_item(
     db.add(db_item)
     db.commit()
     db.refresh(db_item)
+    menu_cache.invalidate([db_item.stall_id])
+    menu_search_index.refresh_stalls(db, [db_item.stall_id])
     return db_item
 
 @router.put("/menu-items/{item_id}", response_model=MenuItemResponse)
-async def update_menu_item(
+def update_menu_item(
     item_id: int,
     item_update: MenuItemUpdate,
     admin_user: User = Depends(get_admin_user),
@@ -216,10 +233,12 @@ async def update_menu_item(
 
     db.commit()
     db.refresh(db_item)
+    menu_cache.invalidate([db_item.stall_id])
+    menu_search_index.refresh_stalls(db, [db_item.stall_id])
     return db_item
 
 @router.delete("/menu-items/{item_id}")
-async def delete_menu_item(
+def delete_menu_item(
     item_id: int,
     admin_user: User = Depends(get_admin_user),
     db: Session = Depends(get_db)
@@ -228,12 +247,15 @@ async def delete_menu_item(
     if not db_item:
         raise HTTPException(status_code=404, detail="Menu item not found")
 
+    stall_id = db_item.stall_id
     db.delete(db_item)
     db.commit()
+    menu_cache.invalidate([stall_id])
+    menu_search_index.refresh_stalls(db, [stall_id])
     return {"message": "Menu item deleted successfully"}
 
 @router.get("/orders", response_model=List[OrderListResponse])
-async def get_all_orders(
+def get_all_orders(
     status: Optional[str] = None,
     stall_id: Optional[int] = None,
     user_id: Optional[int] = None,
@@ -261,7 +283,7 @@ async def get_all_orders(
     return orders
 
 @router.get("/orders/{order_id}", response_model=OrderListResponse)
-async def get_order(
+def get_order(
     order_id: int,
     admin_user: User = Depends(get_admin_user),
     db: Session = Depends(get_db)
@@ -272,7 +294,7 @@ async def get_order(
     return order
 
 @router.put("/orders/{order_id}/status")
-async def update_order_status(
+def update_order_status(
     order_id: int,
     status_update: OrderStatusUpdate,
     admin_user: User = Depends(get_admin_user),
@@ -282,21 +304,10 @@ async def update_order_status(
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
 
-    order.status = status_update.status
-    order.updated_at = datetime.utcnow()
-
-    if status_update.status == OrderStatus.READY:
-        queue_entry = db.query(QueueEntry).filter(QueueEntry.order_id == order_id).first()
-        if queue_entry:
-            queue_entry.status = QueueStatus.READY
-            queue_entry.updated_at = datetime.utcnow()
-
-    db.commit()
-    db.refresh(order)
-    return order
+    return set_order_status(order, status_update.status, db)
 
 @router.delete("/orders/{order_id}")
-async def delete_order(
+def delete_order(
     order_id: int,
     admin_user: User = Depends(get_admin_user),
     db: Session = Depends(get_db)
@@ -305,14 +316,16 @@ async def delete_order(
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
 
+    stall_id = order.stall_id
     db.delete(order)
     db.commit()
+    remove_from_queue(stall_id, order_id)
     return {"message": "Order deleted successfully"}
 
 @router.get("/analytics/dashboard", response_model=DashboardStats)
-async def get_dashboard_stats(
+def get_dashboard_stats(
     admin_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     total_users = db.query(func.count(User.id)).scalar()
     total_stalls = db.query(func.count(Stall.id)).scalar()
@@ -352,10 +365,10 @@ async def get_dashboard_stats(
     }
 
 @router.get("/analytics/popular-items")
-async def get_popular_items(
+def get_popular_items(
     limit: int = 10,
     admin_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     popular_items = db.query(
         MenuItem.id,
@@ -393,9 +406,9 @@ async def get_popular_items(
     ]
 
 @router.get("/analytics/stall-performance")
-async def get_stall_performance(
+def get_stall_performance(
     admin_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     stall_stats = db.query(
         Stall.id,
@@ -427,10 +440,10 @@ async def get_stall_performance(
     ]
 
 @router.get("/analytics/recent-activity")
-async def get_recent_activity(
+def get_recent_activity(
     limit: int = 20,
     admin_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     recent_orders = db.query(Order).order_by(Order.created_at.desc()).limit(limit).all()
 
@@ -450,7 +463,7 @@ async def get_recent_activity(
     ]
 
 @router.post("/seed-admin")
-async def seed_admin_user(db: Session = Depends(get_db)):
+def seed_admin_user(db: Session = Depends(get_db)):
     existing_admin = db.query(User).filter(User.role == UserRole.ADMIN).first()
     if existing_admin:
         return {"message": "Admin user already exists", "email": existing_admin.ntu_email}
@@ -475,4 +488,22 @@ async def seed_admin_user(db: Session = Depends(get_db)):
         "email": "admin@campuseats.com",
         "password": "admin123",
         "note": "Please change the password after first login"
-    }
\ No newline at end of file
+    }
+
+@router.get("/system/db-pool")
+def get_db_pool_stats(admin_user: User = Depends(get_admin_user)):
+    """Connection pool occupancy and checkout wait times for this worker"""
+    pools = {"primary": pool_status(database.engine)}
+    if database.read_engine is not database.engine:
+        pools["replica"] = pool_status(database.read_engine)
+    if database.async_engine is not None:
+        pools["async"] = pool_status(database.async_engine.sync_engine)
+    if database.async_read_engine is not None and database.async_read_engine is not database.async_engine:
+        pools["async_replica"] = pool_status(database.async_read_engine.sync_engine)
+    return pools
+
+@router.post("/system/queue-index/reconcile")
+def reconcile_queue_index(admin_user: User = Depends(get_admin_user), db: Session = Depends(get_db)):
+    """Check this worker's in-memory queue index against queue_entries and repair any drift"""
+    discrepancies = stall_queue_index.reconcile(db)
+    return {"consistent": not discrepancies, "discrepancies": discrepancies}
@@ -27,7 +27,7 @@ EMAIL_TESTING_MODE = os.getenv('EMAIL_TESTING_MODE', 'false').lower() == 'true'
 router = APIRouter()
 
 @router.post("/register", response_model=OTPResponse)
-async def register_with_otp(
+def register_with_otp(
     user_data: OTPRequest,
     background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
@@ -120,7 +120,7 @@ async def register_with_otp(
     )
 
 @router.post("/verify-otp", response_model=Token)
-async def verify_otp(
+def verify_otp(
     verify_data: OTPVerifyRequest,
     background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
@@ -217,7 +217,7 @@ async def verify_otp(
         )
 
 @router.post("/resend-otp", response_model=OTPResponse)
-async def resend_otp(
+def resend_otp(
     resend_data: ResendOTPRequest,
     background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
@@ -281,7 +281,7 @@ async def resend_otp(
     )
 
 @router.delete("/cancel-registration/{email}")
-async def cancel_registration(
+def cancel_registration(
     email: str,
     db: Session = Depends(get_db)
 ):
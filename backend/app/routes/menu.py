@@ -1,27 +1,114 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from pydantic import TypeAdapter
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
-from app.database.database import get_db
+from typing import List, Optional
+import math
+from app.database.database import get_db, get_read_db, get_async_db, get_async_read_db
 from app.models.menu import MenuItem
 from app.models.stall import Stall
-from app.schemas.menu import MenuItemCreate, MenuItemResponse, MenuItemUpdate
+from app.schemas.menu import (
+    MenuAvailabilityUpdate, MenuItemCreate, MenuItemResponse, MenuItemUpdate, MenuItemUpsert, MenuSearchResult
+)
 from app.routes.auth import get_current_user
 from app.models.user import User, UserRole
+from app.services.menu_cache import menu_cache
+from app.services.menu_search import menu_search_index
+from app.services.spatial_index import stall_spatial_index
+from app.utils.http_cache import json_response_with_etag
 
 router = APIRouter()
 
+menu_adapter = TypeAdapter(List[MenuItemResponse])
+
+@router.get("/search", response_model=List[MenuSearchResult])
+def search_menu(
+    q: Optional[str] = Query(None, description="Words to find in item names, descriptions and categories"),
+    vegetarian: Optional[bool] = Query(None),
+    halal: Optional[bool] = Query(None),
+    include_sold_out: bool = Query(False),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    lat: Optional[float] = Query(None, description="User's latitude, to sort by distance"),
+    lng: Optional[float] = Query(None, description="User's longitude, to sort by distance"),
+    radius_km: Optional[float] = Query(None, gt=0, description="Only return items from stalls within this distance"),
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Search dishes across every stall, answered from the in-memory menu
+    search index. All words must match. With lat/lng, results are sorted by
+    stall distance; otherwise by how well the name matches, then price.
+
+    Example: /api/menu/search?q=noodles&halal=true&max_price=5&lat=1.347&lng=103.680&radius_km=1
+    """
+    if (lat is None) != (lng is None):
+        raise HTTPException(status_code=400, detail="lat and lng must be given together")
+    if radius_km is not None and lat is None:
+        raise HTTPException(status_code=400, detail="radius_km requires lat and lng")
+
+    menu_search_index.ensure_fresh(db)
+
+    distances = {}
+    if lat is not None:
+        stall_spatial_index.ensure_fresh(db)
+        distances = {
+            stall_id: distance
+            for distance, stall_id in stall_spatial_index.within_radius(lat, lng, radius_km or math.inf)
+        }
+
+    items = menu_search_index.search(
+        q,
+        stall_ids=distances.keys() if radius_km is not None else None,
+        min_price=min_price,
+        max_price=max_price,
+        is_vegetarian=vegetarian,
+        is_halal=halal,
+        is_available=None if include_sold_out else True,
+    )
+    if lat is not None:
+        # Stable sort keeps the relevance order within a stall
+        items.sort(key=lambda item: distances.get(item.stall_id, math.inf))
+
+    return [
+        MenuSearchResult(
+            id=item.id, stall_id=item.stall_id, name=item.name, description=item.description,
+            price=item.price, category=item.category, image_url=item.image_url,
+            is_vegetarian=item.is_vegetarian, is_halal=item.is_halal, is_available=item.is_available,
+            preparation_time=item.prep_time if item.prep_time is not None else 10,
+            distance_km=round(distances[item.stall_id], 2) if item.stall_id in distances else None,
+        )
+        for item in items[:limit]
+    ]
+
 @router.get("/stall/{stall_id}", response_model=List[MenuItemResponse])
-def get_stall_menu(stall_id: int, db: Session = Depends(get_db)):
-    stall = db.query(Stall).filter(Stall.id == stall_id).first()
-    if not stall:
-        raise HTTPException(status_code=404, detail="Stall not found")
+async def get_stall_menu(
+    stall_id: int,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+) -> Response:
+    """
+    A stall's menu, served from the menu cache once loaded. Responses carry
+    a strong ETag; revalidating with If-None-Match returns 304 when the
+    menu is unchanged. Misses load from the primary: a lagging replica
+    would put a menu older than the last invalidation in the cache.
+    """
+    menu = menu_cache.get(stall_id)
+    if menu is None:
+        version = menu_cache.version(stall_id)
+        stall = await db.get(Stall, stall_id)
+        if not stall:
+            raise HTTPException(status_code=404, detail="Stall not found")
+
+        result = await db.execute(select(MenuItem).where(MenuItem.stall_id == stall_id))
+        menu = menu_cache.store(stall_id, version, menu_adapter.dump_json(result.scalars().all()))
 
-    menu_items = db.query(MenuItem).filter(MenuItem.stall_id == stall_id).all()
-    return menu_items
+    return json_response_with_etag(menu.body, menu.etag, if_none_match)
 
 @router.get("/{item_id}", response_model=MenuItemResponse)
-def get_menu_item(item_id: int, db: Session = Depends(get_db)):
-    item = db.query(MenuItem).filter(MenuItem.id == item_id).first()
+async def get_menu_item(item_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    item = await db.get(MenuItem, item_id)
     if not item:
         raise HTTPException(status_code=404, detail="Menu item not found")
     return item
@@ -43,6 +130,8 @@ def create_menu_item(
     db.add(db_item)
     db.commit()
     db.refresh(db_item)
+    menu_cache.invalidate([db_item.stall_id])
+    menu_search_index.refresh_stalls(db, [db_item.stall_id])
     return db_item
 
 @router.put("/{item_id}", response_model=MenuItemResponse)
@@ -64,6 +153,8 @@ def update_menu_item(
 
     db.commit()
     db.refresh(item)
+    menu_cache.invalidate([item.stall_id])
+    menu_search_index.refresh_stalls(db, [item.stall_id])
     return item
 
 @router.delete("/{item_id}")
@@ -79,6 +170,116 @@ def delete_menu_item(
     if item.stall.owner_id != current_user.id and current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Not authorized to delete this item")
 
+    stall_id = item.stall_id
     db.delete(item)
     db.commit()
-    return {"message": "Menu item deleted successfully"}
\ No newline at end of file
+    menu_cache.invalidate([stall_id])
+    menu_search_index.refresh_stalls(db, [stall_id])
+    return {"message": "Menu item deleted successfully"}
+
+def _authorize_stall_menu(db: Session, stall_id: int, current_user: User) -> None:
+    """404 for unknown stalls, 403 unless the user owns the stall or is an admin"""
+    stall = db.query(Stall.owner_id).filter(Stall.id == stall_id).first()
+    if not stall:
+        raise HTTPException(status_code=404, detail="Stall not found")
+    if stall.owner_id != current_user.id and current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Not authorized to change this stall's menu")
+
+# Columns a bulk upsert writes, with the values new items get when a row leaves them out
+UPSERT_DEFAULTS = {
+    "name": None, "price": None, "description": None, "category": None, "image_url": None,
+    "is_available": True, "is_vegetarian": False, "is_halal": True, "prep_time": 10,
+}
+# Columns an upsert row may leave out but not set to null
+REQUIRED_FIELDS = {"name", "price"}
+
+def _menu_item_values(row: MenuItemUpsert) -> dict:
+    values = row.model_dump(exclude_unset=True, exclude={"id"})
+    if "preparation_time" in values:
+        values["prep_time"] = values.pop("preparation_time")
+    return values
+
+@router.put("/stall/{stall_id}/items", response_model=List[MenuItemResponse])
+def upsert_menu_items(
+    stall_id: int,
+    rows: List[MenuItemUpsert],
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Create and update many of a stall's menu items in one request. Rows with
+    an id update only the fields they set, so concurrent edits to other
+    fields survive; rows setting the same fields share one bulk UPDATE, and
+    creations run as one bulk INSERT.
+    """
+    _authorize_stall_menu(db, stall_id, current_user)
+
+    updates = [row for row in rows if row.id is not None]
+    inserts = [row for row in rows if row.id is None]
+    update_ids = [row.id for row in updates]
+    if len(set(update_ids)) != len(update_ids):
+        raise HTTPException(status_code=400, detail="Each menu item may appear only once")
+    if any(row.name is None or row.price is None for row in inserts):
+        raise HTTPException(status_code=400, detail="New menu items need a name and price")
+    if any(getattr(row, field) is None for row in updates for field in REQUIRED_FIELDS & row.model_fields_set):
+        raise HTTPException(status_code=400, detail="Menu item name and price cannot be null")
+
+    if update_ids:
+        found = set(db.scalars(select(MenuItem.id).where(MenuItem.stall_id == stall_id, MenuItem.id.in_(update_ids))))
+        missing = [item_id for item_id in update_ids if item_id not in found]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Menu items not found in this stall: {missing}")
+
+    changes_by_fields = {}
+    for row in updates:
+        values = _menu_item_values(row)
+        if values:
+            changes_by_fields.setdefault(frozenset(values), []).append({"id": row.id, **values})
+    for changes in changes_by_fields.values():
+        db.execute(update(MenuItem), changes)
+    created_ids = []
+    if inserts:
+        created_ids = list(db.scalars(
+            insert(MenuItem).returning(MenuItem.id).execution_options(render_nulls=True),
+            [{**UPSERT_DEFAULTS, **_menu_item_values(row), "stall_id": stall_id} for row in inserts]
+        ))
+    db.commit()
+
+    if changes_by_fields or created_ids:
+        menu_cache.invalidate([stall_id])
+        menu_search_index.refresh_stalls(db, [stall_id])
+
+    touched = update_ids + created_ids
+    items_by_id = {item.id: item for item in db.scalars(select(MenuItem).where(MenuItem.id.in_(touched)))}
+    return [items_by_id[item_id] for item_id in touched]
+
+@router.patch("/stall/{stall_id}/availability", response_model=dict)
+def update_menu_availability(
+    stall_id: int,
+    availability: MenuAvailabilityUpdate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Mark many of a stall's items available or sold out with a single UPDATE"""
+    _authorize_stall_menu(db, stall_id, current_user)
+
+    updated_items = []
+    if availability.item_ids:
+        updated_items = sorted(db.scalars(
+            update(MenuItem)
+            .where(MenuItem.stall_id == stall_id, MenuItem.id.in_(availability.item_ids))
+            .values(is_available=availability.is_available)
+            .returning(MenuItem.id)
+            .execution_options(synchronize_session=False)
+        ))
+    db.commit()
+
+    if updated_items:
+        menu_cache.invalidate([stall_id])
+        menu_search_index.refresh_stalls(db, [stall_id])
+
+    return {
+        "message": f"Updated {len(updated_items)} menu items",
+        "updated_items": updated_items,
+        "is_available": availability.is_available
+    }
@@ -1,6 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session, joinedload
-from typing import List
+import asyncio
+import logging
+import math
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import Session, joinedload, selectinload, load_only
+from sqlalchemy import or_, and_, update
+from typing import List, Optional, Union
 from datetime import datetime, timedelta
 from app.database.database import get_db
 from app.models.order import Order, OrderItem, OrderStatus, PaymentStatus
@@ -8,33 +14,249 @@ from app.models.menu import MenuItem
 from app.models.stall import Stall
 from app.models.queue import QueueEntry, QueueStatus
 from app.models.user import UserRole
-from app.schemas.order import OrderCreate, OrderResponse, OrderUpdate, OrderSummary, ConfirmPaymentRequest, UpdateOrderStatusRequest
-from app.routes.auth import get_current_user
+from app.schemas.order import OrderCreate, OrderResponse, OrderUpdate, OrderSummary, StallOrderSummary, ConfirmPaymentRequest, UpdateOrderStatusRequest
+from app.routes.auth import get_current_user, get_current_user_for_stream
 from app.models.user import User
+from app.services.admission import (
+    NEXT_PICKUP_WINDOW_END_HEADER, NEXT_PICKUP_WINDOW_START_HEADER, PickupSlotFull, StallAtCapacity, stall_admission
+)
+from app.services.prep_times import prep_time_model
+from app.services.queue_numbers import queue_number_allocator
+from app.utils.pagination import NEXT_CURSOR_HEADER, encode_cursor, decode_cursor
+from app.services.idempotency import idempotency_store, request_fingerprint, COMPLETED, IN_PROGRESS, MISMATCH
+from app.services.stall_events import stall_event_hub
+from app.services.queue_events import record_queue_change, record_queue_entry, reload_queues
+from app.services.queue_index import ActiveQueueEntry, stall_queue_index
+from app.utils.sse import event_stream, sse_response
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-def calculate_estimated_ready_time(stall_id: int, db: Session) -> datetime:
+ACTIVE_ORDER_STATUSES = [OrderStatus.PENDING_PAYMENT, OrderStatus.CONFIRMED, OrderStatus.PREPARING]
+
+# Live order board event published when an order reaches each status
+ORDER_STATUS_EVENTS = {
+    OrderStatus.PENDING_PAYMENT: "order.created",
+    OrderStatus.CONFIRMED: "order.payment_confirmed",
+    OrderStatus.PREPARING: "order.preparing",
+    OrderStatus.READY: "order.ready",
+    OrderStatus.COMPLETED: "order.completed",
+    OrderStatus.CANCELLED: "order.cancelled",
+}
+
+def publish_order_event(stall_id: int, summary: StallOrderSummary) -> None:
+    """Push an order's new state to the stall's live order board; call after commit"""
+    stall_event_hub.publish(stall_id, ORDER_STATUS_EVENTS[summary.status], summary.model_dump(mode="json"))
+
+# Queue entry status that goes with each order status an order can be moved to
+QUEUE_STATUS_FOR_ORDER = {
+    OrderStatus.CONFIRMED: QueueStatus.WAITING,
+    OrderStatus.PREPARING: QueueStatus.PREPARING,
+    OrderStatus.READY: QueueStatus.READY,
+    OrderStatus.COMPLETED: QueueStatus.COLLECTED,
+    OrderStatus.CANCELLED: QueueStatus.CANCELLED,
+}
+
+def set_order_status(order: Order, new_status: OrderStatus, db: Session) -> Order:
+    """
+    Move an order and its queue entry to new_status and commit, then publish
+    the order event, write the entry through to the queue index and, for
+    ready orders, teach the ETA model
+    """
+    order.status = new_status
+
+    queue_entry = db.query(QueueEntry).filter(QueueEntry.order_id == order.id).first()
+    if queue_entry and new_status in QUEUE_STATUS_FOR_ORDER:
+        queue_entry.status = QUEUE_STATUS_FOR_ORDER[new_status]
+        if new_status == OrderStatus.READY:
+            queue_entry.ready_at = datetime.utcnow()
+        elif new_status == OrderStatus.COMPLETED:
+            queue_entry.collected_at = datetime.utcnow()
+
+    db.commit()
+    db.refresh(order)
+    publish_order_event(order.stall_id, StallOrderSummary.model_validate(order))
+    if queue_entry:
+        record_queue_change(queue_entry, order.user_id)
+        if new_status == OrderStatus.READY:
+            prep_time_model.observe_order_ready(db, queue_entry)
+    return order
+
+def get_staffed_stall(stall_id: int, current_user: User, db: Session) -> Stall:
+    """Stall the current user may manage orders for (its owner or an admin)"""
     stall = db.query(Stall).filter(Stall.id == stall_id).first()
     if not stall:
-        return datetime.now() + timedelta(minutes=15)
+        raise HTTPException(status_code=404, detail="Stall not found")
+
+    if current_user.role not in [UserRole.ADMIN, UserRole.STALL_OWNER]:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    if current_user.role == UserRole.STALL_OWNER and stall.owner_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized to view this stall's orders")
+
+    return stall
+
+def estimate_order_ready_time(order: Order) -> datetime:
+    """ETA of an active order from its place in the stall's queue and learned prep times"""
+    place = stall_queue_index.position(order.id)
+    if place is not None:
+        return place.estimated_ready_time
+
+    # Not indexed (yet): assume it joins the back of the queue now
+    return prep_time_model.estimate_ready_time(
+        order.stall_id,
+        datetime.utcnow(),
+        stall_queue_index.backlog_minutes(order.stall_id),
+        prep_time_model.stall_minutes(order.stall_id)
+    )
 
-    active_orders_count = db.query(QueueEntry).filter(
-        QueueEntry.stall_id == stall_id,
-        QueueEntry.status.in_([QueueStatus.WAITING, QueueStatus.PREPARING])
-    ).count()
+def build_order_summaries(orders: List[Order], db: Session) -> List[OrderSummary]:
+    """Summaries with ETAs for active orders; expects Order.stall to be loaded"""
+    if any(order.status in ACTIVE_ORDER_STATUSES for order in orders):
+        stall_queue_index.ensure_built(db)
 
-    base_time = stall.avg_prep_time
-    queue_delay = active_orders_count * (base_time // 2)
+    order_summaries = []
+    for order in orders:
+        estimated_ready_time = None
+        if order.status in ACTIVE_ORDER_STATUSES:
+            estimated_ready_time = estimate_order_ready_time(order)
 
-    return datetime.now() + timedelta(minutes=base_time + queue_delay)
+        order_summaries.append(OrderSummary(
+            id=order.id,
+            stall_id=order.stall_id,
+            stall_name=order.stall.name,
+            status=order.status,
+            payment_status=order.payment_status,
+            total_amount=order.total_amount,
+            queue_number=order.queue_number,
+            order_number=order.order_number,
+            pickup_window_start=order.pickup_window_start,
+            pickup_window_end=order.pickup_window_end,
+            created_at=order.created_at,
+            estimated_ready_time=estimated_ready_time
+        ))
+
+    return order_summaries
+
+ORDER_SUMMARY_COLUMNS = (
+    Order.id, Order.user_id, Order.stall_id, Order.status, Order.payment_status,
+    Order.total_amount, Order.queue_number, Order.order_number,
+    Order.pickup_window_start, Order.pickup_window_end, Order.created_at
+)
+
+DEFAULT_PAGE_SIZE = 50
+
+def paginate_orders(query, cursor: Optional[str], limit: Optional[int], response: Response) -> List[Order]:
+    """
+    Keyset pagination on (created_at, id), newest first; sets X-Next-Cursor
+    when more remain. Without a cursor or limit every order is returned, as
+    before paging existed, so clients that don't follow the cursor still see
+    the full list.
+    """
+    query = query.order_by(Order.created_at.desc(), Order.id.desc())
+    if cursor is None and limit is None:
+        return query.all()
+
+    limit = limit or DEFAULT_PAGE_SIZE
+    if cursor:
+        created_at, order_id = decode_cursor(cursor, (datetime.fromisoformat, int))
+        query = query.filter(or_(
+            Order.created_at < created_at,
+            and_(Order.created_at == created_at, Order.id < order_id)
+        ))
+
+    orders = query.limit(limit + 1).all()
+    if len(orders) > limit:
+        orders = orders[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(orders[-1].created_at, orders[-1].id)
+    return orders
+
+def user_order_summaries_query(user_id: int, db: Session):
+    # Only the columns OrderSummary needs, plus the stall name
+    return db.query(Order).options(
+        load_only(*ORDER_SUMMARY_COLUMNS),
+        joinedload(Order.stall).load_only(Stall.name)
+    ).filter(Order.user_id == user_id)
 
 @router.post("/", response_model=OrderResponse)
 def create_order(
     order: OrderCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
+    """
+    Place an order. Clients may send an Idempotency-Key header; retries with
+    the same key and body get the original response back instead of a
+    duplicate order.
+    """
+    if not idempotency_key:
+        return place_order(order, current_user, db)
+
+    # Keys are scoped per user so one student can never replay another's order
+    store_key = f"{current_user.id}:{idempotency_key}"
+    state, stored = idempotency_store.begin(store_key, request_fingerprint(order.model_dump(mode="json")))
+
+    if state == COMPLETED:
+        return JSONResponse(
+            status_code=stored.status_code,
+            content=stored.body,
+            headers={"Idempotent-Replayed": "true"}
+        )
+    if state == IN_PROGRESS:
+        raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still being processed")
+    if state == MISMATCH:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+
+    try:
+        response = place_order(order, current_user, db)
+    except Exception:
+        # Failed attempts are not remembered, so the client can retry
+        idempotency_store.release(store_key)
+        raise
+
+    idempotency_store.complete(store_key, 200, response.model_dump(mode="json"))
+    return response
+
+def stall_at_capacity_error(stall: Stall, full: StallAtCapacity, order: OrderCreate, prep_minutes: int) -> HTTPException:
+    """409 offering the earliest pickup window the stall can take the order for"""
+    window_start, window_end = full.next_pickup_window(
+        prep_minutes, order.pickup_window_end - order.pickup_window_start
+    )
+    return HTTPException(
+        status_code=409,
+        detail=(
+            f"{stall.name} is at capacity with {full.capacity} orders in progress. "
+            f"Next available pickup window: {window_start:%H:%M}-{window_end:%H:%M}"
+        ),
+        headers={
+            "Retry-After": str(math.ceil(full.slot_frees_in * 60)),
+            NEXT_PICKUP_WINDOW_START_HEADER: window_start.isoformat(),
+            NEXT_PICKUP_WINDOW_END_HEADER: window_end.isoformat(),
+        }
+    )
+
+def pickup_slot_full_error(stall: Stall, full: PickupSlotFull) -> HTTPException:
+    """409 offering the stall's earliest free pickup slot after the requested one"""
+    if full.next_free_slot is None:
+        return HTTPException(status_code=409, detail=f"{stall.name} has no free pickup slots in the next day")
+
+    slot_start, slot_end = full.next_free_slot
+    return HTTPException(
+        status_code=409,
+        detail=(
+            f"{stall.name} is fully booked for that pickup time. "
+            f"Next available pickup window: {slot_start:%H:%M}-{slot_end:%H:%M}"
+        ),
+        headers={
+            NEXT_PICKUP_WINDOW_START_HEADER: slot_start.isoformat(),
+            NEXT_PICKUP_WINDOW_END_HEADER: slot_end.isoformat(),
+        }
+    )
+
+def place_order(order: OrderCreate, current_user: User, db: Session) -> OrderResponse:
+    """Validate and write an order with its items and queue entry"""
     stall = db.query(Stall).filter(Stall.id == order.stall_id).first()
     if not stall:
         raise HTTPException(status_code=404, detail="Stall not found")
@@ -42,11 +264,18 @@ def create_order(
     if not stall.is_open:
         raise HTTPException(status_code=400, detail="Stall is currently closed")
 
+    # Fetch every requested menu item in a single query
+    requested_ids = {item.menu_item_id for item in order.items}
+    menu_items = {
+        menu_item.id: menu_item
+        for menu_item in db.query(MenuItem).filter(MenuItem.id.in_(requested_ids)).all()
+    }
+
     total_amount = 0
     order_items = []
 
     for item in order.items:
-        menu_item = db.query(MenuItem).filter(MenuItem.id == item.menu_item_id).first()
+        menu_item = menu_items.get(item.menu_item_id)
         if not menu_item:
             raise HTTPException(status_code=404, detail=f"Menu item {item.menu_item_id} not found")
         if menu_item.stall_id != order.stall_id:
@@ -65,78 +294,74 @@ def create_order(
         )
         order_items.append(order_item)
 
-    current_queue_length = db.query(QueueEntry).filter(
-        QueueEntry.stall_id == order.stall_id,
-        QueueEntry.status.in_([QueueStatus.WAITING, QueueStatus.PREPARING])
-    ).count()
-
-    queue_number = current_queue_length + 1
-
-    db_order = Order(
-        user_id=current_user.id,
-        stall_id=order.stall_id,
-        total_amount=total_amount,
-        queue_number=queue_number,
-        pickup_window_start=order.pickup_window_start,
-        pickup_window_end=order.pickup_window_end,
-        payment_method=order.payment_method,
-        payment_status=PaymentStatus.PENDING,
-        status=OrderStatus.PENDING_PAYMENT,
-        special_instructions=order.special_instructions,
-        order_items=order_items
+    stall_queue_index.ensure_built(db)
+    prep_time_model.ensure_built(db)
+    prep_minutes = prep_time_model.order_minutes(
+        order.stall_id, [(menu_item.id, menu_item.prep_time) for menu_item in menu_items.values()]
     )
 
-    db.add(db_order)
-    db.commit()
-    db.refresh(db_order)
-
-    db_order.order_number = f"ORD{db_order.id:05d}"
-
-    estimated_wait_time = stall.avg_prep_time + (current_queue_length * 3)
-
-    queue_entry = QueueEntry(
-        stall_id=order.stall_id,
-        order_id=db_order.id,
-        queue_position=queue_number,
-        estimated_wait_time=estimated_wait_time,
-        status=QueueStatus.WAITING
-    )
-    db.add(queue_entry)
-    db.commit()
-
-    return db_order
+    # The order's place in the stall's capacity is held until the queue index counts it
+    try:
+        with stall_admission.admit(stall.id, stall.max_concurrent_orders, order.pickup_window_start):
+            queue_number = queue_number_allocator.next_number(db, order.stall_id)
+
+            # Wait estimate: everything still to be made at the stall, then this order
+            estimated_wait_time = math.ceil(
+                prep_time_model.wait_minutes(order.stall_id, stall_queue_index.backlog_minutes(order.stall_id), prep_minutes)
+            )
+
+            db_order = Order(
+                user_id=current_user.id,
+                stall_id=order.stall_id,
+                total_amount=total_amount,
+                queue_number=queue_number,
+                pickup_window_start=order.pickup_window_start,
+                pickup_window_end=order.pickup_window_end,
+                payment_method=order.payment_method,
+                payment_status=PaymentStatus.PENDING,
+                status=OrderStatus.PENDING_PAYMENT,
+                special_instructions=order.special_instructions,
+                order_items=order_items,
+                queue_entry=QueueEntry(
+                    stall_id=order.stall_id,
+                    queue_position=queue_number,
+                    estimated_wait_time=estimated_wait_time,
+                    prep_minutes=prep_minutes,
+                    ready_by=order.pickup_window_start,
+                    status=QueueStatus.WAITING
+                )
+            )
+
+            # Order, items and queue entry are written in one transaction; the flush
+            # only assigns the order id so the order number can be derived from it
+            db.add(db_order)
+            db.flush()
+            db_order.order_number = f"ORD{db_order.id:05d}"
+
+            # Serialize before committing so neither the response nor the
+            # events reload the expired order and queue entry
+            response = OrderResponse.model_validate(db_order)
+            summary = StallOrderSummary.model_validate(db_order)
+            queue_entry = ActiveQueueEntry.from_model(db_order.queue_entry, current_user.id)
+            db.commit()
+            publish_order_event(order.stall_id, summary)
+            record_queue_entry(queue_entry)
+            return response
+    except StallAtCapacity as full:
+        raise stall_at_capacity_error(stall, full, order, prep_minutes)
+    except PickupSlotFull as full:
+        raise pickup_slot_full_error(stall, full)
 
 @router.get("/", response_model=List[OrderSummary])
 def get_user_orders(
+    response: Response,
+    cursor: Optional[str] = Query(None, description=f"Value of the {NEXT_CURSOR_HEADER} header from the previous page"),
+    limit: Optional[int] = Query(None, ge=1, le=200, description=f"Page size ({DEFAULT_PAGE_SIZE} when only cursor is given); omit both to list every order"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    orders = db.query(Order).options(
-        joinedload(Order.stall)
-    ).filter(Order.user_id == current_user.id).order_by(Order.created_at.desc()).all()
-
-    order_summaries = []
-    for order in orders:
-        estimated_ready_time = None
-        if order.status in [OrderStatus.PENDING_PAYMENT, OrderStatus.CONFIRMED, OrderStatus.PREPARING]:
-            estimated_ready_time = calculate_estimated_ready_time(order.stall_id, db)
-
-        order_summaries.append(OrderSummary(
-            id=order.id,
-            stall_id=order.stall_id,
-            stall_name=order.stall.name,
-            status=order.status,
-            payment_status=order.payment_status,
-            total_amount=order.total_amount,
-            queue_number=order.queue_number,
-            order_number=order.order_number,
-            pickup_window_start=order.pickup_window_start,
-            pickup_window_end=order.pickup_window_end,
-            created_at=order.created_at,
-            estimated_ready_time=estimated_ready_time
-        ))
-
-    return order_summaries
+    orders = paginate_orders(user_order_summaries_query(current_user.id, db), cursor, limit, response)
+    return build_order_summaries(orders, db)
 
 @router.get("/{order_id}", response_model=OrderResponse)
 def get_order(
@@ -162,38 +387,17 @@ def get_order(
 @router.get("/user/{user_id}", response_model=List[OrderSummary])
 def get_user_order_history(
     user_id: int,
+    response: Response,
+    cursor: Optional[str] = Query(None, description=f"Value of the {NEXT_CURSOR_HEADER} header from the previous page"),
+    limit: Optional[int] = Query(None, ge=1, le=200, description=f"Page size ({DEFAULT_PAGE_SIZE} when only cursor is given); omit both to list every order"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     if current_user.id != user_id and current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Not authorized to view this user's orders")
 
-    orders = db.query(Order).options(
-        joinedload(Order.stall)
-    ).filter(Order.user_id == user_id).order_by(Order.created_at.desc()).all()
-
-    order_summaries = []
-    for order in orders:
-        estimated_ready_time = None
-        if order.status in [OrderStatus.PENDING_PAYMENT, OrderStatus.CONFIRMED, OrderStatus.PREPARING]:
-            estimated_ready_time = calculate_estimated_ready_time(order.stall_id, db)
-
-        order_summaries.append(OrderSummary(
-            id=order.id,
-            stall_id=order.stall_id,
-            stall_name=order.stall.name,
-            status=order.status,
-            payment_status=order.payment_status,
-            total_amount=order.total_amount,
-            queue_number=order.queue_number,
-            order_number=order.order_number,
-            pickup_window_start=order.pickup_window_start,
-            pickup_window_end=order.pickup_window_end,
-            created_at=order.created_at,
-            estimated_ready_time=estimated_ready_time
-        ))
-
-    return order_summaries
+    orders = paginate_orders(user_order_summaries_query(user_id, db), cursor, limit, response)
+    return build_order_summaries(orders, db)
 
 @router.put("/{order_id}/status", response_model=OrderResponse)
 def update_order_status(
@@ -210,27 +414,7 @@ def update_order_status(
         (not order.stall.owner_id or order.stall.owner_id != current_user.id)):
         raise HTTPException(status_code=403, detail="Not authorized to update this order")
 
-    old_status = order.status
-    order.status = status_update.status
-
-    queue_entry = db.query(QueueEntry).filter(QueueEntry.order_id == order_id).first()
-    if queue_entry:
-        if status_update.status == OrderStatus.CONFIRMED:
-            queue_entry.status = QueueStatus.WAITING
-        elif status_update.status == OrderStatus.PREPARING:
-            queue_entry.status = QueueStatus.PREPARING
-        elif status_update.status == OrderStatus.READY:
-            queue_entry.status = QueueStatus.READY
-            queue_entry.ready_at = datetime.now()
-        elif status_update.status == OrderStatus.COMPLETED:
-            queue_entry.status = QueueStatus.COLLECTED
-            queue_entry.collected_at = datetime.now()
-        elif status_update.status == OrderStatus.CANCELLED:
-            queue_entry.status = QueueStatus.CANCELLED
-
-    db.commit()
-    db.refresh(order)
-    return order
+    return set_order_status(order, status_update.status, db)
 
 @router.delete("/{order_id}")
 def cancel_order(
@@ -255,34 +439,34 @@ def cancel_order(
     if queue_entry:
         queue_entry.status = QueueStatus.CANCELLED
 
+    stall_id, summary = order.stall_id, StallOrderSummary.model_validate(order)
     db.commit()
+    publish_order_event(stall_id, summary)
+    if queue_entry:
+        record_queue_change(queue_entry, current_user.id)
     return {"message": "Order cancelled successfully"}
 
 # Stall Owner Endpoints
 
-@router.get("/stall/{stall_id}/orders", response_model=List[OrderResponse])
+@router.get("/stall/{stall_id}/orders", response_model=Union[List[OrderResponse], List[StallOrderSummary]])
 def get_stall_orders(
     stall_id: int,
+    response: Response,
     status: str = None,
+    view: str = Query("full", pattern="^(full|summary)$", description="summary omits line items and selects only listing columns"),
+    cursor: Optional[str] = Query(None, description=f"Value of the {NEXT_CURSOR_HEADER} header from the previous page"),
+    limit: Optional[int] = Query(None, ge=1, le=200, description=f"Page size ({DEFAULT_PAGE_SIZE} when only cursor is given); omit both to list every order"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get all orders for a specific stall (Stall Owner only)"""
-    stall = db.query(Stall).filter(Stall.id == stall_id).first()
-    if not stall:
-        raise HTTPException(status_code=404, detail="Stall not found")
-
-    # Check authorization
-    if current_user.role not in [UserRole.ADMIN, UserRole.STALL_OWNER]:
-        raise HTTPException(status_code=403, detail="Not authorized")
-
-    if current_user.role == UserRole.STALL_OWNER and stall.owner_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized to view this stall's orders")
+    """Get orders for a specific stall, newest first (Stall Owner only)"""
+    get_staffed_stall(stall_id, current_user, db)
 
-    query = db.query(Order).options(
-        joinedload(Order.order_items).joinedload(OrderItem.menu_item),
-        joinedload(Order.user)
-    ).filter(Order.stall_id == stall_id)
+    if view == "summary":
+        query = db.query(Order).options(load_only(*ORDER_SUMMARY_COLUMNS))
+    else:
+        query = db.query(Order).options(selectinload(Order.order_items))
+    query = query.filter(Order.stall_id == stall_id)
 
     # Filter by status if provided
     if status:
@@ -292,9 +476,30 @@ def get_stall_orders(
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid status value")
 
-    orders = query.order_by(Order.created_at.desc()).all()
+    orders = paginate_orders(query, cursor, limit, response)
+    if view == "summary":
+        return [StallOrderSummary.model_validate(order) for order in orders]
     return orders
 
+@router.get("/stall/{stall_id}/events")
+def stream_stall_order_events(
+    stall_id: int,
+    request: Request,
+    current_user: User = Depends(get_current_user_for_stream),
+    db: Session = Depends(get_db)
+):
+    """
+    Live order board for a stall as Server-Sent Events (Stall Owner only).
+    Each event is named after the lifecycle step (order.created,
+    order.payment_confirmed, order.preparing, order.ready, order.completed,
+    order.cancelled) and carries the order as a StallOrderSummary. On
+    "resync" the client should refetch GET /stall/{stall_id}/orders.
+    """
+    get_staffed_stall(stall_id, current_user, db)
+    # Don't hold a pooled connection for the lifetime of the stream
+    db.close()
+    return sse_response(event_stream(request, stall_event_hub, stall_id, event_prefixes=("order.",)))
+
 @router.put("/{order_id}/confirm-payment", response_model=OrderResponse)
 def confirm_payment(
     order_id: int,
@@ -314,17 +519,73 @@ def confirm_payment(
     if order.status != OrderStatus.PENDING_PAYMENT:
         raise HTTPException(status_code=400, detail="Order is not in pending payment status")
 
+    queue_entry = None
     if payment_request.payment_confirmed:
         order.payment_status = PaymentStatus.CONFIRMED
         order.status = OrderStatus.CONFIRMED
     else:
         order.payment_status = PaymentStatus.FAILED
         order.status = OrderStatus.CANCELLED
+        queue_entry = db.query(QueueEntry).filter(QueueEntry.order_id == order_id).first()
+        if queue_entry:
+            queue_entry.status = QueueStatus.CANCELLED
 
     db.commit()
     db.refresh(order)
+    publish_order_event(order.stall_id, StallOrderSummary.model_validate(order))
+    if queue_entry:
+        record_queue_change(queue_entry, order.user_id)
     return order
 
+def expire_unpaid_orders(db: Session, timeout_minutes: int) -> List[int]:
+    """
+    Cancel orders still awaiting payment confirmation timeout_minutes after
+    checkout, so they stop holding a place in their stall's
+    max_concurrent_orders. Returns the cancelled order ids.
+    """
+    cutoff = datetime.utcnow() - timedelta(minutes=timeout_minutes)
+    rows = db.execute(
+        update(Order)
+        .where(Order.status == OrderStatus.PENDING_PAYMENT, Order.created_at < cutoff)
+        .values(status=OrderStatus.CANCELLED, payment_status=PaymentStatus.FAILED)
+        .returning(*ORDER_SUMMARY_COLUMNS)
+        .execution_options(synchronize_session=False)
+    ).all()
+    if not rows:
+        db.rollback()
+        return []
+
+    expired = [row.id for row in rows]
+    db.execute(
+        update(QueueEntry)
+        .where(QueueEntry.order_id.in_(expired))
+        .values(status=QueueStatus.CANCELLED)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    for row in rows:
+        publish_order_event(row.stall_id, StallOrderSummary.model_validate(row))
+    reload_queues(db, {row.stall_id for row in rows})
+    logger.info(f"Cancelled {len(expired)} orders left unpaid for {timeout_minutes} minutes")
+    return expired
+
+async def expire_unpaid_orders_periodically(session_factory, timeout_minutes: int, interval_seconds: float = 60) -> None:
+    """Run expire_unpaid_orders every interval_seconds until cancelled"""
+    while True:
+        await asyncio.sleep(interval_seconds)
+
+        def run():
+            db = session_factory()
+            try:
+                return expire_unpaid_orders(db, timeout_minutes)
+            finally:
+                db.close()
+
+        try:
+            await run_in_threadpool(run)
+        except Exception:
+            logger.exception("Unpaid order expiry failed")
+
 @router.put("/{order_id}/start-preparing", response_model=OrderResponse)
 def start_preparing_order(
     order_id: int,
@@ -351,6 +612,9 @@ def start_preparing_order(
 
     db.commit()
     db.refresh(order)
+    publish_order_event(order.stall_id, StallOrderSummary.model_validate(order))
+    if queue_entry:
+        record_queue_change(queue_entry, order.user_id)
     return order
 
 @router.put("/{order_id}/mark-ready", response_model=OrderResponse)
@@ -376,10 +640,15 @@ def mark_order_ready(
     queue_entry = db.query(QueueEntry).filter(QueueEntry.order_id == order_id).first()
     if queue_entry:
         queue_entry.status = QueueStatus.READY
-        queue_entry.ready_at = datetime.now()
+        queue_entry.ready_at = datetime.utcnow()
 
     db.commit()
     db.refresh(order)
+    publish_order_event(order.stall_id, StallOrderSummary.model_validate(order))
+    if queue_entry:
+        record_queue_change(queue_entry, order.user_id)
+        # Every ready order teaches the ETA model how long this stall really takes
+        prep_time_model.observe_order_ready(db, queue_entry)
     return order
 
 @router.put("/{order_id}/mark-completed", response_model=OrderResponse)
@@ -405,8 +674,11 @@ def mark_order_completed(
     queue_entry = db.query(QueueEntry).filter(QueueEntry.order_id == order_id).first()
     if queue_entry:
         queue_entry.status = QueueStatus.COLLECTED
-        queue_entry.collected_at = datetime.now()
+        queue_entry.collected_at = datetime.utcnow()
 
     db.commit()
     db.refresh(order)
+    publish_order_event(order.stall_id, StallOrderSummary.model_validate(order))
+    if queue_entry:
+        record_queue_change(queue_entry, order.user_id)
     return order
\ No newline at end of file
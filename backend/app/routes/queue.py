@@ -1,42 +1,225 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session, joinedload
-from typing import List
-from datetime import datetime, timedelta
-from app.database.database import get_db
+import math
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import and_, case, func, or_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload, sessionmaker
+from typing import AsyncIterator, List, Optional, Tuple
+from datetime import datetime
+from app.database.database import get_db, get_async_read_db
 from app.models.queue import QueueEntry, QueueStatus
 from app.models.order import Order, OrderStatus
 from app.models.stall import Stall
 from app.models.user import UserRole
 from app.schemas.queue import (
     QueueJoinRequest, QueueEntryResponse, QueueStatusUpdate,
-    QueuePositionResponse, StallQueueResponse, QueueUpdateRequest
+    QueuePositionResponse, StallQueueResponse, QueueUpdateRequest, StallPickupSlotsResponse
 )
-from app.routes.auth import get_current_user
+from app.routes.auth import get_current_user, get_current_user_for_stream
+from app.routes.orders import ORDER_SUMMARY_COLUMNS, publish_order_event
+from app.schemas.order import StallOrderSummary
 from app.models.user import User
+from app.services.queue_events import QUEUE_CHANGED, record_queue_change, reload_queues
+from app.services.pickup_slots import pickup_slots
+from app.services.prep_times import prep_time_model
+from app.services.queue_index import QueuePlace, stall_queue_index
+from app.services.queue_numbers import queue_number_allocator
+from app.services.stall_events import stall_event_hub
+from app.utils.campus_time import campus_wall_clock, utc_to_campus
+from app.utils.sse import HEARTBEAT_SECONDS, KEEP_ALIVE_FRAME, retry_frame, sse_frame, sse_response
 
 router = APIRouter()
 
+# Nothing more will change for a student once their order leaves the queue
+FINISHED_QUEUE_STATUSES = [QueueStatus.COLLECTED, QueueStatus.CANCELLED]
+
+def build_queue_position(
+    entry,
+    place_in_line: int,
+    orders_ahead: int,
+    estimated_ready_time: Optional[datetime]
+) -> QueuePositionResponse:
+    """
+    Position response from a QueueEntry or an indexed ActiveQueueEntry.
+    Stored queue positions are tickets with gaps, so clients get the place
+    in line (1 + active entries due earlier, ties broken by ticket) instead.
+    """
+    return QueuePositionResponse(
+        order_id=entry.order_id,
+        stall_id=entry.stall_id,
+        queue_position=place_in_line,
+        estimated_wait_time=entry.estimated_wait_time,
+        orders_ahead=orders_ahead,
+        status=entry.status,
+        joined_at=entry.joined_at,
+        estimated_ready_time=estimated_ready_time
+    )
+
+def build_queue_entry(entry, place_in_line: Optional[int]) -> QueueEntryResponse:
+    """Entry response from a QueueEntry or an indexed ActiveQueueEntry; its stored position is the ticket"""
+    return QueueEntryResponse(
+        id=entry.id,
+        order_id=entry.order_id,
+        stall_id=entry.stall_id,
+        queue_position=place_in_line,
+        ticket_number=entry.queue_position,
+        status=entry.status,
+        estimated_wait_time=entry.estimated_wait_time,
+        joined_at=entry.joined_at,
+        ready_at=entry.ready_at,
+        collected_at=entry.collected_at,
+        ready_by=entry.ready_by
+    )
+
+def indexed_place_in_line(order_id: int) -> Optional[int]:
+    place = stall_queue_index.position(order_id)
+    return place.place_in_line if place is not None else None
+
+def build_indexed_queue_position(place: QueuePlace) -> QueuePositionResponse:
+    return build_queue_position(place.entry, place.place_in_line, place.orders_ahead, place.estimated_ready_time)
+
+def indexed_queue_position(order_id: int) -> Optional[QueuePositionResponse]:
+    """Position of an active order from the queue index, without a query"""
+    place = stall_queue_index.position(order_id)
+    if place is None:
+        return None
+    return build_indexed_queue_position(place)
+
+def count_ahead(queue_entry: QueueEntry, db: Session) -> Tuple[int, int]:
+    """(place in line, orders ahead) in earliest-deadline-first order, from one count"""
+    deadline = func.coalesce(QueueEntry.ready_by, QueueEntry.joined_at)
+    # ready_by is set on every entry (see migrations/add_queue_ready_by.py); joined_at is a legacy fallback
+    own_deadline = queue_entry.ready_by or queue_entry.joined_at
+    active_ahead, orders_ahead = db.query(
+        func.count(QueueEntry.id),
+        func.count(case((QueueEntry.status.in_([QueueStatus.WAITING, QueueStatus.PREPARING]), QueueEntry.id)))
+    ).filter(
+        QueueEntry.stall_id == queue_entry.stall_id,
+        QueueEntry.status.in_([QueueStatus.WAITING, QueueStatus.PREPARING, QueueStatus.READY]),
+        or_(
+            deadline < own_deadline,
+            and_(deadline == own_deadline, QueueEntry.queue_position < queue_entry.queue_position)
+        )
+    ).one()
+    return active_ahead + 1, orders_ahead
+
+def get_own_queue_entry(order_id: int, current_user: User, db: Session) -> QueueEntry:
+    queue_entry = db.query(QueueEntry).options(
+        joinedload(QueueEntry.order)
+    ).filter(QueueEntry.order_id == order_id).first()
+
+    if not queue_entry:
+        raise HTTPException(status_code=404, detail="Order not in queue")
+
+    if queue_entry.order.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized to view this queue position")
+
+    return queue_entry
+
+def load_queue_position(session_factory, order_id: int) -> Optional[QueuePositionResponse]:
+    db = session_factory()
+    try:
+        stall_queue_index.ensure_built(db)
+        position = indexed_queue_position(order_id)
+        if position is not None:
+            return position
+
+        # Collected or cancelled orders are no longer indexed
+        queue_entry = db.query(QueueEntry).filter(QueueEntry.order_id == order_id).first()
+        if not queue_entry:
+            return None
+        return build_queue_position(queue_entry, *count_ahead(queue_entry, db), queue_entry.ready_at)
+    finally:
+        db.close()
+
+async def queue_position_stream(
+    request: Request,
+    order_id: int,
+    stall_id: int,
+    session_factory,
+    heartbeat_seconds: float = HEARTBEAT_SECONDS
+) -> AsyncIterator[str]:
+    """Yield a "position" event whenever the order's position, orders ahead or ETA changes"""
+    # Subscribe before the first read so no change can slip in between
+    subscription = stall_event_hub.subscribe(stall_id)
+    try:
+        yield retry_frame()
+        position = await run_in_threadpool(load_queue_position, session_factory, order_id)
+        sent = None
+        while position is not None and not await request.is_disconnected():
+            if position != sent:
+                yield sse_frame("position", position.model_dump(mode="json"))
+                sent = position
+            if position.status in FINISHED_QUEUE_STATUSES:
+                break
+
+            event = await subscription.get(timeout=heartbeat_seconds)
+            if event is None:
+                yield KEEP_ALIVE_FRAME
+            elif event.type == QUEUE_CHANGED:
+                # The index already holds the change; only a departed order needs a query
+                position = indexed_queue_position(order_id)
+                if position is None:
+                    position = await run_in_threadpool(load_queue_position, session_factory, order_id)
+            elif event.type == "resync":
+                position = await run_in_threadpool(load_queue_position, session_factory, order_id)
+    finally:
+        stall_event_hub.unsubscribe(subscription)
+
 @router.get("/{stall_id}", response_model=StallQueueResponse)
-def get_stall_queue(stall_id: int, db: Session = Depends(get_db)):
-    stall = db.query(Stall).filter(Stall.id == stall_id).first()
+async def get_stall_queue(stall_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    stall = await db.get(Stall, stall_id)
     if not stall:
         raise HTTPException(status_code=404, detail="Stall not found")
 
-    queue_entries = db.query(QueueEntry).options(
-        joinedload(QueueEntry.order).joinedload(Order.user)
-    ).filter(
-        QueueEntry.stall_id == stall_id,
-        QueueEntry.status.in_([QueueStatus.WAITING, QueueStatus.PREPARING, QueueStatus.READY])
-    ).order_by(QueueEntry.queue_position).all()
+    if not stall_queue_index.is_built:
+        await db.run_sync(stall_queue_index.rebuild)
+    queue_entries = stall_queue_index.entries(stall_id)
 
-    total_estimated_time = sum(entry.estimated_wait_time or 0 for entry in queue_entries)
+    # Wait for an order placed now: everything still to be made, then a typical order
+    estimated_wait_time = math.ceil(prep_time_model.wait_minutes(
+        stall_id, stall_queue_index.backlog_minutes(stall_id), prep_time_model.stall_minutes(stall_id)
+    ))
 
     return StallQueueResponse(
         stall_id=stall_id,
         stall_name=stall.name,
         current_queue_length=len(queue_entries),
-        estimated_wait_time=total_estimated_time,
-        queue_entries=queue_entries
+        estimated_wait_time=estimated_wait_time,
+        # Entries come in prep order, so their place in line is their rank
+        queue_entries=[build_queue_entry(entry, place) for place, entry in enumerate(queue_entries, start=1)]
+    )
+
+@router.get("/{stall_id}/pickup-slots", response_model=StallPickupSlotsResponse)
+async def get_pickup_slots(
+    stall_id: int,
+    count: int = Query(16, ge=1, le=96, description="Number of consecutive slots to list from the current one"),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Upcoming pickup slots with their bookings, and the earliest slot with
+    room for an order placed now (not before the kitchen could finish it).
+    Checkout rejects pickup windows starting in a full slot.
+    """
+    stall = await db.get(Stall, stall_id)
+    if not stall:
+        raise HTTPException(status_code=404, detail="Stall not found")
+
+    if not stall_queue_index.is_built:
+        await db.run_sync(stall_queue_index.rebuild)
+    capacity = pickup_slots.capacity(stall_id, stall.max_concurrent_orders)
+
+    # ETAs are naive UTC; pickup slots follow the campus wall clock of pickup windows
+    ready_at_earliest = utc_to_campus(prep_time_model.estimate_ready_time(
+        stall_id, datetime.utcnow(), stall_queue_index.backlog_minutes(stall_id), prep_time_model.stall_minutes(stall_id)
+    ))
+    earliest = pickup_slots.earliest_free(stall_id, capacity, ready_at_earliest)
+
+    return StallPickupSlotsResponse(
+        stall_id=stall_id,
+        slot_minutes=int(pickup_slots.slot_length.total_seconds() // 60),
+        earliest_available=pickup_slots.describe(stall_id, capacity, earliest) if earliest else None,
+        slots=pickup_slots.upcoming(stall_id, capacity, campus_wall_clock(), count)
     )
 
 @router.post("/join", response_model=QueueEntryResponse)
@@ -63,26 +246,30 @@ def join_queue(
     if not stall:
         raise HTTPException(status_code=404, detail="Stall not found")
 
-    current_queue_length = db.query(QueueEntry).filter(
-        QueueEntry.stall_id == order.stall_id,
-        QueueEntry.status.in_([QueueStatus.WAITING, QueueStatus.PREPARING])
-    ).count()
+    stall_queue_index.ensure_built(db)
+    prep_time_model.ensure_built(db)
 
-    next_position = current_queue_length + 1
-    estimated_wait_time = stall.avg_prep_time + (current_queue_length * 3)
+    # Positions are tickets: the order's queue number, or the stall's next one
+    ticket = order.queue_number or queue_number_allocator.next_number(db, order.stall_id)
+    estimated_wait_time = math.ceil(prep_time_model.wait_minutes(
+        order.stall_id, stall_queue_index.backlog_minutes(order.stall_id), prep_time_model.stall_minutes(order.stall_id)
+    ))
 
     db_queue_entry = QueueEntry(
         order_id=order.id,
         stall_id=order.stall_id,
-        queue_position=next_position,
+        queue_position=ticket,
         estimated_wait_time=estimated_wait_time,
+        # Orders without a pickup window are due now, on the campus clock like pickup windows
+        ready_by=order.pickup_window_start or campus_wall_clock(),
         status=QueueStatus.WAITING
     )
 
     db.add(db_queue_entry)
     db.commit()
     db.refresh(db_queue_entry)
-    return db_queue_entry
+    record_queue_change(db_queue_entry, current_user.id)
+    return build_queue_entry(db_queue_entry, indexed_place_in_line(db_queue_entry.order_id))
 
 @router.get("/position/{order_id}", response_model=QueuePositionResponse)
 def get_queue_position(
@@ -90,36 +277,41 @@ def get_queue_position(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    queue_entry = db.query(QueueEntry).options(
-        joinedload(QueueEntry.order)
-    ).filter(QueueEntry.order_id == order_id).first()
-
-    if not queue_entry:
-        raise HTTPException(status_code=404, detail="Order not in queue")
-
-    if queue_entry.order.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized to view this queue position")
-
-    orders_ahead = db.query(QueueEntry).filter(
-        QueueEntry.stall_id == queue_entry.stall_id,
-        QueueEntry.queue_position < queue_entry.queue_position,
-        QueueEntry.status.in_([QueueStatus.WAITING, QueueStatus.PREPARING])
-    ).count()
-
-    estimated_ready_time = None
-    if queue_entry.estimated_wait_time:
-        estimated_ready_time = queue_entry.joined_at + timedelta(minutes=queue_entry.estimated_wait_time)
-
-    return QueuePositionResponse(
-        order_id=order_id,
-        stall_id=queue_entry.stall_id,
-        queue_position=queue_entry.queue_position,
-        estimated_wait_time=queue_entry.estimated_wait_time,
-        orders_ahead=orders_ahead,
-        status=queue_entry.status,
-        joined_at=queue_entry.joined_at,
-        estimated_ready_time=estimated_ready_time
-    )
+    stall_queue_index.ensure_built(db)
+    place = stall_queue_index.position(order_id)
+    if place is not None:
+        if place.entry.user_id != current_user.id:
+            raise HTTPException(status_code=403, detail="Not authorized to view this queue position")
+        return build_indexed_queue_position(place)
+
+    # Collected or cancelled orders are no longer indexed
+    queue_entry = get_own_queue_entry(order_id, current_user, db)
+    return build_queue_position(queue_entry, *count_ahead(queue_entry, db), queue_entry.ready_at)
+
+@router.get("/position/{order_id}/events")
+def stream_queue_position(
+    order_id: int,
+    request: Request,
+    current_user: User = Depends(get_current_user_for_stream),
+    db: Session = Depends(get_db)
+):
+    """
+    Live queue position as Server-Sent Events, replacing polling of
+    GET /position/{order_id}. Sends a "position" event (same body as
+    GET /position/{order_id}) on connect and whenever the stall's queue
+    changes it; the stream ends once the order is collected or cancelled,
+    and reconnecting after that returns 204 so EventSource stops retrying.
+    """
+    queue_entry = get_own_queue_entry(order_id, current_user, db)
+    if queue_entry.status in FINISHED_QUEUE_STATUSES:
+        return Response(status_code=204)
+
+    stall_id = queue_entry.stall_id
+    # The stream reads with its own short-lived sessions instead of holding
+    # a pooled connection open for its lifetime
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=db.get_bind())
+    db.close()
+    return sse_response(queue_position_stream(request, order_id, stall_id, session_factory))
 
 @router.put("/{queue_id}/status", response_model=QueueEntryResponse)
 def update_queue_status(
@@ -141,21 +333,28 @@ def update_queue_status(
         raise HTTPException(status_code=403, detail="Not authorized to update this queue")
 
     queue_entry.status = status_update.status
+    previous_order_status = queue_entry.order.status
 
     if status_update.status == QueueStatus.PREPARING:
         queue_entry.order.status = OrderStatus.PREPARING
     elif status_update.status == QueueStatus.READY:
-        queue_entry.ready_at = datetime.now()
+        queue_entry.ready_at = datetime.utcnow()
         queue_entry.order.status = OrderStatus.READY
     elif status_update.status == QueueStatus.COLLECTED:
-        queue_entry.collected_at = datetime.now()
+        queue_entry.collected_at = datetime.utcnow()
         queue_entry.order.status = OrderStatus.COMPLETED
     elif status_update.status == QueueStatus.CANCELLED:
         queue_entry.order.status = OrderStatus.CANCELLED
 
+    order_changed = queue_entry.order.status != previous_order_status
     db.commit()
     db.refresh(queue_entry)
-    return queue_entry
+    if order_changed:
+        publish_order_event(queue_entry.stall_id, StallOrderSummary.model_validate(queue_entry.order))
+    record_queue_change(queue_entry, queue_entry.order.user_id)
+    if status_update.status == QueueStatus.READY:
+        prep_time_model.observe_order_ready(db, queue_entry)
+    return build_queue_entry(queue_entry, indexed_place_in_line(queue_entry.order_id))
 
 @router.put("/update", response_model=dict)
 def update_queue_positions(
@@ -166,39 +365,39 @@ def update_queue_positions(
     if current_user.role not in [UserRole.STALL_OWNER, UserRole.ADMIN]:
         raise HTTPException(status_code=403, detail="Not authorized to update queue positions")
 
-    completed_orders = []
-    stall_ids = set()
-
-    for order_id in update_request.completed_order_ids:
-        queue_entry = db.query(QueueEntry).options(
-            joinedload(QueueEntry.order),
-            joinedload(QueueEntry.stall)
-        ).filter(QueueEntry.order_id == order_id).first()
-
-        if not queue_entry:
-            continue
-
-        if (current_user.role != UserRole.ADMIN and
-            queue_entry.stall.owner_id != current_user.id):
-            continue
-
-        queue_entry.status = QueueStatus.COLLECTED
-        queue_entry.collected_at = datetime.now()
-        queue_entry.order.status = OrderStatus.COMPLETED
-
-        completed_orders.append(order_id)
-        stall_ids.add(queue_entry.stall_id)
-
-    for stall_id in stall_ids:
-        remaining_entries = db.query(QueueEntry).filter(
-            QueueEntry.stall_id == stall_id,
-            QueueEntry.status.in_([QueueStatus.WAITING, QueueStatus.PREPARING, QueueStatus.READY])
-        ).order_by(QueueEntry.queue_position).all()
-
-        for i, entry in enumerate(remaining_entries):
-            entry.queue_position = i + 1
+    # One query finds every requested entry the user may complete
+    query = db.query(QueueEntry.order_id, QueueEntry.stall_id).join(Stall, QueueEntry.stall_id == Stall.id).filter(
+        QueueEntry.order_id.in_(update_request.completed_order_ids)
+    )
+    if current_user.role != UserRole.ADMIN:
+        query = query.filter(Stall.owner_id == current_user.id)
+    stall_by_order = dict(query.all())
+
+    completed_orders = [order_id for order_id in dict.fromkeys(update_request.completed_order_ids) if order_id in stall_by_order]
+    stall_ids = set(stall_by_order.values())
+
+    completed_summaries = []
+    if completed_orders:
+        db.execute(
+            update(QueueEntry)
+            .where(QueueEntry.order_id.in_(completed_orders))
+            .values(status=QueueStatus.COLLECTED, collected_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        completed_summaries = [
+            StallOrderSummary.model_validate(row) for row in db.execute(
+                update(Order)
+                .where(Order.id.in_(completed_orders))
+                .values(status=OrderStatus.COMPLETED)
+                .returning(*ORDER_SUMMARY_COLUMNS)
+                .execution_options(synchronize_session=False)
+            )
+        ]
 
     db.commit()
+    for summary in completed_summaries:
+        publish_order_event(stall_by_order[summary.id], summary)
+    reload_queues(db, stall_ids)
 
     return {
         "message": f"Updated {len(completed_orders)} orders",
@@ -2,13 +2,14 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import func
 from typing import List
-from app.database.database import get_db
+from app.database.database import get_db, get_read_db
 from app.models.review import Review
 from app.models.stall import Stall
 from app.models.order import Order, OrderStatus
 from app.models.user import User
 from app.schemas.review import ReviewCreate, ReviewUpdate, ReviewResponse, ReviewWithUser, StallRatingStats
 from app.routes.auth import get_current_user
+from app.services.rating_stats import get_rating_stats, record_rating_change
 
 router = APIRouter()
 
@@ -62,12 +63,12 @@ def create_review(
     )
 
     db.add(db_review)
+    db.flush()
+    # Update stall rating aggregates in the same transaction
+    record_rating_change(db, review.stall_id, new_rating=db_review.rating)
     db.commit()
     db.refresh(db_review)
 
-    # Update stall average rating
-    update_stall_rating(review.stall_id, db)
-
     return db_review
 
 @router.get("/stall/{stall_id}", response_model=List[ReviewWithUser])
@@ -75,7 +76,7 @@ def get_stall_reviews(
     stall_id: int,
     skip: int = 0,
     limit: int = 50,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get all reviews for a stall"""
     stall = db.query(Stall).filter(Stall.id == stall_id).first()
@@ -107,39 +108,14 @@ def get_stall_reviews(
 @router.get("/stall/{stall_id}/stats", response_model=StallRatingStats)
 def get_stall_rating_stats(
     stall_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get rating statistics for a stall"""
     stall = db.query(Stall).filter(Stall.id == stall_id).first()
     if not stall:
         raise HTTPException(status_code=404, detail="Stall not found")
 
-    reviews = db.query(Review).filter(Review.stall_id == stall_id).all()
-
-    if not reviews:
-        return {
-            "stall_id": stall_id,
-            "average_rating": 0.0,
-            "total_reviews": 0,
-            "rating_distribution": {1: 0, 2: 0, 3: 0, 4: 0, 5: 0}
-        }
-
-    total_rating = sum(r.rating for r in reviews)
-    average_rating = round(total_rating / len(reviews), 1)
-
-    # Calculate rating distribution
-    rating_distribution = {1: 0, 2: 0, 3: 0, 4: 0, 5: 0}
-    for review in reviews:
-        rating_int = round(review.rating)
-        if rating_int in rating_distribution:
-            rating_distribution[rating_int] += 1
-
-    return {
-        "stall_id": stall_id,
-        "average_rating": average_rating,
-        "total_reviews": len(reviews),
-        "rating_distribution": rating_distribution
-    }
+    return get_rating_stats(db, stall_id)
 
 @router.get("/user/my-reviews", response_model=List[ReviewResponse])
 def get_user_reviews(
@@ -153,7 +129,7 @@ def get_user_reviews(
 @router.get("/{review_id}", response_model=ReviewResponse)
 def get_review(
     review_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get a specific review"""
     review = db.query(Review).filter(Review.id == review_id).first()
@@ -176,17 +152,19 @@ def update_review(
     if review.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to update this review")
 
+    old_rating = review.rating
     if review_update.rating is not None:
         review.rating = review_update.rating
     if review_update.comment is not None:
         review.comment = review_update.comment
 
+    db.flush()
+    if review.rating != old_rating:
+        # Update stall rating aggregates in the same transaction
+        record_rating_change(db, review.stall_id, old_rating=old_rating, new_rating=review.rating)
     db.commit()
     db.refresh(review)
 
-    # Update stall average rating
-    update_stall_rating(review.stall_id, db)
-
     return review
 
 @router.delete("/{review_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -203,27 +181,10 @@ def delete_review(
     if review.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to delete this review")
 
-    stall_id = review.stall_id
     db.delete(review)
+    db.flush()
+    # Update stall rating aggregates in the same transaction
+    record_rating_change(db, review.stall_id, old_rating=review.rating)
     db.commit()
 
-    # Update stall average rating
-    update_stall_rating(stall_id, db)
-
     return None
-
-def update_stall_rating(stall_id: int, db: Session):
-    """Helper function to update stall's average rating"""
-    reviews = db.query(Review).filter(Review.stall_id == stall_id).all()
-
-    if reviews:
-        average_rating = sum(r.rating for r in reviews) / len(reviews)
-        stall = db.query(Stall).filter(Stall.id == stall_id).first()
-        if stall:
-            stall.rating = round(average_rating, 1)
-            db.commit()
-    else:
-        stall = db.query(Stall).filter(Stall.id == stall_id).first()
-        if stall:
-            stall.rating = 0.0
-            db.commit()
@@ -1,44 +1,163 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from app.database.database import get_db
+from typing import List, Optional, Tuple
+from datetime import datetime
+import math
+from app.database.database import get_db, get_read_db, get_async_read_db
 from app.models.stall import Stall
 from app.schemas.stall import StallCreate, StallResponse, StallUpdate, StallWithDistance
 from app.routes.auth import get_current_user
 from app.models.user import User, UserRole
-from app.utils.distance import get_distance_and_time
+from app.utils.campus_time import campus_now
+from app.utils.distance import calculate_distances, get_distances_and_times
+from app.utils.pagination import NEXT_CURSOR_HEADER, encode_cursor, decode_cursor
+from app.services.menu_cache import menu_cache
+from app.services.menu_search import menu_search_index
+from app.services.prep_times import prep_time_model
+from app.services.spatial_index import KM_PER_DEGREE, stall_spatial_index
 
 router = APIRouter()
 
 @router.get("/", response_model=List[StallResponse])
-def get_all_stalls(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    stalls = db.query(Stall).offset(skip).limit(limit).all()
-    return stalls
+async def get_all_stalls(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_async_read_db)):
+    result = await db.execute(select(Stall).offset(skip).limit(limit))
+    return result.scalars().all()
+
+def is_stall_open_now(stall: Stall, now: datetime) -> bool:
+    """Check the is_open flag and, when set, the opening hours"""
+    if not stall.is_open:
+        return False
+    if stall.opening_time is None or stall.closing_time is None:
+        return True
+
+    current_time = now.time()
+    if stall.opening_time <= stall.closing_time:
+        return stall.opening_time <= current_time <= stall.closing_time
+    # Opening hours that run past midnight
+    return current_time >= stall.opening_time or current_time <= stall.closing_time
+
+def _stalls_within_radius(db: Session, lat: float, lng: float, radius_km: float, open_now: bool):
+    """Yield (sort_key, stall) within radius_km, closest first, using a SQL bounding-box prefilter"""
+    lat_delta = radius_km / KM_PER_DEGREE
+    cos_lat = math.cos(math.radians(lat))
+    lng_delta = radius_km / (KM_PER_DEGREE * cos_lat) if cos_lat > 1e-6 else 180.0
+
+    query = db.query(Stall).filter(
+        Stall.latitude.between(lat - lat_delta, lat + lat_delta),
+        Stall.longitude.between(lng - lng_delta, lng + lng_delta)
+    )
+    if open_now:
+        query = query.filter(Stall.is_open == True)
+    candidates = query.all()
+
+    distances = calculate_distances(
+        lat, lng,
+        [stall.latitude for stall in candidates],
+        [stall.longitude for stall in candidates],
+        precision=None
+    )
+    in_radius = [
+        ((distance, stall.id), stall)
+        for stall, distance in zip(candidates, distances)
+        if distance <= radius_km
+    ]
+    in_radius.sort(key=lambda item: item[0])
+    return iter(in_radius)
+
+def _stalls_by_proximity(db: Session, lat: float, lng: float, open_now: bool, after: Optional[Tuple[float, int]], chunk_size: int):
+    """Yield (sort_key, stall) for every stall, closest first, stalls without coordinates last"""
+    stall_spatial_index.ensure_fresh(db)
+
+    def load(keys):
+        query = db.query(Stall).filter(Stall.id.in_([stall_id for _, stall_id in keys]))
+        if open_now:
+            query = query.filter(Stall.is_open == True)
+        stalls_by_id = {stall.id: stall for stall in query.all()}
+        return [(key, stalls_by_id[key[1]]) for key in keys if key[1] in stalls_by_id]
+
+    # Rows are loaded chunk by chunk, so a page only reads the stalls it needs
+    chunk = []
+    for key in stall_spatial_index.iter_nearest(lat, lng):
+        if after is not None and key <= after:
+            continue
+        chunk.append(key)
+        if len(chunk) >= chunk_size:
+            yield from load(chunk)
+            chunk = []
+    if chunk:
+        yield from load(chunk)
+
+    query = db.query(Stall).filter((Stall.latitude.is_(None)) | (Stall.longitude.is_(None)))
+    if open_now:
+        query = query.filter(Stall.is_open == True)
+    if after is not None and after[0] == math.inf:
+        query = query.filter(Stall.id > after[1])
+    for stall in query.order_by(Stall.id).yield_per(chunk_size):
+        yield (math.inf, stall.id), stall
 
 @router.get("/nearby", response_model=List[StallWithDistance])
 def get_nearby_stalls(
+    response: Response,
     lat: float = Query(..., description="User's latitude"),
     lng: float = Query(..., description="User's longitude"),
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db)
+    radius_km: Optional[float] = Query(None, gt=0, description="Only return stalls within this distance"),
+    open_now: bool = Query(False, description="Only return stalls that are open right now"),
+    cursor: Optional[str] = Query(None, description=f"Value of the {NEXT_CURSOR_HEADER} header from the previous page"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1),
+    db: Session = Depends(get_read_db)
 ):
     """
     Get stalls sorted by distance from user's location.
     Returns stalls with distance and walking time information.
 
-    Example: /api/stalls/nearby?lat=1.347&lng=103.680
+    Pagination follows the distance ordering: when more stalls are available
+    the response carries an X-Next-Cursor header to pass back as `cursor`.
+
+    Example: /api/stalls/nearby?lat=1.347&lng=103.680&radius_km=1&open_now=true&limit=10
     """
-    # Get all stalls
-    stalls = db.query(Stall).offset(skip).limit(limit).all()
+    after = decode_cursor(cursor, (float, int)) if cursor else None
+    # Opening hours are campus wall-clock times, whatever the server's timezone
+    now = campus_now()
+
+    if radius_km is not None:
+        ordered = _stalls_within_radius(db, lat, lng, radius_km, open_now)
+    else:
+        ordered = _stalls_by_proximity(db, lat, lng, open_now, after, chunk_size=skip + limit + 1)
+
+    # Walk the distance-ordered stalls until one item past the page is found
+    page = []
+    skipped = 0
+    for key, stall in ordered:
+        if after is not None and key <= after:
+            continue
+        if open_now and not is_stall_open_now(stall, now):
+            continue
+        if skipped < skip:
+            skipped += 1
+            continue
+        page.append((key, stall))
+        if len(page) > limit:
+            break
+
+    if len(page) > limit:
+        page = page[:limit]
+        last_key = page[-1][0]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(*last_key)
+
+    stalls = [stall for _, stall in page]
+
+    # Calculate distance and walking time for the page in one batch
+    distances, walking_times = get_distances_and_times(
+        lat, lng,
+        [stall.latitude for stall in stalls],
+        [stall.longitude for stall in stalls]
+    )
 
-    # Calculate distance and walking time for each stall
     stalls_with_distance = []
-    for stall in stalls:
-        distance_km, walking_time = get_distance_and_time(
-            lat, lng, stall.latitude, stall.longitude
-        )
-
+    for stall, distance_km, walking_time in zip(stalls, distances, walking_times):
         # Convert stall to dict and add distance info
         stall_dict = {
             "id": stall.id,
@@ -62,16 +181,11 @@ def get_nearby_stalls(
         }
         stalls_with_distance.append(stall_dict)
 
-    # Sort by distance (closest first), putting stalls without coordinates at the end
-    stalls_with_distance.sort(
-        key=lambda x: (x["distance_km"] is None, x["distance_km"] or float('inf'))
-    )
-
     return stalls_with_distance
 
 @router.get("/{stall_id}", response_model=StallResponse)
-def get_stall(stall_id: int, db: Session = Depends(get_db)):
-    stall = db.query(Stall).filter(Stall.id == stall_id).first()
+async def get_stall(stall_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    stall = await db.get(Stall, stall_id)
     if not stall:
         raise HTTPException(status_code=404, detail="Stall not found")
     return stall
@@ -89,6 +203,8 @@ def create_stall(
     db.add(db_stall)
     db.commit()
     db.refresh(db_stall)
+    stall_spatial_index.upsert(db_stall.id, db_stall.latitude, db_stall.longitude)
+    prep_time_model.seed_stall(db_stall.id, db_stall.avg_prep_time, db_stall.max_concurrent_orders)
     return db_stall
 
 @router.put("/{stall_id}", response_model=StallResponse)
@@ -110,6 +226,8 @@ def update_stall(
 
     db.commit()
     db.refresh(stall)
+    stall_spatial_index.upsert(stall.id, stall.latitude, stall.longitude)
+    prep_time_model.seed_stall(stall.id, stall.avg_prep_time, stall.max_concurrent_orders)
     return stall
 
 @router.delete("/{stall_id}")
@@ -127,4 +245,7 @@ def delete_stall(
 
     db.delete(stall)
     db.commit()
+    stall_spatial_index.remove(stall_id)
+    menu_cache.invalidate([stall_id])
+    menu_search_index.refresh_stalls(db, [stall_id])
     return {"message": "Stall deleted successfully"}
\ No newline at end of file
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 
 class MenuItemBase(BaseModel):
     name: str
@@ -31,4 +31,16 @@ class MenuItemResponse(MenuItemBase):
     is_available: bool
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class MenuSearchResult(MenuItemResponse):
+    """Menu search hit; distance_km is set when searching near a location"""
+    distance_km: Optional[float] = None
+
+class MenuItemUpsert(MenuItemUpdate):
+    """Bulk upsert row: updates the item with this id, or creates one when id is omitted"""
+    id: Optional[int] = None
+
+class MenuAvailabilityUpdate(BaseModel):
+    item_ids: List[int]
+    is_available: bool
@@ -2,6 +2,7 @@ from pydantic import BaseModel, Field, validator
 from typing import Optional, List
 from datetime import datetime
 from app.models.order import OrderStatus, PaymentStatus
+from app.utils.campus_time import campus_wall_clock
 
 class OrderItemCreate(BaseModel):
     menu_item_id: int = Field(..., gt=0)
@@ -50,7 +51,7 @@ class OrderCreate(BaseModel):
 
     @validator('pickup_window_start')
     def validate_pickup_window_start(cls, v):
-        if v <= datetime.now():
+        if v <= campus_wall_clock():
             raise ValueError('Pickup time must be in the future')
         return v
 
@@ -100,6 +101,22 @@ class OrderSummary(BaseModel):
     class Config:
         from_attributes = True
 
+class StallOrderSummary(BaseModel):
+    """Slim stall order listing (view=summary), without line items"""
+    id: int
+    user_id: int
+    status: OrderStatus
+    payment_status: PaymentStatus
+    total_amount: float
+    queue_number: Optional[int] = None
+    order_number: Optional[str] = None
+    pickup_window_start: Optional[datetime] = None
+    pickup_window_end: Optional[datetime] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
 # Additional schemas for stall owner order management
 class ConfirmPaymentRequest(BaseModel):
     payment_confirmed: bool = True
@@ -13,15 +13,14 @@ class QueueEntryResponse(BaseModel):
     id: int
     order_id: int
     stall_id: int
-    queue_position: int
+    queue_position: Optional[int] = None  # place in line; None once the order has left the queue
+    ticket_number: int                    # stored queue ticket (gaps where orders left)
     status: QueueStatus
     estimated_wait_time: Optional[int] = None
     joined_at: datetime
     ready_at: Optional[datetime] = None
     collected_at: Optional[datetime] = None
-
-    class Config:
-        from_attributes = True
+    ready_by: Optional[datetime] = None
 
 class QueuePositionResponse(BaseModel):
     order_id: int
@@ -40,5 +39,18 @@ class StallQueueResponse(BaseModel):
     estimated_wait_time: Optional[int] = None
     queue_entries: List[QueueEntryResponse] = []
 
+class PickupSlotResponse(BaseModel):
+    start: datetime
+    end: datetime
+    capacity: Optional[int] = None
+    booked: int
+    available: bool
+
+class StallPickupSlotsResponse(BaseModel):
+    stall_id: int
+    slot_minutes: int
+    earliest_available: Optional[PickupSlotResponse] = None
+    slots: List[PickupSlotResponse] = []
+
 class QueueUpdateRequest(BaseModel):
     completed_order_ids: List[int] = Field(..., description="List of order IDs that have been completed")
\ No newline at end of file
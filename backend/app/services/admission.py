@@ -0,0 +1,103 @@
+"""
+Per-stall admission control
+Caps each stall's in-flight orders (waiting or preparing) at its
+max_concurrent_orders, and each of its pickup slots at what the kitchen
+can make in it (see pickup_slots). Counts come from the in-memory queue
+index plus checkouts this worker has admitted but not yet committed, so
+admitting an order never queries queue_entries. Rejected checkouts are
+offered the earliest pickup window the stall can meet.
+"""
+import math
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.services.pickup_slots import Slot, pickup_slots
+from app.services.queue_index import stall_queue_index
+from app.utils.campus_time import campus_wall_clock
+
+# Sent with the 409 for a checkout at a full stall
+NEXT_PICKUP_WINDOW_START_HEADER = "X-Next-Pickup-Window-Start"
+NEXT_PICKUP_WINDOW_END_HEADER = "X-Next-Pickup-Window-End"
+
+
+class StallAtCapacity(Exception):
+    """The stall already has max_concurrent_orders orders in flight"""
+
+    def __init__(self, stall_id: int, capacity: int, slot_frees_in: float):
+        super().__init__(f"Stall {stall_id} is at capacity ({capacity} orders)")
+        self.stall_id = stall_id
+        self.capacity = capacity
+        self.slot_frees_in = slot_frees_in  # minutes until the kitchen has finished enough orders to take another
+
+    def next_pickup_window(self, prep_minutes: float, window: timedelta) -> Tuple[datetime, datetime]:
+        """Earliest pickup window for an order admitted once a slot frees"""
+        start = campus_wall_clock() + timedelta(minutes=math.ceil(self.slot_frees_in + prep_minutes))
+        start = start.replace(second=0, microsecond=0)
+        return start, start + window
+
+
+class PickupSlotFull(Exception):
+    """The pickup slot holding the order's deadline is fully booked"""
+
+    def __init__(self, stall_id: int, capacity: int, next_free_slot: Optional[Slot]):
+        super().__init__(f"Stall {stall_id} pickup slot is full ({capacity} orders)")
+        self.stall_id = stall_id
+        self.capacity = capacity
+        self.next_free_slot = next_free_slot
+
+
+class StallAdmission:
+    """Counts in-flight orders per stall and admits checkouts below capacity"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Deadlines of checkouts admitted but not yet in the queue index, per stall
+        self._admitting: Dict[int, List[datetime]] = {}
+
+    def in_flight(self, stall_id: int) -> int:
+        with self._lock:
+            return stall_queue_index.queue_length(stall_id) + len(self._admitting.get(stall_id, ()))
+
+    @contextmanager
+    def admit(self, stall_id: int, max_concurrent_orders: Optional[int], ready_by: datetime) -> Iterator[None]:
+        """
+        Hold the order's place in the stall's in-flight orders and in its
+        pickup slot while it is written; wrap the checkout up to and
+        including its queue index update. Raises StallAtCapacity when the
+        stall has max_concurrent_orders in flight, or PickupSlotFull when
+        the slot holding ready_by is fully booked. None means unlimited.
+        """
+        with self._lock:
+            queued = stall_queue_index.queue_length(stall_id)
+            admitting = self._admitting.setdefault(stall_id, [])
+            if max_concurrent_orders is not None and queued + len(admitting) >= max_concurrent_orders:
+                # Orders are made in queue order, so a place frees once enough of the queued ones are done
+                must_finish = min(queued + len(admitting) - max_concurrent_orders + 1, queued)
+                raise StallAtCapacity(
+                    stall_id, max_concurrent_orders, stall_queue_index.minutes_for_first(stall_id, must_finish)
+                )
+
+            slot_capacity = pickup_slots.capacity(stall_id, max_concurrent_orders)
+            if slot_capacity is not None and pickup_slots.booked(stall_id, pickup_slots.slot_of(ready_by), admitting) >= slot_capacity:
+                raise PickupSlotFull(
+                    stall_id, slot_capacity, pickup_slots.earliest_free(stall_id, slot_capacity, ready_by, admitting)
+                )
+            admitting.append(ready_by)
+
+        try:
+            yield
+        finally:
+            with self._lock:
+                admitting = self._admitting[stall_id]
+                admitting.remove(ready_by)
+                if not admitting:
+                    del self._admitting[stall_id]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._admitting.clear()
+
+
+stall_admission = StallAdmission()
@@ -0,0 +1,221 @@
+"""
+Idempotency-Key store for retried POST requests
+Remembers the response of a completed request for a limited time so that
+client retries (flaky campus Wi-Fi) get the original response back instead
+of creating a duplicate order. A reservation for a request still in flight
+is only held for a short lease; if the request dies without completing or
+releasing it, a retry takes the key over once the lease runs out.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+
+from app.config import settings
+from app.database.database import SessionLocal
+from app.models.idempotency import IdempotencyRecord
+
+logger = logging.getLogger(__name__)
+
+# Results of IdempotencyStore.begin()
+NEW = "new"                  # Caller owns the key and must complete() or release() it
+IN_PROGRESS = "in_progress"  # Another request with this key is still running (lease not expired)
+COMPLETED = "completed"      # Replay the stored response
+MISMATCH = "mismatch"        # Key reused with a different request body
+
+
+@dataclass
+class StoredResponse:
+    status_code: int
+    body: object
+
+
+def request_fingerprint(payload: dict) -> str:
+    """Stable hash of a request body, used to detect key reuse"""
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class InMemoryIdempotencyStore:
+    """Per-process LRU of idempotency keys with a TTL"""
+
+    def __init__(self, max_keys: int, ttl_seconds: int, lock_seconds: int):
+        self.max_keys = max_keys
+        self.ttl_seconds = ttl_seconds
+        self.lock_seconds = lock_seconds
+        self._lock = threading.Lock()
+        # key -> (expires_at, request_hash, StoredResponse or None while in flight).
+        # In-flight entries expire when their lease does.
+        self._entries: "OrderedDict[str, Tuple[float, str, Optional[StoredResponse]]]" = OrderedDict()
+
+    def _evict(self) -> None:
+        """Drop least recently used completed keys; in-flight keys are never evicted"""
+        excess = len(self._entries) - self.max_keys
+        if excess <= 0:
+            return
+        victims = []
+        for key, (_, _, response) in self._entries.items():
+            if response is not None:
+                victims.append(key)
+                if len(victims) == excess:
+                    break
+        for key in victims:
+            del self._entries[key]
+
+    def begin(self, key: str, request_hash: str) -> Tuple[str, Optional[StoredResponse]]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._entries[key]
+                entry = None
+
+            if entry is None:
+                self._entries[key] = (now + self.lock_seconds, request_hash, None)
+                self._evict()
+                return NEW, None
+
+            self._entries.move_to_end(key)
+            expires_at, stored_hash, response = entry
+            if stored_hash != request_hash:
+                return MISMATCH, None
+            if response is None:
+                return IN_PROGRESS, None
+            return COMPLETED, response
+
+    def complete(self, key: str, status_code: int, body: object) -> None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = (time.monotonic() + self.ttl_seconds, entry[1], StoredResponse(status_code, body))
+                self._evict()
+
+    def release(self, key: str) -> None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] is None:
+                del self._entries[key]
+
+
+class DatabaseIdempotencyStore:
+    """Idempotency keys in the idempotency_keys table, shared by every worker"""
+
+    # Expired rows are purged every this many begin() calls
+    PURGE_EVERY = 100
+
+    def __init__(self, ttl_seconds: int, lock_seconds: int, session_factory=SessionLocal):
+        self.ttl_seconds = ttl_seconds
+        self.lock_seconds = lock_seconds
+        self._session_factory = session_factory
+        self._calls = 0
+
+    def _session(self):
+        # Reservations commit on their own session, independent of the request transaction
+        return self._session_factory()
+
+    def _take_over(self, db, key: str, request_hash: str, now: datetime) -> bool:
+        """Claim a reservation whose lease ran out; only one retry can win it"""
+        claimed = db.query(IdempotencyRecord).filter(
+            IdempotencyRecord.key == key,
+            IdempotencyRecord.status_code.is_(None),
+            # NULL: reserved before leases existed
+            or_(IdempotencyRecord.locked_until.is_(None), IdempotencyRecord.locked_until <= now)
+        ).update({
+            "request_hash": request_hash,
+            "locked_until": now + timedelta(seconds=self.lock_seconds),
+            "expires_at": now + timedelta(seconds=self.ttl_seconds)
+        }, synchronize_session=False)
+        db.commit()
+        return claimed == 1
+
+    def begin(self, key: str, request_hash: str) -> Tuple[str, Optional[StoredResponse]]:
+        db = self._session()
+        try:
+            now = datetime.utcnow()
+            self._calls += 1
+            if self._calls % self.PURGE_EVERY == 0:
+                db.query(IdempotencyRecord).filter(IdempotencyRecord.expires_at <= now).delete()
+                db.commit()
+
+            record = db.query(IdempotencyRecord).filter(IdempotencyRecord.key == key).first()
+            if record is not None and record.expires_at <= now:
+                db.delete(record)
+                db.commit()
+                record = None
+
+            if record is None:
+                db.add(IdempotencyRecord(
+                    key=key,
+                    request_hash=request_hash,
+                    locked_until=now + timedelta(seconds=self.lock_seconds),
+                    expires_at=now + timedelta(seconds=self.ttl_seconds)
+                ))
+                try:
+                    db.commit()
+                    return NEW, None
+                except IntegrityError:
+                    # Another worker reserved the key first
+                    db.rollback()
+                    record = db.query(IdempotencyRecord).filter(IdempotencyRecord.key == key).first()
+                    if record is None:
+                        return IN_PROGRESS, None
+
+            if record.status_code is None and (record.locked_until is None or record.locked_until <= now):
+                # The first attempt died without completing or releasing the key
+                if self._take_over(db, key, request_hash, now):
+                    return NEW, None
+                return IN_PROGRESS, None
+
+            if record.request_hash != request_hash:
+                return MISMATCH, None
+            if record.status_code is None:
+                return IN_PROGRESS, None
+            return COMPLETED, StoredResponse(record.status_code, json.loads(record.response_body))
+        finally:
+            db.close()
+
+    def complete(self, key: str, status_code: int, body: object) -> None:
+        db = self._session()
+        try:
+            db.query(IdempotencyRecord).filter(IdempotencyRecord.key == key).update({
+                "status_code": status_code,
+                "response_body": json.dumps(body, default=str),
+                "locked_until": None
+            })
+            db.commit()
+        except Exception:
+            # The request itself succeeded; the client still gets its response
+            # and a retry can take the key over once the lease expires
+            logger.exception(f"Failed to store the response for idempotency key {key}")
+            db.rollback()
+        finally:
+            db.close()
+
+    def release(self, key: str) -> None:
+        db = self._session()
+        try:
+            db.query(IdempotencyRecord).filter(
+                IdempotencyRecord.key == key,
+                IdempotencyRecord.status_code.is_(None)
+            ).delete()
+            db.commit()
+        finally:
+            db.close()
+
+
+def create_idempotency_store():
+    if settings.IDEMPOTENCY_BACKEND == "database":
+        return DatabaseIdempotencyStore(settings.IDEMPOTENCY_TTL_SECONDS, settings.IDEMPOTENCY_LOCK_SECONDS)
+    return InMemoryIdempotencyStore(
+        settings.IDEMPOTENCY_MAX_KEYS, settings.IDEMPOTENCY_TTL_SECONDS, settings.IDEMPOTENCY_LOCK_SECONDS
+    )
+
+
+idempotency_store = create_idempotency_store()
@@ -0,0 +1,102 @@
+"""
+Per-stall menu cache
+Keeps each stall's serialized menu and its ETag in memory so menu reads
+skip the database. Every menu write bumps the stall's version, which drops
+the cached menu; a read that loaded rows before a write is never cached.
+With a shared event broker, invalidations reach the other workers as
+"menu.changed" events; without one, cached menus expire after a few
+minutes so every worker converges.
+"""
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Tuple
+
+from app.services.stall_events import StallEvent, stall_event_hub
+from app.utils.http_cache import strong_etag
+
+MENU_CHANGED = "menu.changed"
+
+
+@dataclass(frozen=True)
+class CachedMenu:
+    body: bytes
+    etag: str
+    stored_at: float  # time.monotonic()
+
+
+class MenuCache:
+    """Versioned cache of serialized stall menus"""
+
+    def __init__(self, max_age_seconds: int = 300):
+        """
+        Args:
+            max_age_seconds: Reload a menu from the database after this long, so
+                workers that missed a menu write still converge
+        """
+        self.max_age_seconds = max_age_seconds
+
+        self._lock = threading.Lock()
+        self._menus: Dict[int, CachedMenu] = {}
+        self._versions: Dict[int, int] = {}
+        # Bumped by clear(), which invalidates stalls this worker hasn't cached yet too
+        self._epoch = 0
+
+    def get(self, stall_id: int) -> Optional[CachedMenu]:
+        menu = self._menus.get(stall_id)
+        if menu is None or time.monotonic() - menu.stored_at > self.max_age_seconds:
+            return None
+        return menu
+
+    def version(self, stall_id: int) -> Tuple[int, int]:
+        """Read before loading a menu and pass to store()"""
+        with self._lock:
+            return self._epoch, self._versions.get(stall_id, 0)
+
+    def store(self, stall_id: int, version: Tuple[int, int], body: bytes) -> CachedMenu:
+        """Cache a freshly serialized menu unless the stall changed while it was loaded"""
+        menu = CachedMenu(body=body, etag=strong_etag(body), stored_at=time.monotonic())
+        with self._lock:
+            if (self._epoch, self._versions.get(stall_id, 0)) == version:
+                self._menus[stall_id] = menu
+        return menu
+
+    def invalidate(self, stall_ids: Iterable[int], publish: bool = True) -> None:
+        """Drop stalls' cached menus; call after the menu write commits"""
+        stall_ids = set(stall_ids)
+        with self._lock:
+            for stall_id in stall_ids:
+                self._versions[stall_id] = self._versions.get(stall_id, 0) + 1
+                self._menus.pop(stall_id, None)
+        if publish:
+            for stall_id in stall_ids:
+                if stall_event_hub.has_listeners(stall_id):
+                    stall_event_hub.publish(stall_id, MENU_CHANGED, {})
+
+    def clear(self) -> None:
+        """Drop every cached menu (e.g. the broker reconnected and may have missed invalidations)"""
+        with self._lock:
+            self._epoch += 1
+            self._menus.clear()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._menus.clear()
+            self._versions.clear()
+            self._epoch = 0
+
+
+menu_cache = MenuCache()
+
+
+def apply_remote_menu_change(event: StallEvent) -> None:
+    """Drop menus other workers changed"""
+    if stall_event_hub.is_local(event):
+        return
+    if event.type == MENU_CHANGED:
+        menu_cache.invalidate([event.stall_id], publish=False)
+    elif event.type == "resync":
+        menu_cache.clear()
+
+
+stall_event_hub.add_listener(apply_remote_menu_change)
@@ -0,0 +1,258 @@
+"""
+Campus-wide menu search index
+Keeps every menu item in memory under a dense slot number. Each search term
+maps to a bitset (a Python int) of the slots whose name, description or
+category contain it, and the dietary flags, availability and stall
+membership have bitsets of their own, so a query is a handful of ANDs
+before price and distance are checked on the survivors.
+"""
+import logging
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Optional, Set
+
+from sqlalchemy.orm import Session
+
+from app.models.menu import MenuItem
+from app.services.menu_cache import MENU_CHANGED
+from app.services.stall_events import StallEvent, stall_event_hub
+
+logger = logging.getLogger(__name__)
+
+FACETS = ("is_vegetarian", "is_halal", "is_available")
+
+MENU_ITEM_COLUMNS = (
+    MenuItem.id, MenuItem.stall_id, MenuItem.name, MenuItem.description, MenuItem.category,
+    MenuItem.price, MenuItem.prep_time, MenuItem.image_url,
+    MenuItem.is_vegetarian, MenuItem.is_halal, MenuItem.is_available,
+)
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def _normalize(token: str) -> str:
+    """Fold simple plurals so "noodles" finds "noodle" and vice versa"""
+    if len(token) > 4 and token.endswith("es") and token[-3] in "sxz":
+        return token[:-2]
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(*texts: Optional[str]) -> Set[str]:
+    return {_normalize(token) for text in texts if text for token in _TOKEN.findall(text.lower())}
+
+
+def _slots(bits: int) -> Iterator[int]:
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+@dataclass(frozen=True)
+class IndexedMenuItem:
+    id: int
+    stall_id: int
+    name: str
+    description: Optional[str]
+    category: Optional[str]
+    price: float
+    prep_time: Optional[int]
+    image_url: Optional[str]
+    is_vegetarian: bool
+    is_halal: bool
+    is_available: bool
+    terms: FrozenSet[str]
+    name_terms: FrozenSet[str]
+
+
+class MenuSearchIndex:
+    """Inverted index with facet bitsets over every stall's menu"""
+
+    def __init__(self, max_age_seconds: int = 300):
+        """
+        Args:
+            max_age_seconds: Rebuild from the database after this long, so
+                workers that missed a menu write still converge
+        """
+        self.max_age_seconds = max_age_seconds
+
+        self._lock = threading.Lock()
+        self._items: List[Optional[IndexedMenuItem]] = []
+        self._slot_by_item: Dict[int, int] = {}
+        self._free_slots: List[int] = []
+        self._postings: Dict[str, int] = {}
+        self._facets: Dict[str, int] = {facet: 0 for facet in FACETS}
+        self._stalls: Dict[int, int] = {}
+        self._live = 0
+        self._dirty_stalls: Set[int] = set()
+        self._built_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._slot_by_item)
+
+    @property
+    def is_built(self) -> bool:
+        return self._built_at is not None
+
+    @property
+    def is_stale(self) -> bool:
+        return self._built_at is None or time.monotonic() - self._built_at > self.max_age_seconds
+
+    def _add(self, row) -> None:
+        if row.id in self._slot_by_item:
+            self._remove(row.id)
+        item = IndexedMenuItem(
+            id=row.id, stall_id=row.stall_id, name=row.name, description=row.description,
+            category=row.category, price=row.price, prep_time=row.prep_time, image_url=row.image_url,
+            is_vegetarian=bool(row.is_vegetarian), is_halal=bool(row.is_halal),
+            is_available=bool(row.is_available),
+            terms=frozenset(tokenize(row.name, row.description, row.category)),
+            name_terms=frozenset(tokenize(row.name)),
+        )
+        if self._free_slots:
+            slot = self._free_slots.pop()
+            self._items[slot] = item
+        else:
+            slot = len(self._items)
+            self._items.append(item)
+        self._slot_by_item[item.id] = slot
+
+        bit = 1 << slot
+        self._live |= bit
+        for term in item.terms:
+            self._postings[term] = self._postings.get(term, 0) | bit
+        for facet in FACETS:
+            if getattr(item, facet):
+                self._facets[facet] |= bit
+        self._stalls[item.stall_id] = self._stalls.get(item.stall_id, 0) | bit
+
+    def _remove(self, item_id: int) -> None:
+        slot = self._slot_by_item.pop(item_id)
+        item = self._items[slot]
+        self._items[slot] = None
+        self._free_slots.append(slot)
+
+        mask = ~(1 << slot)
+        self._live &= mask
+        for term in item.terms:
+            remaining = self._postings[term] & mask
+            if remaining:
+                self._postings[term] = remaining
+            else:
+                del self._postings[term]
+        for facet in FACETS:
+            self._facets[facet] &= mask
+        remaining = self._stalls[item.stall_id] & mask
+        if remaining:
+            self._stalls[item.stall_id] = remaining
+        else:
+            del self._stalls[item.stall_id]
+
+    def rebuild(self, db: Session) -> None:
+        """Reload every menu item from the database"""
+        rows = db.query(*MENU_ITEM_COLUMNS).all()
+        with self._lock:
+            self.reset()
+            for row in rows:
+                self._add(row)
+            self._built_at = time.monotonic()
+        logger.debug(f"Menu search index rebuilt with {len(rows)} items and {len(self._postings)} terms")
+
+    def refresh_stalls(self, db: Session, stall_ids: Iterable[int]) -> None:
+        """Reindex the stalls' menus; call after a menu write commits"""
+        stall_ids = set(stall_ids)
+        if not stall_ids or not self.is_built:
+            return
+        rows = db.query(*MENU_ITEM_COLUMNS).filter(MenuItem.stall_id.in_(stall_ids)).all()
+        with self._lock:
+            for stall_id in stall_ids:
+                for slot in list(_slots(self._stalls.get(stall_id, 0))):
+                    self._remove(self._items[slot].id)
+            for row in rows:
+                self._add(row)
+            self._dirty_stalls -= stall_ids
+
+    def mark_dirty(self, stall_ids: Iterable[int]) -> None:
+        """Reindex the stalls on the next search (their menus changed on another worker)"""
+        with self._lock:
+            self._dirty_stalls.update(stall_ids)
+
+    def expire(self) -> None:
+        """Rebuild from the database on the next search"""
+        self._built_at = None
+
+    def ensure_fresh(self, db: Session) -> None:
+        """Build the index if needed and pick up menus other workers changed"""
+        if self.is_stale:
+            self.rebuild(db)
+        elif self._dirty_stalls:
+            self.refresh_stalls(db, set(self._dirty_stalls))
+
+    def search(
+        self,
+        query: Optional[str] = None,
+        stall_ids: Optional[Iterable[int]] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        **facets: Optional[bool]
+    ) -> List[IndexedMenuItem]:
+        """
+        Items containing every query term, limited to stall_ids when given
+        and to the facets set to True or False (is_vegetarian, is_halal,
+        is_available). Best name matches come first, then cheapest.
+        """
+        terms = tokenize(query)
+        with self._lock:
+            bits = self._live
+            for term in terms:
+                bits &= self._postings.get(term, 0)
+                if not bits:
+                    return []
+            for facet, wanted in facets.items():
+                if wanted is None:
+                    continue
+                bits &= self._facets[facet] if wanted else ~self._facets[facet]
+            if stall_ids is not None:
+                in_stalls = 0
+                for stall_id in stall_ids:
+                    in_stalls |= self._stalls.get(stall_id, 0)
+                bits &= in_stalls
+            matches = [self._items[slot] for slot in _slots(bits)]
+
+        matches = [
+            item for item in matches
+            if (min_price is None or item.price >= min_price) and (max_price is None or item.price <= max_price)
+        ]
+        matches.sort(key=lambda item: (-len(terms & item.name_terms), item.price, item.id))
+        return matches
+
+    def reset(self) -> None:
+        self._items = []
+        self._slot_by_item = {}
+        self._free_slots = []
+        self._postings = {}
+        self._facets = {facet: 0 for facet in FACETS}
+        self._stalls = {}
+        self._live = 0
+        self._dirty_stalls = set()
+        self._built_at = None
+
+
+menu_search_index = MenuSearchIndex()
+
+
+def apply_remote_menu_change(event: StallEvent) -> None:
+    """Reindex menus other workers changed on the next search"""
+    if stall_event_hub.is_local(event):
+        return
+    if event.type == MENU_CHANGED:
+        menu_search_index.mark_dirty([event.stall_id])
+    elif event.type == "resync":
+        menu_search_index.expire()
+
+
+stall_event_hub.add_listener(apply_remote_menu_change)
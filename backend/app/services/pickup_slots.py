@@ -0,0 +1,85 @@
+"""
+Pickup slot scheduling
+Buckets each stall's orders into fixed pickup slots by deadline (their
+pickup window start) and caps every slot at what the kitchen can make in
+it: max_concurrent_orders orders at a time, each taking the stall's
+learned prep minutes. Bookings are counted from the in-memory queue index,
+which keeps each stall's entries sorted by deadline, so a slot's bookings
+are two binary searches.
+"""
+import math
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Tuple
+
+from app.config import settings
+from app.services.prep_times import prep_time_model
+from app.services.queue_index import stall_queue_index
+
+Slot = Tuple[datetime, datetime]
+
+# How far ahead to look for a free slot
+SEARCH_HORIZON = timedelta(hours=24)
+
+
+class PickupSlots:
+    """Fixed-length pickup slots per stall, capped by kitchen throughput"""
+
+    def __init__(self, slot_minutes: int = 15):
+        self.slot_length = timedelta(minutes=slot_minutes)
+
+    def slot_of(self, when: datetime) -> Slot:
+        """The slot containing when; slots are aligned to the start of the day"""
+        midnight = when.replace(hour=0, minute=0, second=0, microsecond=0)
+        start = midnight + ((when - midnight) // self.slot_length) * self.slot_length
+        return start, start + self.slot_length
+
+    def capacity(self, stall_id: int, max_concurrent_orders: Optional[int]) -> Optional[int]:
+        """Orders the kitchen can have ready within one slot; None means unlimited"""
+        if max_concurrent_orders is None:
+            return None
+        slot_minutes = self.slot_length.total_seconds() / 60
+        return max(1, math.floor(max_concurrent_orders * slot_minutes / prep_time_model.stall_minutes(stall_id)))
+
+    def booked(self, stall_id: int, slot: Slot, pending: Iterable[datetime] = ()) -> int:
+        """Active orders due in the slot, plus deadlines of checkouts not yet indexed"""
+        start, end = slot
+        return stall_queue_index.due_between(stall_id, start, end) + sum(1 for due in pending if start <= due < end)
+
+    def earliest_free(
+        self,
+        stall_id: int,
+        capacity: Optional[int],
+        after: datetime,
+        pending: Iterable[datetime] = ()
+    ) -> Optional[Slot]:
+        """First slot at or after the one containing after with room left"""
+        pending = list(pending)
+        slot = self.slot_of(after)
+        horizon = after + SEARCH_HORIZON
+        while slot[0] < horizon:
+            if capacity is None or self.booked(stall_id, slot, pending) < capacity:
+                return slot
+            slot = (slot[1], slot[1] + self.slot_length)
+        return None
+
+    def describe(self, stall_id: int, capacity: Optional[int], slot: Slot) -> dict:
+        booked = self.booked(stall_id, slot)
+        return {
+            "start": slot[0],
+            "end": slot[1],
+            "capacity": capacity,
+            "booked": booked,
+            "available": capacity is None or booked < capacity,
+        }
+
+    def upcoming(self, stall_id: int, capacity: Optional[int], start: datetime, count: int) -> List[dict]:
+        """Bookings of count consecutive slots from the one containing start"""
+        slots = []
+        slot = self.slot_of(start)
+        for _ in range(count):
+            slots.append(self.describe(stall_id, capacity, slot))
+            slot = (slot[1], slot[1] + self.slot_length)
+        return slots
+
+
+pickup_slots = PickupSlots(slot_minutes=settings.PICKUP_SLOT_MINUTES)
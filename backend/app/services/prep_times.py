@@ -0,0 +1,199 @@
+"""
+Learned prep times for ETAs
+Keeps an exponentially weighted moving average of how long each stall
+takes per order and how long each menu item takes, learned from queue
+entries as they are marked ready. Every ETA (checkout, queue position,
+order listings) comes from the same model: the kitchen makes up to
+max_concurrent_orders orders at once, so the orders ahead take their prep
+minutes divided by that, counted from when a kitchen slot last came free.
+Timestamps are naive UTC, like QueueEntry.joined_at.
+"""
+import bisect
+import logging
+import math
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.menu import MenuItem
+from app.models.order import OrderItem
+from app.models.queue import QueueEntry
+from app.models.stall import Stall
+
+logger = logging.getLogger(__name__)
+
+# Stall.avg_prep_time and MenuItem.prep_time defaults
+DEFAULT_STALL_MINUTES = 15
+DEFAULT_ITEM_MINUTES = 10
+# Observations outside this range are bad data (e.g. an order marked ready the next day)
+MIN_OBSERVED_MINUTES = 0.5
+MAX_OBSERVED_MINUTES = 180
+HISTORY_DAYS = 14
+
+ItemPrepTime = Tuple[int, Optional[int]]  # (menu_item_id, MenuItem.prep_time)
+
+
+class PrepTimeModel:
+    """Per-stall and per-menu-item prep time EWMAs"""
+
+    def __init__(self, alpha: float = 0.2):
+        """
+        Args:
+            alpha: Weight of each new observation; higher adapts faster
+        """
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        self._stall_seeds: Dict[int, float] = {}
+        self._stall_minutes: Dict[int, float] = {}
+        self._item_minutes: Dict[int, float] = {}
+        self._concurrency: Dict[int, int] = {}
+        # Latest ready times per stall, oldest first, one per kitchen slot
+        self._recent_ready: Dict[int, List[datetime]] = {}
+        self._built = False
+
+    def rebuild(self, db: Session) -> None:
+        """Seed stalls from avg_prep_time and max_concurrent_orders and replay recent ready orders"""
+        stalls = db.query(Stall.id, Stall.avg_prep_time, Stall.max_concurrent_orders).all()
+
+        history = db.query(QueueEntry.order_id, QueueEntry.stall_id, QueueEntry.joined_at, QueueEntry.ready_at).filter(
+            QueueEntry.ready_at.isnot(None),
+            QueueEntry.ready_at >= datetime.utcnow() - timedelta(days=HISTORY_DAYS)
+        ).order_by(QueueEntry.ready_at).all()
+        items_by_order = self._load_items(db, [row.order_id for row in history])
+
+        with self._lock:
+            self._stall_seeds = {stall_id: float(minutes) for stall_id, minutes, _ in stalls if minutes}
+            self._concurrency = {stall_id: concurrency for stall_id, _, concurrency in stalls if concurrency}
+            self._stall_minutes.clear()
+            self._item_minutes.clear()
+            self._recent_ready.clear()
+            for row in history:
+                self._observe_locked(row.stall_id, row.joined_at, row.ready_at, items_by_order.get(row.order_id, []))
+            self._built = True
+
+        logger.debug(f"Prep time model rebuilt from {len(history)} ready orders")
+
+    def ensure_built(self, db: Session) -> None:
+        if not self._built:
+            self.rebuild(db)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stall_seeds.clear()
+            self._stall_minutes.clear()
+            self._item_minutes.clear()
+            self._concurrency.clear()
+            self._recent_ready.clear()
+            self._built = False
+
+    def seed_stall(self, stall_id: int, avg_prep_time: Optional[int], max_concurrent_orders: Optional[int] = None) -> None:
+        """
+        Prior for a stall with no observations yet (its configured
+        avg_prep_time), and how many orders its kitchen makes at once
+        (uncapped stalls are assumed to make one at a time)
+        """
+        with self._lock:
+            if avg_prep_time:
+                self._stall_seeds[stall_id] = float(avg_prep_time)
+            if max_concurrent_orders:
+                self._concurrency[stall_id] = max_concurrent_orders
+            else:
+                self._concurrency.pop(stall_id, None)
+
+    def concurrency(self, stall_id: int) -> int:
+        """Orders the stall's kitchen works on at once"""
+        return self._concurrency.get(stall_id, 1)
+
+    def stall_minutes(self, stall_id: int) -> float:
+        """Expected prep minutes for an order at the stall whose items are unknown"""
+        return self._stall_minutes.get(stall_id) or self._stall_seeds.get(stall_id, DEFAULT_STALL_MINUTES)
+
+    def _item_estimate(self, menu_item_id: int, prep_time: Optional[int]) -> float:
+        return self._item_minutes.get(menu_item_id) or float(prep_time or DEFAULT_ITEM_MINUTES)
+
+    def order_minutes(self, stall_id: int, items: Iterable[ItemPrepTime]) -> int:
+        """Expected prep minutes for an order; items are cooked in parallel, so the slowest one sets it"""
+        estimates = [self._item_estimate(menu_item_id, prep_time) for menu_item_id, prep_time in items]
+        return math.ceil(max(estimates) if estimates else self.stall_minutes(stall_id))
+
+    def estimate_ready_time(
+        self,
+        stall_id: int,
+        joined_at: datetime,
+        minutes_ahead: float,
+        own_minutes: float
+    ) -> datetime:
+        """When an order should be ready: the orders ahead, then its own, from when a kitchen slot was last free"""
+        free_at = self._slot_free_at(stall_id)
+        start = max(joined_at, free_at) if free_at else joined_at
+        # Never promise a time that has already passed
+        return max(start + timedelta(minutes=self.wait_minutes(stall_id, minutes_ahead, own_minutes)), datetime.utcnow())
+
+    def wait_minutes(self, stall_id: int, minutes_ahead: float, own_minutes: float) -> float:
+        """Minutes until an order is ready once started: the orders ahead share the kitchen's slots"""
+        return minutes_ahead / self.concurrency(stall_id) + own_minutes
+
+    def _slot_free_at(self, stall_id: int) -> Optional[datetime]:
+        """When the kitchen last had a slot free, or None if it hasn't filled every slot yet"""
+        recent = self._recent_ready.get(stall_id, [])
+        return recent[0] if len(recent) >= self.concurrency(stall_id) else None
+
+    def observe_ready(
+        self,
+        stall_id: int,
+        joined_at: datetime,
+        ready_at: datetime,
+        items: List[ItemPrepTime]
+    ) -> None:
+        """Learn from an order that was just marked ready"""
+        with self._lock:
+            self._observe_locked(stall_id, joined_at, ready_at, items)
+
+    def _observe_locked(self, stall_id: int, joined_at: datetime, ready_at: datetime, items: List[ItemPrepTime]) -> None:
+        # The kitchen started on this order once it arrived and a slot was free
+        free_at = self._slot_free_at(stall_id)
+        started_at = max(joined_at, free_at) if free_at else joined_at
+        recent = self._recent_ready.setdefault(stall_id, [])
+        bisect.insort(recent, ready_at)
+        del recent[:-self.concurrency(stall_id)]
+
+        observed = (ready_at - started_at).total_seconds() / 60
+        if not MIN_OBSERVED_MINUTES <= observed <= MAX_OBSERVED_MINUTES:
+            return
+
+        current = self.stall_minutes(stall_id)
+        self._stall_minutes[stall_id] = current + self.alpha * (observed - current)
+
+        # Scale every item by the same factor the order as a whole was off by
+        estimates = {menu_item_id: self._item_estimate(menu_item_id, prep_time) for menu_item_id, prep_time in items}
+        if estimates:
+            slowest = max(estimates.values())
+            for menu_item_id, estimate in estimates.items():
+                target = observed * estimate / slowest
+                self._item_minutes[menu_item_id] = estimate + self.alpha * (target - estimate)
+
+    def _load_items(self, db: Session, order_ids: List[int]) -> Dict[int, List[ItemPrepTime]]:
+        if not order_ids:
+            return {}
+        rows = db.query(OrderItem.order_id, MenuItem.id, MenuItem.prep_time).join(
+            MenuItem, OrderItem.menu_item_id == MenuItem.id
+        ).filter(OrderItem.order_id.in_(order_ids)).all()
+        items_by_order: Dict[int, List[ItemPrepTime]] = {}
+        for order_id, menu_item_id, prep_time in rows:
+            items_by_order.setdefault(order_id, []).append((menu_item_id, prep_time))
+        return items_by_order
+
+    def observe_order_ready(self, db: Session, queue_entry: QueueEntry) -> None:
+        """Load the order's items and learn from its queue entry; call after marking it ready is committed"""
+        if not self._built:
+            # The rebuild replays this entry along with the rest of the history
+            self.rebuild(db)
+            return
+        items = self._load_items(db, [queue_entry.order_id]).get(queue_entry.order_id, [])
+        self.observe_ready(queue_entry.stall_id, queue_entry.joined_at, queue_entry.ready_at, items)
+
+
+prep_time_model = PrepTimeModel(alpha=settings.PREP_TIME_EWMA_ALPHA)
@@ -0,0 +1,113 @@
+"""
+Queue change events
+Routes call these after a write that moves a stall's queue commits. They
+update the in-process queue index and publish the stall's active queue as
+one "queue.changed" snapshot: position streams re-read their order from
+the index, and other workers sharing the broker apply the snapshot to
+their own index. A queue too long for one broker message is sent as the
+entries that changed and the order ids that left instead.
+"""
+import json
+from typing import Dict, Iterable, Iterator, List
+
+from sqlalchemy.orm import Session
+
+from app.models.queue import QueueEntry
+from app.services.queue_index import ActiveQueueEntry, stall_queue_index
+from app.services.stall_events import StallEvent, stall_event_hub
+
+QUEUE_CHANGED = "queue.changed"
+
+
+def _json_size(value) -> int:
+    return len(json.dumps(value, default=str).encode())
+
+
+def _delta_chunks(changed: Iterable[ActiveQueueEntry], removed: Iterable[int], budget: int) -> Iterator[dict]:
+    """Split a queue delta into event data of at most budget bytes each"""
+    items = [("changed", entry.to_snapshot()) for entry in changed] + [("removed", order_id) for order_id in removed]
+    empty_size = _json_size({"changed": [], "removed": []})
+    chunk, size = {"changed": [], "removed": []}, empty_size
+    for key, item in items:
+        item_size = _json_size(item) + 2  # plus the ", " separator
+        if size + item_size > budget and (chunk["changed"] or chunk["removed"]):
+            yield chunk
+            chunk, size = {"changed": [], "removed": []}, empty_size
+        chunk[key].append(item)
+        size += item_size
+    if chunk["changed"] or chunk["removed"]:
+        yield chunk
+
+
+def publish_queue_change(
+    stall_id: int,
+    changed: Iterable[ActiveQueueEntry] = (),
+    removed: Iterable[int] = ()
+) -> None:
+    """
+    Publish the stall's active queue from the index. When it is too large for
+    the broker, publish only changed (entries written, including ones that
+    left the queue) and removed (order ids dropped from it).
+    """
+    if not stall_event_hub.has_listeners(stall_id):
+        return
+    data = {"entries": stall_queue_index.snapshot(stall_id)}
+    budget = stall_event_hub.data_budget()
+    if budget is None or _json_size(data) <= budget:
+        stall_event_hub.publish(stall_id, QUEUE_CHANGED, data)
+        return
+    for chunk in _delta_chunks(changed, removed, budget):
+        stall_event_hub.publish(stall_id, QUEUE_CHANGED, chunk)
+
+
+def record_queue_change(queue_entry: QueueEntry, user_id: int) -> None:
+    """Write a committed queue entry transition through to the index and publish it"""
+    record_queue_entry(ActiveQueueEntry.from_model(queue_entry, user_id))
+
+
+def record_queue_entry(entry: ActiveQueueEntry) -> None:
+    """record_queue_change for an entry captured before the commit expired the model"""
+    stall_queue_index.apply(entry)
+    publish_queue_change(entry.stall_id, changed=[entry])
+
+
+def reload_queues(db: Session, stall_ids: Iterable[int]) -> None:
+    """Reload stalls' queues after a bulk write and publish them"""
+    stall_ids = list(stall_ids)
+    before: Dict[int, Dict[int, ActiveQueueEntry]] = {
+        stall_id: {entry.order_id: entry for entry in stall_queue_index.entries(stall_id)} for stall_id in stall_ids
+    }
+    stall_queue_index.reload_stalls(db, stall_ids)
+    for stall_id in stall_ids:
+        after = {entry.order_id: entry for entry in stall_queue_index.entries(stall_id)}
+        changed: List[ActiveQueueEntry] = [
+            entry for order_id, entry in after.items() if before[stall_id].get(order_id) != entry
+        ]
+        removed = [order_id for order_id in before[stall_id] if order_id not in after]
+        publish_queue_change(stall_id, changed=changed, removed=removed)
+
+
+def remove_from_queue(stall_id: int, order_id: int) -> None:
+    stall_queue_index.remove(order_id)
+    publish_queue_change(stall_id, removed=[order_id])
+
+
+def apply_remote_queue_change(event: StallEvent) -> None:
+    """Keep this worker's queue index in step with writes made by other workers"""
+    if stall_event_hub.is_local(event):
+        return
+    if event.type == QUEUE_CHANGED and "entries" in event.data:
+        stall_queue_index.replace_stall(
+            event.stall_id, [ActiveQueueEntry.from_snapshot(entry) for entry in event.data["entries"]]
+        )
+    elif event.type == QUEUE_CHANGED:
+        for snapshot in event.data["changed"]:
+            stall_queue_index.apply(ActiveQueueEntry.from_snapshot(snapshot))
+        for order_id in event.data["removed"]:
+            stall_queue_index.remove(order_id)
+    elif event.type == "resync":
+        # The broker reconnected and may have missed changes
+        stall_queue_index.invalidate()
+
+
+stall_event_hub.add_listener(apply_remote_queue_change)
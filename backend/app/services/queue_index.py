@@ -0,0 +1,393 @@
+"""
+In-process index of each stall's active queue
+Holds the waiting, preparing and ready entries of every stall in prep
+order (earliest deadline first, then ticket) so queue boards, positions,
+queue lengths and pickup slot bookings are answered from memory. Routes
+write through to it after every queue transition commits; a periodic
+reconcile against queue_entries repairs any drift (writes made by other
+processes, or missed by a crashed request).
+"""
+import asyncio
+import bisect
+import logging
+import threading
+from dataclasses import dataclass, fields
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+
+from app.models.order import Order
+from app.models.queue import QueueEntry, QueueStatus
+from app.services.prep_times import prep_time_model
+from app.utils.campus_time import utc_to_campus
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_QUEUE_STATUSES = (QueueStatus.WAITING, QueueStatus.PREPARING, QueueStatus.READY)
+# Entries still ahead of someone in the queue; ready orders are just awaiting pickup
+AHEAD_QUEUE_STATUSES = (QueueStatus.WAITING, QueueStatus.PREPARING)
+DATETIME_FIELDS = ("joined_at", "ready_at", "collected_at", "ready_by")
+
+
+@dataclass(frozen=True)
+class ActiveQueueEntry:
+    """The queue_entries columns the queue endpoints return, plus the order's owner"""
+    id: int
+    order_id: int
+    stall_id: int
+    user_id: int
+    queue_position: int
+    status: QueueStatus
+    estimated_wait_time: Optional[int]
+    joined_at: datetime
+    ready_at: Optional[datetime] = None
+    collected_at: Optional[datetime] = None
+    prep_minutes: Optional[int] = None
+    ready_by: Optional[datetime] = None
+
+    @property
+    def deadline(self) -> datetime:
+        """
+        When the order is due, on the campus clock of pickup windows; entries
+        without a pickup deadline are due as soon as they joined (UTC)
+        """
+        return self.ready_by or utc_to_campus(self.joined_at)
+
+    @property
+    def sort_key(self) -> Tuple[datetime, int, int]:
+        return (self.deadline, self.queue_position, self.order_id)
+
+    @property
+    def expected_minutes(self) -> float:
+        """Prep minutes estimated at checkout, or the stall's learned average for older entries"""
+        return self.prep_minutes or prep_time_model.stall_minutes(self.stall_id)
+
+    @classmethod
+    def from_model(cls, entry: QueueEntry, user_id: int) -> "ActiveQueueEntry":
+        return cls(**{f.name: getattr(entry, f.name) for f in fields(cls) if f.name != "user_id"}, user_id=user_id)
+
+    def to_snapshot(self) -> dict:
+        """JSON-safe form, shared with other workers in queue.changed events"""
+        snapshot = {f.name: getattr(self, f.name) for f in fields(self)}
+        snapshot["status"] = self.status.value
+        for name in DATETIME_FIELDS:
+            if snapshot[name] is not None:
+                snapshot[name] = snapshot[name].isoformat()
+        return snapshot
+
+    @classmethod
+    def from_snapshot(cls, snapshot: dict) -> "ActiveQueueEntry":
+        values = dict(snapshot, status=QueueStatus(snapshot["status"]))
+        for name in DATETIME_FIELDS:
+            if values.get(name) is not None:
+                values[name] = datetime.fromisoformat(values[name])
+        return cls(**values)
+
+
+class QueuePlace(NamedTuple):
+    entry: ActiveQueueEntry
+    place_in_line: int
+    orders_ahead: int
+    minutes_ahead: float  # expected prep minutes of the orders ahead
+
+    @property
+    def estimated_ready_time(self) -> datetime:
+        if self.entry.status == QueueStatus.READY and self.entry.ready_at:
+            return self.entry.ready_at
+        return prep_time_model.estimate_ready_time(
+            self.entry.stall_id, self.entry.joined_at, self.minutes_ahead, self.entry.expected_minutes
+        )
+
+
+SortKey = Tuple[datetime, int, int]  # (deadline, queue_position, order_id)
+
+
+class _StallQueue:
+    """Active entries of one stall, kept sorted earliest deadline first"""
+
+    def __init__(self):
+        self.entries: Dict[int, ActiveQueueEntry] = {}
+        self.ranked: List[SortKey] = []  # all active entries
+        self.ahead: List[SortKey] = []   # waiting and preparing only
+        # Prefix sums over ahead, rebuilt on the first read after a write
+        self._ahead_totals: Optional[Tuple[List[float], List[int]]] = None
+
+    def add(self, entry: ActiveQueueEntry) -> None:
+        self.entries[entry.order_id] = entry
+        key = entry.sort_key
+        bisect.insort(self.ranked, key)
+        if entry.status in AHEAD_QUEUE_STATUSES:
+            bisect.insort(self.ahead, key)
+            self._ahead_totals = None
+
+    def discard(self, order_id: int) -> None:
+        entry = self.entries.pop(order_id, None)
+        if entry is None:
+            return
+        key = entry.sort_key
+        self.ranked.pop(bisect.bisect_left(self.ranked, key))
+        if entry.status in AHEAD_QUEUE_STATUSES:
+            self.ahead.pop(bisect.bisect_left(self.ahead, key))
+            self._ahead_totals = None
+
+    def place_in_line(self, key: SortKey) -> int:
+        return bisect.bisect_left(self.ranked, key) + 1
+
+    def orders_ahead(self, key: SortKey) -> int:
+        return bisect.bisect_left(self.ahead, key)
+
+    def due_between(self, start: datetime, end: datetime) -> int:
+        return bisect.bisect_left(self.ranked, (end,)) - bisect.bisect_left(self.ranked, (start,))
+
+    def _prefix_totals(self) -> Tuple[List[float], List[int]]:
+        """
+        For each prefix of ahead: the checkout prep minutes it holds, and how
+        many of its entries have none (those are charged the stall's learned
+        average at read time, which changes as the model learns)
+        """
+        if self._ahead_totals is None:
+            minutes, unestimated = [0.0], [0]
+            for _, _, order_id in self.ahead:
+                prep_minutes = self.entries[order_id].prep_minutes
+                minutes.append(minutes[-1] + (prep_minutes or 0))
+                unestimated.append(unestimated[-1] + (not prep_minutes))
+            self._ahead_totals = (minutes, unestimated)
+        return self._ahead_totals
+
+    def minutes_ahead(self, orders_ahead: int) -> float:
+        """Expected prep minutes of the first orders_ahead waiting/preparing entries"""
+        if not orders_ahead:
+            return 0.0
+        minutes, unestimated = self._prefix_totals()
+        total = minutes[orders_ahead]
+        if unestimated[orders_ahead]:
+            stall_id = self.entries[self.ahead[0][2]].stall_id
+            total += unestimated[orders_ahead] * prep_time_model.stall_minutes(stall_id)
+        return total
+
+
+class StallQueueIndex:
+    """Write-through per-stall index of active queue entries"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stalls: Dict[int, _StallQueue] = {}
+        self._stall_by_order: Dict[int, int] = {}
+        # Bumped on every write to a stall, so a reconcile never overwrites
+        # a stall with database rows read before that write
+        self._versions: Dict[int, int] = {}
+        self._built = False
+
+    @property
+    def is_built(self) -> bool:
+        return self._built
+
+    def _load(self, db: Session) -> Dict[int, List[ActiveQueueEntry]]:
+        rows = db.query(QueueEntry, Order.user_id).join(Order, QueueEntry.order_id == Order.id).filter(
+            QueueEntry.status.in_(ACTIVE_QUEUE_STATUSES)
+        ).all()
+        by_stall: Dict[int, List[ActiveQueueEntry]] = {}
+        for entry, user_id in rows:
+            by_stall.setdefault(entry.stall_id, []).append(ActiveQueueEntry.from_model(entry, user_id))
+        return by_stall
+
+    def _replace_stall_locked(self, stall_id: int, entries: Iterable[ActiveQueueEntry]) -> None:
+        old = self._stalls.pop(stall_id, None)
+        if old is not None:
+            for order_id in old.entries:
+                self._stall_by_order.pop(order_id, None)
+        stall_queue = _StallQueue()
+        for entry in entries:
+            stall_queue.add(entry)
+            self._stall_by_order[entry.order_id] = stall_id
+        if stall_queue.entries:
+            self._stalls[stall_id] = stall_queue
+
+    def _discard_locked(self, order_id: int) -> None:
+        stall_id = self._stall_by_order.pop(order_id, None)
+        if stall_id is None:
+            return
+        stall_queue = self._stalls[stall_id]
+        stall_queue.discard(order_id)
+        if not stall_queue.entries:
+            del self._stalls[stall_id]
+
+    def rebuild(self, db: Session) -> None:
+        """Reload every active queue entry from the database"""
+        self._sync(db, report=False)
+        logger.debug(f"Queue index rebuilt with {len(self._stall_by_order)} active entries")
+
+    def ensure_built(self, db: Session) -> None:
+        if not self._built:
+            self.rebuild(db)
+
+    def invalidate(self) -> None:
+        """Resync from the database on the next read, keeping current entries until then"""
+        self._built = False
+
+    def reset(self) -> None:
+        """Forget everything; the next read rebuilds (e.g. after the database is reset)"""
+        with self._lock:
+            self._stalls.clear()
+            self._stall_by_order.clear()
+            self._versions.clear()
+            self._built = False
+
+    def apply(self, entry: ActiveQueueEntry) -> None:
+        """Record a committed queue transition; entries that left the queue are dropped"""
+        with self._lock:
+            self._discard_locked(entry.order_id)
+            if entry.status in ACTIVE_QUEUE_STATUSES:
+                self._stalls.setdefault(entry.stall_id, _StallQueue()).add(entry)
+                self._stall_by_order[entry.order_id] = entry.stall_id
+            self._versions[entry.stall_id] = self._versions.get(entry.stall_id, 0) + 1
+
+    def remove(self, order_id: int) -> None:
+        with self._lock:
+            stall_id = self._stall_by_order.get(order_id)
+            self._discard_locked(order_id)
+            if stall_id is not None:
+                self._versions[stall_id] = self._versions.get(stall_id, 0) + 1
+
+    def replace_stall(self, stall_id: int, entries: Iterable[ActiveQueueEntry]) -> None:
+        """Swap in a stall's whole active queue (bulk writes, other workers' snapshots)"""
+        with self._lock:
+            self._replace_stall_locked(stall_id, entries)
+            self._versions[stall_id] = self._versions.get(stall_id, 0) + 1
+
+    def reload_stalls(self, db: Session, stall_ids: Iterable[int]) -> None:
+        """Reload the given stalls' queues in one query"""
+        stall_ids = list(stall_ids)
+        if not stall_ids:
+            return
+        rows = db.query(QueueEntry, Order.user_id).join(Order, QueueEntry.order_id == Order.id).filter(
+            QueueEntry.stall_id.in_(stall_ids),
+            QueueEntry.status.in_(ACTIVE_QUEUE_STATUSES)
+        ).all()
+        by_stall: Dict[int, List[ActiveQueueEntry]] = {stall_id: [] for stall_id in stall_ids}
+        for entry, user_id in rows:
+            by_stall[entry.stall_id].append(ActiveQueueEntry.from_model(entry, user_id))
+        for stall_id, entries in by_stall.items():
+            self.replace_stall(stall_id, entries)
+
+    def entries(self, stall_id: int) -> List[ActiveQueueEntry]:
+        """Active entries in prep order"""
+        with self._lock:
+            stall_queue = self._stalls.get(stall_id)
+            if stall_queue is None:
+                return []
+            return [stall_queue.entries[order_id] for _, _, order_id in stall_queue.ranked]
+
+    def snapshot(self, stall_id: int) -> List[dict]:
+        return [entry.to_snapshot() for entry in self.entries(stall_id)]
+
+    def get(self, order_id: int) -> Optional[ActiveQueueEntry]:
+        with self._lock:
+            stall_id = self._stall_by_order.get(order_id)
+            if stall_id is None:
+                return None
+            return self._stalls[stall_id].entries[order_id]
+
+    def position(self, order_id: int) -> Optional[QueuePlace]:
+        """Where an active order stands, in O(log n) once the stall's prefix sums are built"""
+        with self._lock:
+            stall_id = self._stall_by_order.get(order_id)
+            if stall_id is None:
+                return None
+            stall_queue = self._stalls[stall_id]
+            entry = stall_queue.entries[order_id]
+            orders_ahead = stall_queue.orders_ahead(entry.sort_key)
+            return QueuePlace(
+                entry,
+                stall_queue.place_in_line(entry.sort_key),
+                orders_ahead,
+                stall_queue.minutes_ahead(orders_ahead)
+            )
+
+    def queue_length(self, stall_id: int) -> int:
+        """Waiting and preparing entries, i.e. orders still to be made"""
+        with self._lock:
+            stall_queue = self._stalls.get(stall_id)
+            return len(stall_queue.ahead) if stall_queue else 0
+
+    def queue_lengths(self, stall_ids: Iterable[int]) -> Dict[int, int]:
+        return {stall_id: self.queue_length(stall_id) for stall_id in stall_ids}
+
+    def backlog_minutes(self, stall_id: int) -> float:
+        """Expected prep minutes of every waiting and preparing order, i.e. ahead of a new order"""
+        with self._lock:
+            stall_queue = self._stalls.get(stall_id)
+            return stall_queue.minutes_ahead(len(stall_queue.ahead)) if stall_queue else 0
+
+    def due_between(self, stall_id: int, start: datetime, end: datetime) -> int:
+        """Active entries due in [start, end), i.e. booked into that pickup slot"""
+        with self._lock:
+            stall_queue = self._stalls.get(stall_id)
+            return stall_queue.due_between(start, end) if stall_queue else 0
+
+    def minutes_for_first(self, stall_id: int, count: int) -> float:
+        """Expected prep minutes of the stall's next count waiting or preparing orders"""
+        with self._lock:
+            stall_queue = self._stalls.get(stall_id)
+            return stall_queue.minutes_ahead(count) if stall_queue else 0
+
+    def reconcile(self, db: Session) -> List[str]:
+        """
+        Compare the index with queue_entries and repair it from the table.
+        Returns a description of every difference found.
+        """
+        discrepancies = self._sync(db, report=True)
+        for discrepancy in discrepancies:
+            logger.warning(f"Queue index drift repaired: {discrepancy}")
+        return discrepancies
+
+    def _sync(self, db: Session, report: bool) -> List[str]:
+        # Stalls written to while the table was being read are left as they
+        # are; the write-through already made them newer than the rows read
+        with self._lock:
+            versions = dict(self._versions)
+        by_stall = self._load(db)
+
+        discrepancies = []
+        with self._lock:
+            for stall_id in set(by_stall) | set(self._stalls):
+                if self._versions.get(stall_id, 0) != versions.get(stall_id, 0):
+                    continue
+                expected = {entry.order_id: entry for entry in by_stall.get(stall_id, [])}
+                stall_queue = self._stalls.get(stall_id)
+                actual = stall_queue.entries if stall_queue else {}
+                if expected == actual:
+                    continue
+                if report:
+                    for order_id in sorted(set(expected) | set(actual)):
+                        if order_id not in actual:
+                            discrepancies.append(f"stall {stall_id}: order {order_id} missing from index")
+                        elif order_id not in expected:
+                            discrepancies.append(f"stall {stall_id}: order {order_id} no longer active")
+                        elif expected[order_id] != actual[order_id]:
+                            discrepancies.append(f"stall {stall_id}: order {order_id} out of date")
+                self._replace_stall_locked(stall_id, expected.values())
+            self._built = True
+        return discrepancies
+
+    async def reconcile_periodically(self, session_factory, interval_seconds: float) -> None:
+        """Run reconcile every interval_seconds until cancelled"""
+        while True:
+            await asyncio.sleep(interval_seconds)
+
+            def run():
+                db = session_factory()
+                try:
+                    return self.reconcile(db)
+                finally:
+                    db.close()
+
+            try:
+                await run_in_threadpool(run)
+            except Exception:
+                logger.exception("Queue index reconcile failed")
+
+
+stall_queue_index = StallQueueIndex()
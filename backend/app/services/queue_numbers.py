@@ -0,0 +1,102 @@
+"""
+Per-stall queue number allocation
+Hands out queue numbers without counting active queue entries. Numbers
+count up per stall within a campus service day and restart at 1 the next
+day. PostgreSQL bumps a counter row with UPDATE ... RETURNING in its own
+transaction; other databases (SQLite in local development) use an
+in-process counter. Either way a number is taken before the order
+commits, so a checkout that fails afterwards leaves a gap.
+"""
+import logging
+import threading
+from datetime import date, timedelta
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import case, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.models.order import Order
+from app.models.queue import StallQueueCounter
+from app.utils.campus_time import campus_day_start_utc, campus_today
+
+logger = logging.getLogger(__name__)
+
+
+class QueueNumberAllocator:
+    """Allocates the next queue number for a stall in O(1)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[int, Tuple[date, int]] = {}
+
+    def next_number(self, db: Session, stall_id: int, day: Optional[date] = None) -> int:
+        """Return the stall's next queue number for day (default: today on the campus clock)"""
+        day = day or campus_today()
+        engine = db.get_bind()
+        if engine.dialect.name == "postgresql":
+            return self._next_from_counter_row(engine, stall_id, day)
+        return self._next_in_process(db, stall_id, day)
+
+    @staticmethod
+    def _seed_query(stall_id: int, day: date):
+        """Highest queue number the stall has handed out on day"""
+        return select(func.coalesce(func.max(Order.queue_number), 0)).where(
+            Order.stall_id == stall_id,
+            Order.created_at >= campus_day_start_utc(day),
+            Order.created_at < campus_day_start_utc(day + timedelta(days=1))
+        )
+
+    def _next_from_counter_row(self, engine: Engine, stall_id: int, day: date) -> int:
+        # A worker whose clock is a moment behind at midnight keeps counting
+        # the newer day instead of restarting it (NULL day: counted before
+        # numbering was per day, treated as today)
+        same_day = or_(StallQueueCounter.day.is_(None), StallQueueCounter.day >= day)
+        bumped = {
+            "last_number": case((same_day, StallQueueCounter.last_number + 1), else_=1),
+            "day": func.greatest(func.coalesce(StallQueueCounter.day, day), day),
+        }
+
+        # Runs in its own short transaction so the counter row lock is
+        # released immediately instead of being held until the order commits
+        with engine.begin() as conn:
+            number = conn.execute(
+                update(StallQueueCounter)
+                .where(StallQueueCounter.stall_id == stall_id)
+                .values(**bumped)
+                .returning(StallQueueCounter.last_number)
+            ).scalar()
+
+            if number is None:
+                # First order for this stall: seed from today's existing orders
+                seed = self._seed_query(stall_id, day).scalar_subquery() + 1
+                insert_stmt = pg_insert(StallQueueCounter).values(stall_id=stall_id, last_number=seed, day=day)
+                number = conn.execute(
+                    insert_stmt.on_conflict_do_update(
+                        index_elements=[StallQueueCounter.stall_id],
+                        set_=bumped
+                    ).returning(StallQueueCounter.last_number)
+                ).scalar()
+
+        return number
+
+    def _next_in_process(self, db: Session, stall_id: int, day: date) -> int:
+        # Only safe with a single worker process, which is how SQLite is run
+        with self._lock:
+            counted_day, number = self._counters.get(stall_id, (None, None))
+            if counted_day is None:
+                counted_day, number = day, db.execute(self._seed_query(stall_id, day)).scalar()
+            elif day > counted_day:
+                counted_day, number = day, 0
+            number += 1
+            self._counters[stall_id] = (counted_day, number)
+            return number
+
+    def reset(self) -> None:
+        """Forget in-process counters (e.g. after the database is reset)"""
+        with self._lock:
+            self._counters.clear()
+
+
+queue_number_allocator = QueueNumberAllocator()
@@ -0,0 +1,120 @@
+"""
+Per-stall rating aggregates
+Keeps each stall's review count, rating sum and whole-star histogram in
+stall_rating_stats. Review writes adjust them by delta in the same
+transaction, so the stall's average and rating distribution never need a
+scan of its reviews.
+"""
+from collections import Counter
+from typing import Optional
+
+from sqlalchemy import func, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.models.review import Review, StallRatingTotals
+from app.models.stall import Stall
+
+STARS = range(1, 6)
+
+
+def star_of(rating: float) -> Optional[int]:
+    """Histogram bucket of a rating"""
+    star = round(rating)
+    return star if star in STARS else None
+
+
+def _star_column(star: int):
+    return getattr(StallRatingTotals, f"stars_{star}")
+
+
+def _totals_from_reviews(db: Session, stall_id: int) -> dict:
+    """Aggregate a stall's reviews (for stalls that have no stats row yet)"""
+    rows = db.query(Review.rating, func.count(Review.id)).filter(
+        Review.stall_id == stall_id
+    ).group_by(Review.rating).all()
+
+    totals = {"review_count": 0, "rating_sum": 0.0, **{f"stars_{star}": 0 for star in STARS}}
+    for rating, count in rows:
+        totals["review_count"] += count
+        totals["rating_sum"] += rating * count
+        star = star_of(rating)
+        if star is not None:
+            totals[f"stars_{star}"] += count
+    return totals
+
+
+def record_rating_change(
+    db: Session,
+    stall_id: int,
+    old_rating: Optional[float] = None,
+    new_rating: Optional[float] = None
+) -> None:
+    """
+    Apply one review write (create: new_rating, delete: old_rating, update:
+    both) to the stall's aggregates and Stall.rating.
+
+    Call after the review change is flushed and before the commit. A stall
+    without a stats row is seeded from its reviews, which by then already
+    include the change.
+    """
+    star_deltas = Counter()
+    if old_rating is not None and star_of(old_rating) is not None:
+        star_deltas[star_of(old_rating)] -= 1
+    if new_rating is not None and star_of(new_rating) is not None:
+        star_deltas[star_of(new_rating)] += 1
+
+    apply_delta = (
+        update(StallRatingTotals)
+        .where(StallRatingTotals.stall_id == stall_id)
+        .values(
+            review_count=StallRatingTotals.review_count + (new_rating is not None) - (old_rating is not None),
+            rating_sum=StallRatingTotals.rating_sum + (new_rating or 0.0) - (old_rating or 0.0),
+            **{f"stars_{star}": _star_column(star) + delta for star, delta in star_deltas.items() if delta}
+        )
+        .returning(StallRatingTotals.review_count, StallRatingTotals.rating_sum)
+        .execution_options(synchronize_session=False)
+    )
+    row = db.execute(apply_delta).first()
+
+    if row is None:
+        totals = _totals_from_reviews(db, stall_id)
+        insert = pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+        seeded = db.execute(
+            insert(StallRatingTotals).values(stall_id=stall_id, **totals).on_conflict_do_nothing(
+                index_elements=[StallRatingTotals.stall_id]
+            )
+        )
+        if seeded.rowcount:
+            row = (totals["review_count"], totals["rating_sum"])
+        else:
+            # A concurrent review write seeded the row first
+            row = db.execute(apply_delta).first()
+
+    review_count, rating_sum = row
+    db.query(Stall).filter(Stall.id == stall_id).update(
+        {Stall.rating: round(rating_sum / review_count, 1) if review_count else 0.0},
+        synchronize_session=False
+    )
+
+
+def get_rating_stats(db: Session, stall_id: int) -> dict:
+    """Average rating, review count and whole-star distribution of a stall"""
+    row = db.get(StallRatingTotals, stall_id)
+    if row is not None:
+        totals = {
+            "review_count": row.review_count,
+            "rating_sum": row.rating_sum,
+            **{f"stars_{star}": getattr(row, f"stars_{star}") for star in STARS},
+        }
+    else:
+        totals = _totals_from_reviews(db, stall_id)
+
+    review_count = totals["review_count"]
+    return {
+        "stall_id": stall_id,
+        "average_rating": round(totals["rating_sum"] / review_count, 1) if review_count else 0.0,
+        "total_reviews": review_count,
+        "rating_distribution": {star: totals[f"stars_{star}"] for star in STARS},
+    }
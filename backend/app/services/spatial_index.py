@@ -0,0 +1,202 @@
+"""
+In-process spatial index over stall coordinates
+Buckets stalls into a fixed lat/lng grid so nearby lookups only touch
+the cells around the user instead of every stall in the table
+"""
+import heapq
+import logging
+import math
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models.stall import Stall
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+Cell = Tuple[int, int]
+Point = Tuple[int, float, float]  # (stall_id, latitude, longitude)
+Bounds = Tuple[int, int, int, int]  # (min_i, max_i, min_j, max_j) over occupied cells
+
+
+def _haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Unrounded haversine distance, used for ordering candidates"""
+    lat1_rad = math.radians(lat1)
+    lat2_rad = math.radians(lat2)
+    dlat = lat2_rad - lat1_rad
+    dlon = math.radians(lon2 - lon1)
+    a = math.sin(dlat / 2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon / 2)**2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+class StallSpatialIndex:
+    """Grid (geohash-style) index of stall coordinates for k-nearest and radius lookups"""
+
+    def __init__(self, cell_size_deg: float = 0.005, max_age_seconds: int = 300):
+        """
+        Args:
+            cell_size_deg: Grid cell size in degrees (0.005 deg is roughly 550 m)
+            max_age_seconds: Rebuild from the database after this long, so
+                workers that did not see a stall write still converge
+        """
+        self.cell_size_deg = cell_size_deg
+        self.max_age_seconds = max_age_seconds
+
+        self._lock = threading.Lock()
+        # Buckets and the bounding box of their cells, swapped together so
+        # readers always see a consistent pair
+        self._grid: Tuple[Dict[Cell, List[Point]], Optional[Bounds]] = ({}, None)
+        self._cells_by_stall: Dict[int, Cell] = {}
+        self._built_at: Optional[float] = None
+
+    def _cell(self, lat: float, lng: float) -> Cell:
+        return (math.floor(lat / self.cell_size_deg), math.floor(lng / self.cell_size_deg))
+
+    def __len__(self) -> int:
+        return len(self._cells_by_stall)
+
+    @staticmethod
+    def _bounds(buckets: Dict[Cell, List[Point]]) -> Optional[Bounds]:
+        if not buckets:
+            return None
+        rows = [cell[0] for cell in buckets]
+        cols = [cell[1] for cell in buckets]
+        return min(rows), max(rows), min(cols), max(cols)
+
+    @property
+    def is_stale(self) -> bool:
+        return self._built_at is None or time.monotonic() - self._built_at > self.max_age_seconds
+
+    def rebuild(self, db: Session) -> None:
+        """Reload every stall with coordinates from the database"""
+        rows = db.query(Stall.id, Stall.latitude, Stall.longitude).filter(
+            Stall.latitude.isnot(None),
+            Stall.longitude.isnot(None)
+        ).all()
+
+        buckets: Dict[Cell, List[Point]] = {}
+        cells_by_stall: Dict[int, Cell] = {}
+        for stall_id, lat, lng in rows:
+            cell = self._cell(lat, lng)
+            buckets.setdefault(cell, []).append((stall_id, lat, lng))
+            cells_by_stall[stall_id] = cell
+
+        with self._lock:
+            self._grid = (buckets, self._bounds(buckets))
+            self._cells_by_stall = cells_by_stall
+            self._built_at = time.monotonic()
+
+        logger.debug(f"Stall spatial index rebuilt with {len(cells_by_stall)} stalls in {len(buckets)} cells")
+
+    def ensure_fresh(self, db: Session) -> None:
+        """Rebuild the index if it was never built or has expired"""
+        if self.is_stale:
+            self.rebuild(db)
+
+    def upsert(self, stall_id: int, lat: Optional[float], lng: Optional[float]) -> None:
+        """Insert or move a stall; stalls without coordinates are removed"""
+        with self._lock:
+            # Copy-on-write so concurrent readers keep a consistent snapshot
+            buckets = dict(self._grid[0])
+            cells_by_stall = dict(self._cells_by_stall)
+
+            old_cell = cells_by_stall.pop(stall_id, None)
+            if old_cell is not None:
+                remaining = [p for p in buckets.get(old_cell, []) if p[0] != stall_id]
+                if remaining:
+                    buckets[old_cell] = remaining
+                else:
+                    buckets.pop(old_cell, None)
+
+            if lat is not None and lng is not None:
+                cell = self._cell(lat, lng)
+                buckets[cell] = buckets.get(cell, []) + [(stall_id, lat, lng)]
+                cells_by_stall[stall_id] = cell
+
+            self._grid = (buckets, self._bounds(buckets))
+            self._cells_by_stall = cells_by_stall
+
+    def remove(self, stall_id: int) -> None:
+        """Drop a stall from the index"""
+        self.upsert(stall_id, None, None)
+
+    def _ring_cells(self, ci: int, cj: int, ring: int, bounds: Bounds) -> Iterator[Cell]:
+        """Cells at Chebyshev distance ring from (ci, cj), clipped to the occupied bounding box"""
+        min_i, max_i, min_j, max_j = bounds
+        if ring == 0:
+            yield ci, cj
+            return
+        j_lo, j_hi = max(cj - ring, min_j), min(cj + ring, max_j)
+        for i in (ci - ring, ci + ring):
+            if min_i <= i <= max_i:
+                for j in range(j_lo, j_hi + 1):
+                    yield i, j
+        i_lo, i_hi = max(ci - ring + 1, min_i), min(ci + ring - 1, max_i)
+        for j in (cj - ring, cj + ring):
+            if min_j <= j <= max_j:
+                for i in range(i_lo, i_hi + 1):
+                    yield i, j
+
+    def iter_nearest(self, lat: float, lng: float) -> Iterator[Tuple[float, int]]:
+        """
+        Yield (distance_km, stall_id) pairs in ascending distance order
+
+        Rings of cells (Chebyshev distance in grid cells) are expanded outward
+        from the user's cell, and a candidate is only yielded once no cell in
+        a later ring can hold anything closer. Callers that stop early (k
+        found, radius exceeded) therefore never look at far-away buckets.
+        """
+        buckets, bounds = self._grid
+        if not buckets:
+            return
+
+        ci, cj = self._cell(lat, lng)
+        min_i, max_i, min_j, max_j = bounds
+        # Rings closer than the bounding box are empty; rings past it too
+        first_ring = max(min_i - ci, ci - max_i, min_j - cj, cj - max_j, 0)
+        last_ring = max(ci - min_i, max_i - ci, cj - min_j, max_j - cj)
+
+        heap: List[Tuple[float, int]] = []
+        for ring in range(first_ring, last_ring + 1):
+            for cell in self._ring_cells(ci, cj, ring, bounds):
+                for stall_id, stall_lat, stall_lng in buckets.get(cell, ()):
+                    heapq.heappush(heap, (_haversine_km(lat, lng, stall_lat, stall_lng), stall_id))
+
+            if ring < last_ring:
+                # Anything in ring n + 1 is at least n whole cells from the user's cell
+                lat_extent = min(89.9, abs(lat) + (ring + 2) * self.cell_size_deg)
+                cell_km = self.cell_size_deg * KM_PER_DEGREE * math.cos(math.radians(lat_extent))
+                bound = ring * cell_km
+            else:
+                bound = math.inf
+
+            while heap and heap[0][0] <= bound:
+                yield heapq.heappop(heap)
+
+    def nearest(self, lat: float, lng: float, k: int) -> List[Tuple[float, int]]:
+        """Return up to k closest (distance_km, stall_id) pairs"""
+        result = []
+        if k <= 0:
+            return result
+        for item in self.iter_nearest(lat, lng):
+            result.append(item)
+            if len(result) >= k:
+                break
+        return result
+
+    def within_radius(self, lat: float, lng: float, radius_km: float) -> List[Tuple[float, int]]:
+        """Return every (distance_km, stall_id) pair within radius_km, closest first"""
+        result = []
+        for item in self.iter_nearest(lat, lng):
+            if item[0] > radius_km:
+                break
+            result.append(item)
+        return result
+
+
+stall_spatial_index = StallSpatialIndex()
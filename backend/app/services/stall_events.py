@@ -0,0 +1,256 @@
+"""
+Per-stall event hub for live updates
+Route handlers publish order and queue events after they commit; SSE
+endpoints subscribe per stall (stall owners' order board, students' queue
+position) instead of polling. Events travel through a broker so that every
+uvicorn worker's hub sees them: InMemoryBroker for a single worker and
+tests, PostgresNotifyBroker (LISTEN/NOTIFY) to share them across workers.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import os
+import select
+import threading
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, List, Optional, Set
+
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StallEvent:
+    id: str
+    stall_id: int
+    type: str
+    data: dict
+
+    def to_sse(self) -> str:
+        """Server-Sent Events wire format"""
+        return f"id: {self.id}\nevent: {self.type}\ndata: {json.dumps(self.data, default=str)}\n\n"
+
+
+class Subscription:
+    """One connected client; events arrive on the event loop it subscribed from"""
+
+    def __init__(self, stall_id: int, loop: asyncio.AbstractEventLoop, max_pending: int):
+        self.stall_id = stall_id
+        self.loop = loop
+        self.queue: "asyncio.Queue[StallEvent]" = asyncio.Queue(maxsize=max_pending)
+
+    def deliver(self, event: StallEvent) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Slow consumer: drop the backlog and tell the client to refetch
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(StallEvent(event.id, self.stall_id, "resync", {}))
+
+    async def get(self, timeout: float) -> Optional[StallEvent]:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class InMemoryBroker:
+    """Single worker: published events go straight to the local hub"""
+
+    shared = False
+    MAX_PAYLOAD_BYTES = None
+
+    def attach(self, dispatch: Callable[[StallEvent], None]) -> None:
+        self._dispatch = dispatch
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+    def publish(self, event: StallEvent) -> None:
+        self._dispatch(event)
+
+
+class PostgresNotifyBroker:
+    """
+    Shares events between workers through PostgreSQL LISTEN/NOTIFY.
+    Every worker LISTENs on one channel from a background thread, including
+    the publisher, so each event is dispatched exactly once per worker.
+    Needs a direct (session mode) connection: the Supabase transaction
+    pooler does not support LISTEN.
+    """
+
+    shared = True
+    CHANNEL = "campuseats_stall_events"
+    POLL_SECONDS = 5
+    # NOTIFY payloads are capped at 8000 bytes
+    MAX_PAYLOAD_BYTES = 7900
+
+    def __init__(self, url: str):
+        # psycopg2 takes a plain libpq URL, without the SQLAlchemy driver suffix
+        self.url = make_url(url).set(drivername="postgresql").render_as_string(hide_password=False)
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def attach(self, dispatch: Callable[[StallEvent], None]) -> None:
+        self._dispatch = dispatch
+
+    def start(self) -> None:
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._listen, name="stall-events-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.POLL_SECONDS + 1)
+
+    def publish(self, event: StallEvent) -> None:
+        from app.database.database import engine
+
+        payload = json.dumps(asdict(event), default=str)
+        if len(payload.encode()) > self.MAX_PAYLOAD_BYTES:
+            # Publishers keep their data within StallEventHub.data_budget(); if
+            # one doesn't, have subscribers refetch rather than miss the change
+            logger.warning("%s for stall %s is too large to send, sending resync", event.type, event.stall_id)
+            payload = json.dumps(asdict(StallEvent(event.id, event.stall_id, "resync", {})))
+        with engine.begin() as conn:
+            conn.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": self.CHANNEL, "payload": payload})
+
+    def _listen(self) -> None:
+        import psycopg2
+        from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+        while not self._stopped.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(self.url)
+                conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {self.CHANNEL}")
+                logger.info("Listening for stall events on %s", self.CHANNEL)
+                # Events published while we were disconnected are gone
+                self._dispatch(StallEvent("0", 0, "resync", {}))
+
+                while not self._stopped.is_set():
+                    if select.select([conn], [], [], self.POLL_SECONDS) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        self._dispatch(StallEvent(**json.loads(notify.payload)))
+            except Exception:
+                logger.exception("Stall event listener failed, reconnecting")
+                self._stopped.wait(1)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+
+class StallEventHub:
+    """Fans events out to every subscriber of a stall in this process"""
+
+    # Room for the event id, stall id and type around the data
+    ENVELOPE_BYTES = 200
+
+    def __init__(self, broker, max_pending: int = 100):
+        self.broker = broker
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+        self._listeners: List[Callable[[StallEvent], None]] = []
+        # Unique across workers sharing a broker
+        self._ids = itertools.count(1)
+        self._id_prefix = f"{os.getpid()}-"
+        broker.attach(self.dispatch)
+
+    def start(self) -> None:
+        self.broker.start()
+
+    def stop(self) -> None:
+        self.broker.stop()
+
+    def add_listener(self, listener: Callable[[StallEvent], None]) -> None:
+        """Call listener synchronously with every dispatched event, before subscribers see it"""
+        self._listeners.append(listener)
+
+    def is_local(self, event: StallEvent) -> bool:
+        """Whether this process published the event"""
+        return event.id.startswith(self._id_prefix)
+
+    def subscribe(self, stall_id: int) -> Subscription:
+        """Must be called from the event loop that will consume the events"""
+        subscription = Subscription(stall_id, asyncio.get_running_loop(), self.max_pending)
+        with self._lock:
+            self._subscribers.setdefault(stall_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.stall_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.stall_id]
+
+    def data_budget(self) -> Optional[int]:
+        """Largest event data, in JSON bytes, the broker can carry (None: no limit)"""
+        if self.broker.MAX_PAYLOAD_BYTES is None:
+            return None
+        return self.broker.MAX_PAYLOAD_BYTES - self.ENVELOPE_BYTES
+
+    def subscriber_count(self, stall_id: int) -> int:
+        with self._lock:
+            return len(self._subscribers.get(stall_id, ()))
+
+    def has_listeners(self, stall_id: int) -> bool:
+        """False only when nobody anywhere can receive the stall's events"""
+        return self.broker.shared or self.subscriber_count(stall_id) > 0
+
+    def publish(self, stall_id: int, event_type: str, data: dict) -> StallEvent:
+        """Thread-safe; called from sync route handlers running in the threadpool"""
+        event = StallEvent(f"{self._id_prefix}{next(self._ids)}", stall_id, event_type, data)
+        try:
+            self.broker.publish(event)
+        except Exception:
+            # Live updates are best effort; the write itself already committed
+            logger.exception("Failed to publish %s for stall %s", event_type, stall_id)
+        return event
+
+    def dispatch(self, event: StallEvent) -> None:
+        """Deliver an event from the broker to this process's listeners and subscribers"""
+        for listener in self._listeners:
+            try:
+                listener(event)
+            except Exception:
+                logger.exception("Stall event listener failed on %s", event.type)
+
+        with self._lock:
+            if event.type == "resync" and event.stall_id == 0:
+                subscribers = [s for stall_subscribers in self._subscribers.values() for s in stall_subscribers]
+            else:
+                subscribers = list(self._subscribers.get(event.stall_id, ()))
+
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                # The subscriber's event loop has shut down
+                self.unsubscribe(subscription)
+
+
+def create_event_broker():
+    if settings.EVENT_BROKER == "postgres":
+        return PostgresNotifyBroker(settings.EVENT_BROKER_URL or settings.DATABASE_URL)
+    return InMemoryBroker()
+
+
+stall_event_hub = StallEventHub(create_event_broker())
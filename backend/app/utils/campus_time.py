@@ -0,0 +1,38 @@
+"""
+Campus clock helpers
+Stall opening hours, pickup windows and daily queue numbers follow the
+campus wall clock (CAMPUS_TIMEZONE), while timestamps in the database are
+naive UTC. Pickup windows are naive campus wall-clock times.
+"""
+
+from datetime import date, datetime, time, timezone
+from typing import Optional
+from zoneinfo import ZoneInfo
+
+from app.config import settings
+
+
+def campus_now() -> datetime:
+    """Current time in the campus timezone (timezone-aware)"""
+    return datetime.now(ZoneInfo(settings.CAMPUS_TIMEZONE))
+
+
+def campus_wall_clock() -> datetime:
+    """Current campus wall-clock time, naive like pickup windows"""
+    return campus_now().replace(tzinfo=None)
+
+
+def utc_to_campus(when: datetime) -> datetime:
+    """Naive UTC timestamp as naive campus wall-clock time"""
+    return when.replace(tzinfo=timezone.utc).astimezone(ZoneInfo(settings.CAMPUS_TIMEZONE)).replace(tzinfo=None)
+
+
+def campus_today(now: Optional[datetime] = None) -> date:
+    """The campus service day"""
+    return (now or campus_now()).date()
+
+
+def campus_day_start_utc(day: date) -> datetime:
+    """Campus midnight at the start of day, as naive UTC for comparing with stored timestamps"""
+    midnight = datetime.combine(day, time.min, tzinfo=ZoneInfo(settings.CAMPUS_TIMEZONE))
+    return midnight.astimezone(timezone.utc).replace(tzinfo=None)
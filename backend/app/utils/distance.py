@@ -4,7 +4,17 @@ for calculating distances between geographical coordinates
 """
 
 import math
-from typing import Optional
+from typing import List, Optional, Sequence
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:  # pragma: no cover - NumPy is optional
+    np = None
+    HAS_NUMPY = False
+
+# Radius of Earth in kilometers
+EARTH_RADIUS_KM = 6371.0
 
 def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     """
@@ -24,8 +34,7 @@ def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
         >>> calculate_distance(1.3470, 103.6802, 1.3424, 103.6824)
         0.545  # ~0.5 km
     """
-    # Radius of Earth in kilometers
-    R = 6371.0
+    R = EARTH_RADIUS_KM
 
     # Convert decimal degrees to radians
     lat1_rad = math.radians(lat1)
@@ -105,6 +114,122 @@ def get_distance_and_time(
     return distance, walking_time
 
 
+def calculate_distances(
+    user_lat: float,
+    user_lon: float,
+    stall_lats: Sequence[Optional[float]],
+    stall_lons: Sequence[Optional[float]],
+    precision: Optional[int] = 2
+) -> List[Optional[float]]:
+    """
+    Calculate distances from one origin to many points in a single call
+
+    Uses NumPy when it is installed and falls back to a plain Python loop
+    otherwise. Results match calculate_distance (kilometers, 2 decimals).
+
+    Args:
+        user_lat: Origin latitude (decimal degrees)
+        user_lon: Origin longitude (decimal degrees)
+        stall_lats: Latitudes of the points (None entries allowed)
+        stall_lons: Longitudes of the points (None entries allowed)
+        precision: Decimal places to round to, or None for unrounded distances
+
+    Returns:
+        List of distances in kilometers, None where coordinates are missing
+
+    Example:
+        >>> calculate_distances(1.3470, 103.6802, [1.3424, None], [103.6824, 103.68])
+        [0.57, None]
+    """
+    if len(stall_lats) != len(stall_lons):
+        raise ValueError("stall_lats and stall_lons must have the same length")
+
+    if HAS_NUMPY:
+        lats = np.radians(np.asarray(stall_lats, dtype=float))
+        lons = np.radians(np.asarray(stall_lons, dtype=float))
+        user_lat_rad = math.radians(user_lat)
+        user_lon_rad = math.radians(user_lon)
+
+        a = (np.sin((lats - user_lat_rad) / 2)**2
+             + math.cos(user_lat_rad) * np.cos(lats) * np.sin((lons - user_lon_rad) / 2)**2)
+        distances = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+        if precision is not None:
+            distances = np.round(distances, precision)
+
+        missing = np.isnan(distances)
+        result = distances.tolist()
+        if missing.any():
+            for i in np.flatnonzero(missing).tolist():
+                result[i] = None
+        return result
+
+    user_lat_rad = math.radians(user_lat)
+    user_lon_rad = math.radians(user_lon)
+    cos_user_lat = math.cos(user_lat_rad)
+    sin, cos, asin, sqrt, radians = math.sin, math.cos, math.asin, math.sqrt, math.radians
+
+    result = []
+    for lat, lon in zip(stall_lats, stall_lons):
+        if lat is None or lon is None:
+            result.append(None)
+            continue
+        lat_rad = radians(lat)
+        a = sin((lat_rad - user_lat_rad) / 2)**2 + cos_user_lat * cos(lat_rad) * sin((radians(lon) - user_lon_rad) / 2)**2
+        distance = 2 * EARTH_RADIUS_KM * asin(sqrt(a))
+        result.append(distance if precision is None else round(distance, precision))
+    return result
+
+
+def calculate_walking_times(
+    distances_km: Sequence[Optional[float]],
+    walking_speed_kmh: float = 5.0
+) -> List[Optional[int]]:
+    """
+    Batch version of calculate_walking_time
+
+    Args:
+        distances_km: Distances in kilometers (None entries allowed)
+        walking_speed_kmh: Average walking speed in km/h (default: 5 km/h)
+
+    Returns:
+        List of walking times in minutes, None where the distance is None
+    """
+    if HAS_NUMPY:
+        distances = np.asarray(distances_km, dtype=float)
+        minutes = np.maximum(1, np.ceil(distances / walking_speed_kmh * 60))
+        minutes = np.where(distances <= 0, 0, minutes)
+        return [None if d is None else int(m) for d, m in zip(distances_km, minutes.tolist())]
+
+    return [None if d is None else calculate_walking_time(d, walking_speed_kmh) for d in distances_km]
+
+
+def get_distances_and_times(
+    user_lat: float,
+    user_lon: float,
+    stall_lats: Sequence[Optional[float]],
+    stall_lons: Sequence[Optional[float]]
+) -> tuple[List[Optional[float]], List[Optional[int]]]:
+    """
+    Batch version of get_distance_and_time
+
+    Args:
+        user_lat: User's latitude
+        user_lon: User's longitude
+        stall_lats: Stall latitudes (None entries allowed)
+        stall_lons: Stall longitudes (None entries allowed)
+
+    Returns:
+        Tuple of (distances_km, walking_times_minutes) lists aligned with the
+        input, with None for stalls that have no coordinates
+
+    Example:
+        >>> get_distances_and_times(1.3470, 103.6802, [1.3424], [103.6824])
+        ([0.57], [7])
+    """
+    distances = calculate_distances(user_lat, user_lon, stall_lats, stall_lons)
+    return distances, calculate_walking_times(distances)
+
+
 def format_distance(distance_km: Optional[float]) -> str:
     """
     Format distance for display
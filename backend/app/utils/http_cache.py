@@ -0,0 +1,33 @@
+"""
+HTTP conditional request helpers
+Serves pre-serialized JSON bodies with a strong ETag (a hash of the body)
+and answers If-None-Match revalidations with 304 Not Modified.
+"""
+
+import hashlib
+from typing import Optional
+
+from fastapi import Response
+
+# Clients may reuse the body but must revalidate it first
+CACHE_CONTROL = "no-cache"
+
+
+def strong_etag(body: bytes) -> str:
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match uses weak comparison, so a W/ prefix still matches"""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+
+def json_response_with_etag(body: bytes, etag: str, if_none_match: Optional[str]) -> Response:
+    """200 with the body, or an empty 304 when the client already holds this version"""
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
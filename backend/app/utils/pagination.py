@@ -0,0 +1,46 @@
+"""
+Cursor helpers for keyset pagination
+List endpoints return the cursor for the next page in the X-Next-Cursor
+response header so their JSON bodies stay plain lists
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, Sequence, Tuple
+
+from fastapi import HTTPException
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(*values: Any) -> str:
+    """
+    Encode the sort key of the last item on a page as an opaque cursor
+
+    Example:
+        >>> encode_cursor(0.42, 7)
+        'WzAuNDIsIDdd'
+    """
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def decode_cursor(cursor: str, types: Sequence[Callable[[Any], Any]]) -> Tuple:
+    """
+    Decode a cursor produced by encode_cursor
+
+    Args:
+        cursor: Value sent back by the client
+        types: Converter for each value, e.g. (float, int) or (datetime.fromisoformat, int)
+
+    Raises:
+        HTTPException 400 if the cursor is malformed
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        if len(values) != len(types):
+            raise ValueError("cursor length mismatch")
+        return tuple(convert(value) for convert, value in zip(types, values))
+    except (ValueError, TypeError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
@@ -0,0 +1,64 @@
+"""
+Server-Sent Events helpers
+Streams StallEventHub events to an EventSource client, with periodic
+keep-alive comments so proxies (Render, Vercel) don't close idle streams
+"""
+
+import json
+from typing import AsyncIterator, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+from app.services.stall_events import StallEventHub
+
+HEARTBEAT_SECONDS = 15
+RETRY_MILLISECONDS = 3000
+KEEP_ALIVE_FRAME = ": keep-alive\n\n"
+
+
+def retry_frame() -> str:
+    """Tell EventSource how long to wait before reconnecting"""
+    return f"retry: {RETRY_MILLISECONDS}\n\n"
+
+
+def sse_frame(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def event_stream(
+    request: Request,
+    hub: StallEventHub,
+    stall_id: int,
+    event_prefixes: Optional[Tuple[str, ...]] = None,
+    heartbeat_seconds: float = HEARTBEAT_SECONDS
+) -> AsyncIterator[str]:
+    """
+    Yield SSE frames for one stall's events until the client disconnects.
+    With event_prefixes, only matching event types (and "resync") are sent.
+    """
+    subscription = hub.subscribe(stall_id)
+    try:
+        yield retry_frame()
+        while not await request.is_disconnected():
+            event = await subscription.get(timeout=heartbeat_seconds)
+            if event is None:
+                yield KEEP_ALIVE_FRAME
+                continue
+            if event_prefixes and event.type != "resync" and not event.type.startswith(event_prefixes):
+                continue
+            yield event.to_sse()
+    finally:
+        hub.unsubscribe(subscription)
+
+
+def sse_response(stream: AsyncIterator[str]) -> StreamingResponse:
+    return StreamingResponse(
+        stream,
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # Stop nginx-style proxies from buffering the stream
+            "X-Accel-Buffering": "no",
+        }
+    )
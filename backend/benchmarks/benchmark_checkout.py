@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Checkout latency benchmark for POST /api/orders/
+Runs the real route in-process against a throwaway SQLite database and adds a
+simulated network round trip to every SQL statement, so the numbers reflect
+how many round trips a checkout costs against a remote Postgres.
+
+Usage: python benchmarks/benchmark_checkout.py [--orders 200] [--items 5] [--rtt-ms 2]
+"""
+
+import sys
+import os
+import argparse
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Always benchmark against a throwaway database
+BENCHMARK_DB = os.path.join(tempfile.mkdtemp(), "benchmark_checkout.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{BENCHMARK_DB}"
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.main import app
+from app.database.database import Base, engine, SessionLocal
+from app.models.user import User, UserRole
+from app.models.stall import Stall
+from app.models.menu import MenuItem
+from app.routes.auth import create_access_token
+
+
+def seed(item_count):
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    db = SessionLocal()
+    try:
+        user = User(
+            ntu_email="bench.student@campuseats.com",
+            student_id="U0000001B",
+            name="Benchmark Student",
+            phone="+65 91234567",
+            hashed_password="not-used",
+            role=UserRole.STUDENT,
+            is_verified=True
+        )
+        stall = Stall(name="Benchmark Stall", location="North Spine", avg_prep_time=10, is_open=True)
+        db.add_all([user, stall])
+        db.flush()
+        # Uncapped (the column defaults to 10) so every timed checkout is admitted
+        stall.max_concurrent_orders = None
+
+        items = [
+            MenuItem(stall_id=stall.id, name=f"Dish {i}", price=4.5, prep_time=8, is_available=True)
+            for i in range(item_count)
+        ]
+        db.add_all(items)
+        db.commit()
+        return user.student_id, stall.id, [item.id for item in items]
+    finally:
+        db.close()
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark checkout latency")
+    parser.add_argument("--orders", type=int, default=200, help="Number of checkouts to time")
+    parser.add_argument("--items", type=int, default=5, help="Line items per order")
+    parser.add_argument("--rtt-ms", type=float, default=2.0, help="Simulated round trip per SQL statement")
+    args = parser.parse_args()
+
+    student_id, stall_id, menu_item_ids = seed(args.items)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': student_id})}"}
+
+    statements = {"count": 0}
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def simulate_round_trip(conn, cursor, statement, parameters, context, executemany):
+        statements["count"] += 1
+        if args.rtt_ms:
+            time.sleep(args.rtt_ms / 1000)
+
+    pickup_start = datetime.now() + timedelta(hours=1)
+    payload = {
+        "stall_id": stall_id,
+        "items": [{"menu_item_id": item_id, "quantity": 1} for item_id in menu_item_ids],
+        "pickup_window_start": pickup_start.isoformat(),
+        "pickup_window_end": (pickup_start + timedelta(minutes=15)).isoformat(),
+    }
+
+    latencies = []
+    statement_counts = []
+    with TestClient(app) as client:
+        # Warm-up request (connection pool, lazy caches)
+        client.post("/api/orders/", json=payload, headers=headers)
+
+        for _ in range(args.orders):
+            statements["count"] = 0
+            start = time.perf_counter()
+            response = client.post("/api/orders/", json=payload, headers=headers)
+            latencies.append((time.perf_counter() - start) * 1000)
+            statement_counts.append(statements["count"])
+            if response.status_code != 200:
+                raise SystemExit(f"Checkout failed: {response.status_code} {response.text}")
+
+    print("=" * 60)
+    print("CHECKOUT BENCHMARK")
+    print("=" * 60)
+    print(f"   Orders:               {args.orders}")
+    print(f"   Line items per order: {args.items}")
+    print(f"   Simulated RTT:        {args.rtt_ms} ms per statement")
+    print(f"   SQL statements/order: {statistics.median(statement_counts):.0f} (incl. auth lookup)")
+    print(f"   p50 latency:          {percentile(latencies, 50):.2f} ms")
+    print(f"   p99 latency:          {percentile(latencies, 99):.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: scalar get_distance_and_time loop vs batch get_distances_and_times
+Runs the NumPy path (when installed) and the pure-Python fallback at 100, 10k and 1M points
+
+Usage: python benchmarks/benchmark_distance.py [--sizes 100 10000 1000000] [--repeat 3]
+"""
+
+import sys
+import os
+import random
+import time
+import argparse
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils import distance
+
+# Rough bounding box around the campus
+LAT_RANGE = (1.336, 1.358)
+LNG_RANGE = (103.674, 103.695)
+USER_LAT, USER_LNG = 1.3470, 103.6802
+
+
+def best_of(repeat, func):
+    """Return the fastest wall-clock time of several runs, in seconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def scalar_path(lats, lngs):
+    return [distance.get_distance_and_time(USER_LAT, USER_LNG, lat, lng) for lat, lng in zip(lats, lngs)]
+
+
+def batch_path(lats, lngs, use_numpy):
+    has_numpy = distance.HAS_NUMPY
+    distance.HAS_NUMPY = use_numpy
+    try:
+        return distance.get_distances_and_times(USER_LAT, USER_LNG, lats, lngs)
+    finally:
+        distance.HAS_NUMPY = has_numpy
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batch haversine against the scalar path")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 10_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    random.seed(42)
+
+    print("=" * 72)
+    print("DISTANCE BENCHMARK (best of %d runs)" % args.repeat)
+    print("NumPy available: %s" % distance.HAS_NUMPY)
+    print("=" * 72)
+    print(f"{'points':>10} {'scalar (ms)':>14} {'batch py (ms)':>14} {'batch np (ms)':>14} {'speedup':>9}")
+
+    for size in args.sizes:
+        lats = [random.uniform(*LAT_RANGE) for _ in range(size)]
+        lngs = [random.uniform(*LNG_RANGE) for _ in range(size)]
+
+        scalar = best_of(args.repeat, lambda: scalar_path(lats, lngs))
+        batch_py = best_of(args.repeat, lambda: batch_path(lats, lngs, use_numpy=False))
+
+        if distance.HAS_NUMPY:
+            batch_np = best_of(args.repeat, lambda: batch_path(lats, lngs, use_numpy=True))
+            fastest = min(batch_py, batch_np)
+            np_column = f"{batch_np * 1000:>14.2f}"
+        else:
+            fastest = batch_py
+            np_column = f"{'n/a':>14}"
+
+        print(f"{size:>10} {scalar * 1000:>14.2f} {batch_py * 1000:>14.2f} {np_column} {scalar / fastest:>8.1f}x")
+
+    # Sanity check: both paths agree
+    lats = [random.uniform(*LAT_RANGE) for _ in range(1000)]
+    lngs = [random.uniform(*LNG_RANGE) for _ in range(1000)]
+    expected = scalar_path(lats, lngs)
+    for use_numpy in ([False, True] if distance.HAS_NUMPY else [False]):
+        distances, times = batch_path(lats, lngs, use_numpy)
+        assert list(zip(distances, times)) == expected, "batch result differs from scalar path"
+    print("\n✅ Batch results match the scalar path")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Login throughput benchmark at increasing concurrency
+Fires concurrent POST /api/auth/login requests at the app on a single event
+loop (as one uvicorn worker would see them), with a simulated network round
+trip added to every SQL statement. If bcrypt or the database block the loop,
+throughput stays flat as concurrency grows; when that work runs in the
+threadpool, the round trips overlap and throughput scales with the cores.
+It also measures event loop lag while the logins run: how late a 50 ms
+asyncio.sleep() wakes up. A blocked loop cannot serve any other request (not
+even /health) until the current bcrypt verify finishes.
+
+Usage: python benchmarks/benchmark_login_concurrency.py [--levels 1 2 4 8] [--requests 32] [--rtt-ms 20]
+"""
+
+import sys
+import os
+import argparse
+import asyncio
+import tempfile
+import time
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Always benchmark against a throwaway database
+BENCHMARK_DB = os.path.join(tempfile.mkdtemp(), "benchmark_login.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{BENCHMARK_DB}"
+
+import httpx
+from sqlalchemy import event
+
+from app.main import app
+from app.database.database import Base, engine, SessionLocal
+from app.models.user import User, UserRole
+from app.routes.auth import get_password_hash
+
+EMAIL = "bench.login@campuseats.com"
+PASSWORD = "BenchPassword123"
+
+
+def seed():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    db = SessionLocal()
+    try:
+        db.add(User(
+            ntu_email=EMAIL,
+            student_id="U0000002C",
+            name="Benchmark Login",
+            phone="+65 91234567",
+            hashed_password=get_password_hash(PASSWORD),
+            role=UserRole.STUDENT,
+            is_verified=True
+        ))
+        db.commit()
+    finally:
+        db.close()
+
+
+async def run_level(client, concurrency, total_requests):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def login():
+        async with semaphore:
+            response = await client.post("/api/auth/login", json={"ntu_email": EMAIL, "password": PASSWORD})
+            if response.status_code != 200:
+                raise SystemExit(f"Login failed: {response.status_code} {response.text}")
+
+    loop_lags = []
+    done = asyncio.Event()
+
+    async def probe_loop_lag():
+        while not done.is_set():
+            probe_start = time.perf_counter()
+            await asyncio.sleep(0.05)
+            loop_lags.append((time.perf_counter() - probe_start - 0.05) * 1000)
+
+    probe = asyncio.create_task(probe_loop_lag())
+    start = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(total_requests)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await probe
+    return total_requests / elapsed, max(loop_lags)
+
+
+async def main(levels, total_requests, rtt_ms):
+    @event.listens_for(engine, "before_cursor_execute")
+    def simulate_round_trip(conn, cursor, statement, parameters, context, executemany):
+        if rtt_ms:
+            time.sleep(rtt_ms / 1000)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        # Warm-up
+        await run_level(client, 1, 2)
+
+        print("=" * 50)
+        print("LOGIN CONCURRENCY BENCHMARK")
+        print("=" * 50)
+        print(f"   Simulated RTT: {rtt_ms} ms per statement")
+        print(f"{'concurrency':>12} {'logins/s':>12} {'scaling':>10} {'max loop lag':>14}")
+
+        baseline = None
+        for level in levels:
+            throughput, loop_lag = await run_level(client, level, total_requests)
+            baseline = baseline or throughput
+            print(f"{level:>12} {throughput:>12.1f} {throughput / baseline:>9.1f}x {loop_lag:>11.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark concurrent login throughput")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--requests", type=int, default=32, help="Logins per concurrency level")
+    parser.add_argument("--rtt-ms", type=float, default=20.0, help="Simulated round trip per SQL statement")
+    args = parser.parse_args()
+
+    seed()
+    asyncio.run(main(args.levels, args.requests, args.rtt_ms))
@@ -0,0 +1,136 @@
+"""
+Shared test setup
+Tests run in-process against throwaway SQLite databases bound to the app
+through dependency_overrides, and every test starts from empty in-process
+singletons (queue index, queue numbers, prep times, admission, menu cache,
+menu search index and idempotency keys).
+
+    python -m pytest
+"""
+import socket
+import threading
+import time
+from dataclasses import dataclass
+
+import pytest
+import uvicorn
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.main import app
+from app.database.database import Base, get_async_db, get_async_read_db, get_db, get_read_db
+from app.routes import orders as orders_routes
+from app.services.admission import stall_admission
+from app.services.idempotency import create_idempotency_store
+from app.services.menu_cache import menu_cache
+from app.services.menu_search import menu_search_index
+from app.services.prep_times import prep_time_model
+from app.services.queue_index import stall_queue_index
+from app.services.queue_numbers import queue_number_allocator
+
+
+@dataclass
+class TestDatabase:
+    """A SQLite file with sync and async session factories"""
+    engine: Engine
+    Session: sessionmaker
+    async_engine: AsyncEngine
+    AsyncSession: async_sessionmaker
+
+    __test__ = False  # not a test class
+
+    def override_get_db(self):
+        db = self.Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def override_get_async_db(self):
+        async with self.AsyncSession() as db:
+            yield db
+
+    def serve_writes(self) -> None:
+        """Bind the app's primary database dependencies to this database"""
+        app.dependency_overrides[get_db] = self.override_get_db
+        app.dependency_overrides[get_async_db] = self.override_get_async_db
+
+    def serve_reads(self) -> None:
+        """Bind the app's read replica dependencies to this database"""
+        app.dependency_overrides[get_read_db] = self.override_get_db
+        app.dependency_overrides[get_async_read_db] = self.override_get_async_db
+
+
+@pytest.fixture
+def make_database(tmp_path):
+    """Create a named throwaway database with every table"""
+    databases = []
+
+    def make(name: str = "test") -> TestDatabase:
+        path = tmp_path / f"{name}.db"
+        engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False, "timeout": 30})
+        Base.metadata.create_all(bind=engine)
+        async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+        database = TestDatabase(
+            engine=engine,
+            Session=sessionmaker(autocommit=False, autoflush=False, bind=engine),
+            async_engine=async_engine,
+            AsyncSession=async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False),
+        )
+        databases.append(database)
+        return database
+
+    yield make
+    for database in databases:
+        database.engine.dispose()
+
+
+@pytest.fixture
+def database(make_database) -> TestDatabase:
+    return make_database()
+
+
+@pytest.fixture
+def client(database):
+    """Client for the app with the primary and the replica both bound to database"""
+    database.serve_writes()
+    database.serve_reads()
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def live_server(database):
+    """Base URL of the app served by uvicorn on a free local port, for streams TestClient would buffer"""
+    database.serve_writes()
+    database.serve_reads()
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, lifespan="off", log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    deadline = time.time() + 10
+    while not server.started and time.time() < deadline:
+        time.sleep(0.01)
+    yield f"http://127.0.0.1:{port}"
+    server.should_exit = True
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture(autouse=True)
+def fresh_singletons():
+    """Start every test from empty in-process state"""
+    default_store = orders_routes.idempotency_store
+    orders_routes.idempotency_store = create_idempotency_store()
+    stall_queue_index.reset()
+    queue_number_allocator.reset()
+    prep_time_model.reset()
+    stall_admission.reset()
+    menu_cache.reset()
+    menu_search_index.reset()
+    yield
+    orders_routes.idempotency_store = default_store
+    app.dependency_overrides.clear()
@@ -0,0 +1,80 @@
+"""
+Migration script to index the hot query predicates
+Adds composite indexes for the queue board, order listings, stall reviews,
+menu lookups and OTP expiry. On PostgreSQL the queue and stall order
+indexes are partial (active statuses only) and are built CONCURRENTLY so
+checkout keeps running while they build.
+Works with both SQLite and PostgreSQL
+"""
+
+import sys
+import os
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.config import settings
+from app.models.order import ACTIVE_ORDER_PREDICATE
+from app.models.queue import ACTIVE_QUEUE_ENTRY_PREDICATE
+from sqlalchemy import create_engine, text
+
+# (index name, table, columns, partial index predicate on PostgreSQL)
+INDEXES = [
+    ("ix_queue_entries_stall_status_position", "queue_entries", "stall_id, status, queue_position", ACTIVE_QUEUE_ENTRY_PREDICATE),
+    ("ix_orders_user_created", "orders", "user_id, created_at", None),
+    ("ix_orders_stall_status_created", "orders", "stall_id, status, created_at", ACTIVE_ORDER_PREDICATE),
+    ("ix_reviews_stall_created", "reviews", "stall_id, created_at", None),
+    ("ix_menu_items_stall_id", "menu_items", "stall_id", None),
+    ("ix_otp_verifications_expires_at", "otp_verifications", "expires_at", None),
+]
+
+def migrate():
+    """Create the hot query indexes"""
+
+    engine = create_engine(settings.DATABASE_URL)
+    is_postgres = engine.dialect.name == "postgresql"
+
+    try:
+        # CREATE INDEX CONCURRENTLY can't run inside a transaction block
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            for name, table, columns, predicate in INDEXES:
+                if is_postgres:
+                    where = f" WHERE {predicate}" if predicate else ""
+                    conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({columns}){where}"))
+                else:
+                    conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})"))
+                print(f"✅ Created {name} (or it already existed)")
+
+        print("\n✅ Migration completed successfully!")
+
+    except Exception as e:
+        print(f"\n❌ Migration failed: {str(e)}")
+        raise
+
+def rollback():
+    """Drop the hot query indexes"""
+
+    engine = create_engine(settings.DATABASE_URL)
+
+    try:
+        with engine.connect() as conn:
+            for name, _, _, _ in INDEXES:
+                conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+            conn.commit()
+            print("✅ Rollback completed successfully!")
+
+    except Exception as e:
+        print(f"❌ Rollback failed: {str(e)}")
+        raise
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Index the hot query predicates")
+    parser.add_argument("--rollback", action="store_true", help="Rollback the migration")
+    args = parser.parse_args()
+
+    if args.rollback:
+        rollback()
+    else:
+        migrate()
@@ -0,0 +1,85 @@
+"""
+Migration script to add locked_until to idempotency_keys
+Gives in-flight Idempotency-Key reservations a short lease, so a request
+that dies mid-checkout no longer blocks retries for the whole TTL
+Works with both SQLite and PostgreSQL
+"""
+
+import sys
+import os
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.config import settings
+from sqlalchemy import create_engine, text
+
+def migrate():
+    """Add locked_until column to idempotency_keys table"""
+
+    engine = create_engine(settings.DATABASE_URL)
+
+    try:
+        with engine.connect() as conn:
+            is_postgres = settings.DATABASE_URL.startswith("postgresql")
+
+            if is_postgres:
+                result = conn.execute(text("""
+                    SELECT column_name
+                    FROM information_schema.columns
+                    WHERE table_name = 'idempotency_keys'
+                """))
+                existing_columns = [row[0] for row in result]
+            else:
+                result = conn.execute(text("PRAGMA table_info(idempotency_keys)"))
+                existing_columns = [row[1] for row in result]
+
+            # Existing in-flight reservations keep NULL, which counts as an expired lease
+            if not existing_columns:
+                print("⏭️  idempotency_keys table does not exist yet")
+            elif "locked_until" not in existing_columns:
+                data_type = "TIMESTAMP" if is_postgres else "DATETIME"
+                conn.execute(text(f"ALTER TABLE idempotency_keys ADD COLUMN locked_until {data_type}"))
+                conn.commit()
+                print("✅ Added locked_until column")
+            else:
+                print("⏭️  locked_until column already exists")
+
+        print("\n✅ Migration completed successfully!")
+
+    except Exception as e:
+        print(f"\n❌ Migration failed: {str(e)}")
+        raise
+
+def rollback():
+    """Remove locked_until column from idempotency_keys table"""
+
+    engine = create_engine(settings.DATABASE_URL)
+    is_postgres = settings.DATABASE_URL.startswith("postgresql")
+
+    if not is_postgres:
+        print("⚠️  SQLite doesn't support DROP COLUMN directly.")
+        print("To rollback, you would need to recreate the table.")
+        return
+
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("ALTER TABLE idempotency_keys DROP COLUMN IF EXISTS locked_until"))
+            conn.commit()
+            print("✅ Rollback completed successfully!")
+
+    except Exception as e:
+        print(f"❌ Rollback failed: {str(e)}")
+        raise
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Add locked_until to idempotency_keys table")
+    parser.add_argument("--rollback", action="store_true", help="Rollback the migration")
+    args = parser.parse_args()
+
+    if args.rollback:
+        rollback()
+    else:
+        migrate()
@@ -0,0 +1,82 @@
+"""
+Migration script to add day to stall_queue_counters
+Records the campus service day each stall's counter is numbering, so
+queue numbers restart at 1 every day
+Works with both SQLite and PostgreSQL
+"""
+
+import sys
+import os
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.config import settings
+from sqlalchemy import create_engine, text
+
+def migrate():
+    """Add day column to stall_queue_counters table"""
+
+    engine = create_engine(settings.DATABASE_URL)
+
+    try:
+        with engine.connect() as conn:
+            is_postgres = settings.DATABASE_URL.startswith("postgresql")
+
+            if is_postgres:
+                result = conn.execute(text("""
+                    SELECT column_name
+                    FROM information_schema.columns
+                    WHERE table_name = 'stall_queue_counters'
+                """))
+                existing_columns = [row[0] for row in result]
+            else:
+                result = conn.execute(text("PRAGMA table_info(stall_queue_counters)"))
+                existing_columns = [row[1] for row in result]
+
+            # Existing counters keep NULL and carry on from their last number for the current day
+            if "day" not in existing_columns:
+                conn.execute(text("ALTER TABLE stall_queue_counters ADD COLUMN day DATE"))
+                conn.commit()
+                print("✅ Added day column")
+            else:
+                print("⏭️  day column already exists")
+
+        print("\n✅ Migration completed successfully!")
+
+    except Exception as e:
+        print(f"\n❌ Migration failed: {str(e)}")
+        raise
+
+def rollback():
+    """Remove day column from stall_queue_counters table"""
+
+    engine = create_engine(settings.DATABASE_URL)
+    is_postgres = settings.DATABASE_URL.startswith("postgresql")
+
+    if not is_postgres:
+        print("⚠️  SQLite doesn't support DROP COLUMN directly.")
+        print("To rollback, you would need to recreate the table.")
+        return
+
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("ALTER TABLE stall_queue_counters DROP COLUMN IF EXISTS day"))
+            conn.commit()
+            print("✅ Rollback completed successfully!")
+
+    except Exception as e:
+        print(f"❌ Rollback failed: {str(e)}")
+        raise
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Add day to stall_queue_counters table")
+    parser.add_argument("--rollback", action="store_true", help="Rollback the migration")
+    args = parser.parse_args()
+
+    if args.rollback:
+        rollback()
+    else:
+        migrate()
@@ -0,0 +1,82 @@
+"""
+Migration script to add prep_minutes to queue_entries
+Stores each order's expected prep time, estimated at checkout from the
+learned per-item prep times, so queue ETAs can sum the orders ahead
+Works with both SQLite and PostgreSQL
+"""
+
+import sys
+import os
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.config import settings
+from sqlalchemy import create_engine, text
+
+def migrate():
+    """Add prep_minutes column to queue_entries table"""
+
+    engine = create_engine(settings.DATABASE_URL)
+
+    try:
+        with engine.connect() as conn:
+            is_postgres = settings.DATABASE_URL.startswith("postgresql")
+
+            if is_postgres:
+                result = conn.execute(text("""
+                    SELECT column_name
+                    FROM information_schema.columns
+                    WHERE table_name = 'queue_entries'
+                """))
+                existing_columns = [row[0] for row in result]
+            else:
+                result = conn.execute(text("PRAGMA table_info(queue_entries)"))
+                existing_columns = [row[1] for row in result]
+
+            # Existing entries keep NULL and fall back to the stall's learned average
+            if "prep_minutes" not in existing_columns:
+                conn.execute(text("ALTER TABLE queue_entries ADD COLUMN prep_minutes INTEGER"))
+                conn.commit()
+                print("✅ Added prep_minutes column")
+            else:
+                print("⏭️  prep_minutes column already exists")
+
+        print("\n✅ Migration completed successfully!")
+
+    except Exception as e:
+        print(f"\n❌ Migration failed: {str(e)}")
+        raise
+
+def rollback():
+    """Remove prep_minutes column from queue_entries table"""
+
+    engine = create_engine(settings.DATABASE_URL)
+    is_postgres = settings.DATABASE_URL.startswith("postgresql")
+
+    if not is_postgres:
+        print("⚠️  SQLite doesn't support DROP COLUMN directly.")
+        print("To rollback, you would need to recreate the table.")
+        return
+
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("ALTER TABLE queue_entries DROP COLUMN IF EXISTS prep_minutes"))
+            conn.commit()
+            print("✅ Rollback completed successfully!")
+
+    except Exception as e:
+        print(f"❌ Rollback failed: {str(e)}")
+        raise
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Add prep_minutes to queue_entries table")
+    parser.add_argument("--rollback", action="store_true", help="Rollback the migration")
+    args = parser.parse_args()
+
+    if args.rollback:
+        rollback()
+    else:
+        migrate()
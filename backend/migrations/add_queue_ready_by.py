@@ -0,0 +1,109 @@
+"""
+Migration script to add ready_by to queue_entries
+Stores each order's pickup deadline (its pickup window start) so the
+prep queue can run earliest deadline first, and backfills it for existing
+entries so every deadline is on the campus clock
+Works with both SQLite and PostgreSQL
+"""
+
+import sys
+import os
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from datetime import datetime
+
+from app.config import settings
+from app.utils.campus_time import utc_to_campus
+from sqlalchemy import create_engine, text
+
+def migrate():
+    """Add ready_by column to queue_entries table"""
+
+    engine = create_engine(settings.DATABASE_URL)
+
+    try:
+        with engine.connect() as conn:
+            is_postgres = settings.DATABASE_URL.startswith("postgresql")
+
+            if is_postgres:
+                result = conn.execute(text("""
+                    SELECT column_name
+                    FROM information_schema.columns
+                    WHERE table_name = 'queue_entries'
+                """))
+                existing_columns = [row[0] for row in result]
+            else:
+                result = conn.execute(text("PRAGMA table_info(queue_entries)"))
+                existing_columns = [row[1] for row in result]
+
+            if "ready_by" not in existing_columns:
+                data_type = "TIMESTAMP" if is_postgres else "DATETIME"
+                conn.execute(text(f"ALTER TABLE queue_entries ADD COLUMN ready_by {data_type}"))
+                conn.commit()
+                print("✅ Added ready_by column")
+            else:
+                print("⏭️  ready_by column already exists")
+
+            # Existing entries are due at their order's pickup window start
+            result = conn.execute(text("""
+                UPDATE queue_entries
+                SET ready_by = (SELECT pickup_window_start FROM orders WHERE orders.id = queue_entries.order_id)
+                WHERE ready_by IS NULL
+                  AND order_id IN (SELECT id FROM orders WHERE pickup_window_start IS NOT NULL)
+            """))
+            print(f"✅ Backfilled ready_by for {result.rowcount} entries from pickup windows")
+
+            # ...or, without a pickup window, when they joined the queue
+            # (joined_at is UTC, pickup windows are on the campus clock)
+            rows = conn.execute(text("SELECT id, joined_at FROM queue_entries WHERE ready_by IS NULL AND joined_at IS NOT NULL")).all()
+            for entry_id, joined_at in rows:
+                if not isinstance(joined_at, datetime):
+                    joined_at = datetime.fromisoformat(joined_at)
+                ready_by = utc_to_campus(joined_at)
+                conn.execute(
+                    text("UPDATE queue_entries SET ready_by = :ready_by WHERE id = :id"),
+                    {"ready_by": ready_by if is_postgres else ready_by.strftime("%Y-%m-%d %H:%M:%S.%f"), "id": entry_id}
+                )
+            conn.commit()
+            print(f"✅ Backfilled ready_by for {len(rows)} entries from their join time")
+
+        print("\n✅ Migration completed successfully!")
+
+    except Exception as e:
+        print(f"\n❌ Migration failed: {str(e)}")
+        raise
+
+def rollback():
+    """Remove ready_by column from queue_entries table"""
+
+    engine = create_engine(settings.DATABASE_URL)
+    is_postgres = settings.DATABASE_URL.startswith("postgresql")
+
+    if not is_postgres:
+        print("⚠️  SQLite doesn't support DROP COLUMN directly.")
+        print("To rollback, you would need to recreate the table.")
+        return
+
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("ALTER TABLE queue_entries DROP COLUMN IF EXISTS ready_by"))
+            conn.commit()
+            print("✅ Rollback completed successfully!")
+
+    except Exception as e:
+        print(f"❌ Rollback failed: {str(e)}")
+        raise
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Add ready_by to queue_entries table")
+    parser.add_argument("--rollback", action="store_true", help="Rollback the migration")
+    args = parser.parse_args()
+
+    if args.rollback:
+        rollback()
+    else:
+        migrate()
@@ -0,0 +1,86 @@
+"""
+Migration script to add the stall_rating_stats table
+Holds each stall's review count, rating sum and whole-star histogram, which
+review writes keep up to date by delta; backfilled from existing reviews
+Works with both SQLite and PostgreSQL
+"""
+
+import sys
+import os
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.config import settings
+from sqlalchemy import create_engine, inspect, text
+
+from app.models import StallRatingTotals
+
+# Whole-star buckets use round-half-to-even like Python's round()
+STAR_BUCKETS = {
+    1: "rating < 1.5",
+    2: "rating >= 1.5 AND rating <= 2.5",
+    3: "rating > 2.5 AND rating < 3.5",
+    4: "rating >= 3.5 AND rating <= 4.5",
+    5: "rating > 4.5",
+}
+
+def migrate():
+    """Create stall_rating_stats and backfill it from reviews"""
+
+    engine = create_engine(settings.DATABASE_URL)
+
+    try:
+        if inspect(engine).has_table("stall_rating_stats"):
+            print("⏭️  stall_rating_stats table already exists")
+        else:
+            StallRatingTotals.__table__.create(bind=engine)
+            print("✅ Created stall_rating_stats table")
+
+        with engine.connect() as conn:
+            star_counts = ", ".join(
+                f"SUM(CASE WHEN {condition} THEN 1 ELSE 0 END)" for condition in STAR_BUCKETS.values()
+            )
+            result = conn.execute(text(f"""
+                INSERT INTO stall_rating_stats
+                    (stall_id, review_count, rating_sum, stars_1, stars_2, stars_3, stars_4, stars_5)
+                SELECT stall_id, COUNT(*), SUM(rating), {star_counts}
+                FROM reviews
+                WHERE stall_id NOT IN (SELECT stall_id FROM stall_rating_stats)
+                GROUP BY stall_id
+            """))
+            conn.commit()
+            print(f"✅ Backfilled rating stats for {result.rowcount} stalls")
+
+        print("\n✅ Migration completed successfully!")
+
+    except Exception as e:
+        print(f"\n❌ Migration failed: {str(e)}")
+        raise
+
+def rollback():
+    """Drop the stall_rating_stats table"""
+
+    engine = create_engine(settings.DATABASE_URL)
+
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("DROP TABLE IF EXISTS stall_rating_stats"))
+            conn.commit()
+            print("✅ Rollback completed successfully!")
+
+    except Exception as e:
+        print(f"❌ Rollback failed: {str(e)}")
+        raise
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Add the stall_rating_stats table")
+    parser.add_argument("--rollback", action="store_true", help="Rollback the migration")
+    args = parser.parse_args()
+
+    if args.rollback:
+        rollback()
+    else:
+        migrate()
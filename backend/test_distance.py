@@ -0,0 +1,56 @@
+"""
+Batch distance test.
+calculate_distances and get_distances_and_times agree with the scalar
+calculate_distance / get_distance_and_time for every point, give None for
+points without coordinates and handle an empty input, both with NumPy and
+with the plain Python fallback.
+"""
+
+import pytest
+
+from app.utils import distance
+from app.utils.distance import (
+    calculate_distance, calculate_distances, get_distance_and_time, get_distances_and_times
+)
+
+ORIGIN = (1.3483, 103.6831)
+POINTS = [
+    (1.3470, 103.6802),
+    (1.3424, 103.6824),
+    (1.3483, 103.6831),  # the origin itself
+    (None, 103.6800),
+    (1.3500, None),
+    (1.2966, 103.7764),
+    (None, None),
+]
+
+
+@pytest.fixture(params=[True, False], ids=["numpy", "pure-python"])
+def implementation(request, monkeypatch):
+    """Run the test with NumPy (when installed) and without it"""
+    if request.param and not distance.HAS_NUMPY:
+        pytest.skip("NumPy is not installed")
+    monkeypatch.setattr(distance, "HAS_NUMPY", request.param)
+
+
+def test_batch_matches_scalar(implementation):
+    lats = [lat for lat, _ in POINTS]
+    lons = [lon for _, lon in POINTS]
+    expected = [
+        None if lat is None or lon is None else calculate_distance(*ORIGIN, lat, lon) for lat, lon in POINTS
+    ]
+    assert calculate_distances(*ORIGIN, lats, lons) == expected
+
+    unrounded = calculate_distances(*ORIGIN, lats, lons, precision=None)
+    for got, want in zip(unrounded, expected):
+        assert (got is None) == (want is None) and (got is None or abs(got - want) <= 0.005)
+
+    distances, times = get_distances_and_times(*ORIGIN, lats, lons)
+    assert list(zip(distances, times)) == [get_distance_and_time(*ORIGIN, lat, lon) for lat, lon in POINTS]
+
+
+def test_empty_and_mismatched_input(implementation):
+    assert calculate_distances(*ORIGIN, [], []) == []
+    assert get_distances_and_times(*ORIGIN, [], []) == ([], [])
+    with pytest.raises(ValueError):
+        calculate_distances(*ORIGIN, [1.35], [])
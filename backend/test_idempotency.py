@@ -0,0 +1,132 @@
+"""
+Idempotency-Key test.
+Retrying POST /api/orders/ with the same key and body replays the first
+response, and reusing the key with another body is rejected. Concurrent
+duplicates get one owner; a reservation whose request died is taken over
+once its lease runs out, and the memory LRU never evicts in-flight keys.
+Covers both the memory and the database stores.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import pytest
+
+from app.models.user import User, UserRole
+from app.models.stall import Stall
+from app.models.menu import MenuItem
+from app.models.order import Order
+from app.routes import orders as orders_routes
+from app.routes.auth import create_access_token
+from app.services.idempotency import (
+    COMPLETED, IN_PROGRESS, MISMATCH, NEW, DatabaseIdempotencyStore, InMemoryIdempotencyStore
+)
+from app.utils.campus_time import campus_wall_clock
+
+STUDENT_ID = "U7700001A"
+LEASE_SECONDS = 0.3
+
+
+@pytest.fixture(params=["memory", "database"])
+def make_store(request, make_database):
+    """Build either idempotency store with the given reservation lease"""
+    def make(lock_seconds=LEASE_SECONDS):
+        if request.param == "memory":
+            return InMemoryIdempotencyStore(max_keys=100, ttl_seconds=3600, lock_seconds=lock_seconds)
+        return DatabaseIdempotencyStore(
+            ttl_seconds=3600, lock_seconds=lock_seconds, session_factory=make_database("idempotency").Session
+        )
+    return make
+
+
+@pytest.fixture
+def database(database):
+    """The test database with a student and a stall with one menu item"""
+    db = database.Session()
+    try:
+        db.add(User(ntu_email="idempotency.student@campuseats.com", student_id=STUDENT_ID, name="Student",
+                    phone="+65 96234599", hashed_password="not-used", role=UserRole.STUDENT, is_verified=True))
+        db.add(Stall(name="Retry Stall", location="North Spine", avg_prep_time=10))
+        db.flush()
+        db.add(MenuItem(stall_id=1, name="Mee Goreng", price=4.0, prep_time=6, is_available=True))
+        db.commit()
+    finally:
+        db.close()
+    return database
+
+
+def place_order(client, key, pickup, quantity=1):
+    return client.post("/api/orders/", headers={
+        "Authorization": f"Bearer {create_access_token({'sub': STUDENT_ID})}",
+        "Idempotency-Key": key,
+    }, json={
+        "stall_id": 1,
+        "items": [{"menu_item_id": 1, "quantity": quantity}],
+        "pickup_window_start": pickup.isoformat(),
+        "pickup_window_end": (pickup + timedelta(minutes=15)).isoformat(),
+    })
+
+
+def test_retry_replays_and_conflicting_body_is_rejected(client, database, make_store):
+    orders_routes.idempotency_store = make_store()
+    pickup = campus_wall_clock() + timedelta(minutes=30)
+
+    first = place_order(client, "checkout-1", pickup)
+    assert first.status_code == 200, first.text
+    assert "Idempotent-Replayed" not in first.headers
+
+    retry = place_order(client, "checkout-1", pickup)
+    assert retry.status_code == 200, retry.text
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json()["id"] == first.json()["id"]
+
+    conflicting = place_order(client, "checkout-1", pickup, quantity=2)
+    assert conflicting.status_code == 422, conflicting.text
+
+    db = database.Session()
+    try:
+        assert db.query(Order).count() == 1
+    finally:
+        db.close()
+
+
+def test_concurrent_duplicates_have_one_owner(make_store):
+    store = make_store(lock_seconds=60)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        states = list(pool.map(lambda _: store.begin("1:double-tap", "hash")[0], range(8)))
+    assert sorted(states) == [IN_PROGRESS] * 7 + [NEW], states
+
+    store.complete("1:double-tap", 200, {"id": 7})
+    state, stored = store.begin("1:double-tap", "hash")
+    assert state == COMPLETED and stored.body == {"id": 7}
+    assert store.begin("1:double-tap", "other-hash") == (MISMATCH, None)
+
+
+def test_expired_lease_is_taken_over(make_store):
+    store = make_store()
+    assert store.begin("1:crashed", "hash") == (NEW, None)
+    assert store.begin("1:crashed", "hash") == (IN_PROGRESS, None)
+
+    # The first attempt never completes or releases the key
+    time.sleep(LEASE_SECONDS + 0.1)
+    assert store.begin("1:crashed", "hash") == (NEW, None)
+    assert store.begin("1:crashed", "hash") == (IN_PROGRESS, None)
+
+    store.complete("1:crashed", 200, {"id": 9})
+    time.sleep(LEASE_SECONDS + 0.1)
+    state, stored = store.begin("1:crashed", "hash")
+    assert state == COMPLETED and stored.body == {"id": 9}
+
+
+def test_lru_keeps_in_flight_keys():
+    store = InMemoryIdempotencyStore(max_keys=3, ttl_seconds=3600, lock_seconds=60)
+    assert store.begin("1:in-flight", "hash") == (NEW, None)
+    for i in range(10):
+        store.begin(f"1:done-{i}", "hash")
+        store.complete(f"1:done-{i}", 200, {"id": i})
+
+    assert store.begin("1:in-flight", "hash") == (IN_PROGRESS, None)
+    assert store.begin("1:done-9", "hash")[0] == COMPLETED
+    assert store.begin("1:done-0", "hash") == (NEW, None)
+
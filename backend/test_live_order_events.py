@@ -0,0 +1,106 @@
+"""
+Live order board test.
+Subscribes to GET /api/orders/stall/{id}/events as the stall owner and
+checks that placing and progressing an order streams one event per step.
+"""
+
+import json
+import threading
+import time
+from datetime import timedelta
+
+import httpx
+import pytest
+
+from app.models.user import User, UserRole
+from app.models.stall import Stall
+from app.models.menu import MenuItem
+from app.routes.auth import create_access_token
+from app.services.stall_events import stall_event_hub
+from app.utils.campus_time import campus_wall_clock
+
+STUDENT_ID = "U7100001E"
+OWNER_ID = "S7100001O"
+
+
+@pytest.fixture
+def stall_id(database):
+    """The stall the student orders from, owned by the stall owner"""
+    db = database.Session()
+    try:
+        owner = User(ntu_email="live.owner@campuseats.com", student_id=OWNER_ID, name="Live Owner",
+                     phone="+65 91234567", hashed_password="not-used", role=UserRole.STALL_OWNER, is_verified=True)
+        student = User(ntu_email="live.student@campuseats.com", student_id=STUDENT_ID, name="Live Student",
+                       phone="+65 91234568", hashed_password="not-used", role=UserRole.STUDENT, is_verified=True)
+        db.add_all([owner, student])
+        db.flush()
+        stall = Stall(name="Live Stall", location="North Spine", avg_prep_time=10, owner_id=owner.id)
+        db.add(stall)
+        db.flush()
+        db.add(MenuItem(stall_id=stall.id, name="Chicken Rice", price=4.5, prep_time=8, is_available=True))
+        db.commit()
+        stall_id = stall.id
+    finally:
+        db.close()
+    return stall_id
+
+
+def headers_for(student_id):
+    return {"Authorization": f"Bearer {create_access_token({'sub': student_id})}"}
+
+
+def read_events(url, count, received):
+    """Collect `count` SSE events (name, data) from url into received"""
+    with httpx.stream("GET", url, timeout=10) as response:
+        assert response.status_code == 200
+        name = None
+        for line in response.iter_lines():
+            if line.startswith("event: "):
+                name = line[len("event: "):]
+            elif line.startswith("data: ") and name:
+                received.append((name, json.loads(line[len("data: "):])))
+                if len(received) == count:
+                    return
+
+
+def test_order_lifecycle_is_streamed_to_stall_owner(live_server, stall_id):
+    base_url = live_server
+    client = httpx.Client(base_url=base_url, timeout=10)
+    try:
+        token = create_access_token({"sub": OWNER_ID})
+        url = f"{base_url}/api/orders/stall/{stall_id}/events?access_token={token}"
+
+        assert client.get(f"/api/orders/stall/{stall_id}/events", headers=headers_for(STUDENT_ID)).status_code == 403
+
+        received = []
+        reader = threading.Thread(target=read_events, args=(url, 5, received), daemon=True)
+        reader.start()
+        deadline = time.time() + 5
+        while stall_event_hub.subscriber_count(stall_id) == 0 and time.time() < deadline:
+            time.sleep(0.01)
+        assert stall_event_hub.subscriber_count(stall_id) == 1
+
+        pickup = campus_wall_clock() + timedelta(hours=1)
+        created = client.post("/api/orders/", headers=headers_for(STUDENT_ID), json={
+            "stall_id": stall_id,
+            "items": [{"menu_item_id": 1, "quantity": 2}],
+            "pickup_window_start": pickup.isoformat(),
+            "pickup_window_end": (pickup + timedelta(minutes=15)).isoformat(),
+        })
+        assert created.status_code == 200, created.text
+        order_id = created.json()["id"]
+
+        owner = headers_for(OWNER_ID)
+        assert client.put(f"/api/orders/{order_id}/confirm-payment", json={"payment_confirmed": True}, headers=owner).status_code == 200
+        assert client.put(f"/api/orders/{order_id}/start-preparing", headers=owner).status_code == 200
+        assert client.put(f"/api/orders/{order_id}/mark-ready", headers=owner).status_code == 200
+        assert client.put(f"/api/orders/{order_id}/mark-completed", headers=owner).status_code == 200
+
+        reader.join(timeout=5)
+        assert [name for name, _ in received] == [
+            "order.created", "order.payment_confirmed", "order.preparing", "order.ready", "order.completed"
+        ]
+        assert all(data["id"] == order_id for _, data in received)
+        assert received[-1][1]["status"] == "completed"
+    finally:
+        client.close()
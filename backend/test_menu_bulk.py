@@ -0,0 +1,100 @@
+"""
+Bulk menu update test.
+A stall owner marks several items sold out with one UPDATE statement and
+upserts a batch of items with one UPDATE and one INSERT; both drop the
+cached menu and reindex menu search once. Other users get 403.
+"""
+
+import pytest
+from sqlalchemy import event
+
+from app.models.user import User, UserRole
+from app.models.stall import Stall
+from app.models.menu import MenuItem
+from app.routes.auth import create_access_token
+
+OWNER_ID = "U7900101A"
+OTHER_ID = "U7900102B"
+
+
+@pytest.fixture
+def database(database):
+    """The test database with two owners and a stall of four rice sets"""
+    db = database.Session()
+    try:
+        owner = User(ntu_email="bulk.owner@campuseats.com", student_id=OWNER_ID, name="Owner",
+                     phone="+65 97567890", hashed_password="not-used", role=UserRole.STALL_OWNER, is_verified=True)
+        other = User(ntu_email="bulk.other@campuseats.com", student_id=OTHER_ID, name="Other",
+                     phone="+65 97567891", hashed_password="not-used", role=UserRole.STALL_OWNER, is_verified=True)
+        db.add_all([owner, other])
+        db.flush()
+        stall = Stall(name="Rice Stall", location="North Spine", owner_id=owner.id)
+        db.add(stall)
+        db.flush()
+        db.add_all([
+            MenuItem(stall_id=stall.id, name=f"Rice Set {n}", price=4.0 + n, is_available=True)
+            for n in range(1, 5)
+        ])
+        db.commit()
+    finally:
+        db.close()
+    return database
+
+
+def auth(student_id):
+    return {"Authorization": f"Bearer {create_access_token({'sub': student_id})}"}
+
+
+def test_bulk_availability_and_upsert(client, database):
+    writes, statements = [], []
+    event.listen(database.engine, "before_cursor_execute", lambda conn, cursor, statement, *args: writes.append(
+        statement.split()[0].upper()
+    ) if statement.split()[0].upper() in ("INSERT", "UPDATE", "DELETE") else None)
+    event.listen(database.engine, "before_cursor_execute", lambda conn, cursor, statement, *args: statements.append(statement))
+    etag = client.get("/api/menu/stall/1").headers["ETag"]
+    assert len(client.get("/api/menu/search", params={"q": "rice"}).json()) == 4
+
+    # Sold out in one statement; ids from other stalls are ignored
+    sold_out = client.patch("/api/menu/stall/1/availability", headers=auth(OWNER_ID),
+                            json={"item_ids": [1, 2, 3, 99], "is_available": False})
+    assert sold_out.status_code == 200, sold_out.text
+    assert sold_out.json()["updated_items"] == [1, 2, 3]
+    assert writes == ["UPDATE"]
+    menu = client.get("/api/menu/stall/1")
+    assert menu.headers["ETag"] != etag
+    assert [item["is_available"] for item in menu.json()] == [False, False, False, True]
+    assert [hit["id"] for hit in client.get("/api/menu/search", params={"q": "rice"}).json()] == [4]
+
+    # Upsert: one UPDATE per set of fields written, and one INSERT for the new items
+    writes.clear()
+    statements.clear()
+    upserted = client.put("/api/menu/stall/1/items", headers=auth(OWNER_ID), json=[
+        {"id": 1, "is_available": True},
+        {"id": 4, "price": 9.5, "name": "Rice Set Deluxe"},
+        {"id": 2, "is_available": True},
+        {"name": "Fried Egg", "price": 1.0, "is_vegetarian": True},
+        {"name": "Iced Tea", "price": 1.5, "category": "Drinks"},
+    ])
+    assert upserted.status_code == 200, upserted.text
+    assert [item["name"] for item in upserted.json()] == [
+        "Rice Set 1", "Rice Set Deluxe", "Rice Set 2", "Fried Egg", "Iced Tea"
+    ]
+    assert upserted.json()[1]["price"] == 9.5 and upserted.json()[3]["stall_id"] == 1
+    assert writes == ["UPDATE", "UPDATE", "INSERT"]
+    # Only the fields a row sets are written, so concurrent edits to the others survive
+    assert [statement.split(" WHERE")[0] for statement in statements if statement.startswith("UPDATE")] == [
+        "UPDATE menu_items SET is_available=?",
+        "UPDATE menu_items SET name=?, price=?",
+    ]
+    assert len(client.get("/api/menu/stall/1").json()) == 6
+    assert [hit["name"] for hit in client.get("/api/menu/search", params={"q": "fried egg"}).json()] == ["Fried Egg"]
+
+    # Unknown ids, incomplete new items and other owners are rejected without writing
+    writes.clear()
+    assert client.put("/api/menu/stall/1/items", headers=auth(OWNER_ID), json=[{"id": 99, "price": 1}]).status_code == 404
+    assert client.put("/api/menu/stall/1/items", headers=auth(OWNER_ID), json=[{"name": "No Price"}]).status_code == 400
+    assert client.put("/api/menu/stall/1/items", headers=auth(OWNER_ID), json=[{"id": 4, "name": None}]).status_code == 400
+    assert client.put("/api/menu/stall/1/items", headers=auth(OWNER_ID), json=[{"id": 4, "price": None}]).status_code == 400
+    assert client.patch("/api/menu/stall/1/availability", headers=auth(OTHER_ID),
+                        json={"item_ids": [4], "is_available": False}).status_code == 403
+    assert writes == []
@@ -0,0 +1,95 @@
+"""
+Menu cache test.
+GET /api/menu/stall/{stall_id} is served from memory after the first read:
+a repeat read runs no SQL, responses carry a strong ETag that answers
+If-None-Match with 304, and a menu write changes the ETag. Menus changed
+by another worker without a shared broker are picked up once they expire.
+"""
+
+import time
+
+import pytest
+from sqlalchemy import event
+
+from app.models.user import User, UserRole
+from app.models.stall import Stall
+from app.models.menu import MenuItem
+from app.routes.auth import create_access_token
+from app.services.menu_cache import menu_cache
+
+OWNER_ID = "U7800001A"
+
+
+@pytest.fixture
+def database(database):
+    """The test database with an owner's stall and two menu items"""
+    db = database.Session()
+    try:
+        owner = User(ntu_email="menu.owner@campuseats.com", student_id=OWNER_ID, name="Owner",
+                     phone="+65 97345670", hashed_password="not-used", role=UserRole.STALL_OWNER, is_verified=True)
+        db.add(owner)
+        db.flush()
+        stall = Stall(name="Noodle Stall", location="South Spine", owner_id=owner.id)
+        db.add(stall)
+        db.flush()
+        db.add_all([
+            MenuItem(stall_id=stall.id, name="Laksa", price=5.0, is_available=True),
+            MenuItem(stall_id=stall.id, name="Mee Goreng", price=4.5, is_available=True),
+        ])
+        db.commit()
+    finally:
+        db.close()
+    return database
+
+
+def test_menu_reads_are_cached_and_revalidated(client, database):
+    statements = []
+    event.listen(database.async_engine.sync_engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    first = client.get("/api/menu/stall/1")
+    assert first.status_code == 200, first.text
+    assert [item["name"] for item in first.json()] == ["Laksa", "Mee Goreng"]
+    etag = first.headers["ETag"]
+    assert etag.startswith('"') and first.headers["Cache-Control"] == "no-cache"
+
+    # Served from memory
+    statements.clear()
+    again = client.get("/api/menu/stall/1")
+    assert again.status_code == 200 and again.headers["ETag"] == etag
+    assert again.content == first.content
+    assert statements == []
+
+    unchanged = client.get("/api/menu/stall/1", headers={"If-None-Match": etag})
+    assert unchanged.status_code == 304 and unchanged.content == b""
+    assert unchanged.headers["ETag"] == etag
+    assert client.get("/api/menu/stall/1", headers={"If-None-Match": f"W/{etag}"}).status_code == 304
+
+    # A write drops the cached menu, so the ETag moves on
+    owner = {"Authorization": f"Bearer {create_access_token({'sub': OWNER_ID})}"}
+    update = client.put("/api/menu/1", headers=owner, json={"price": 5.5})
+    assert update.status_code == 200, update.text
+    changed = client.get("/api/menu/stall/1", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.json()[0]["price"] == 5.5
+
+    assert client.get("/api/menu/stall/99").status_code == 404
+
+
+def test_cached_menus_expire(client, database, monkeypatch):
+    monkeypatch.setattr(menu_cache, "max_age_seconds", 0.2)
+    etag = client.get("/api/menu/stall/1").headers["ETag"]
+
+    # Another worker changes the menu and this one never hears about it
+    db = database.Session()
+    try:
+        db.query(MenuItem).filter(MenuItem.id == 1).update({MenuItem.price: 6.0})
+        db.commit()
+    finally:
+        db.close()
+    assert client.get("/api/menu/stall/1").headers["ETag"] == etag
+
+    time.sleep(0.3)
+    expired = client.get("/api/menu/stall/1", headers={"If-None-Match": etag})
+    assert expired.status_code == 200 and expired.headers["ETag"] != etag
+    assert expired.json()[0]["price"] == 6.0
@@ -0,0 +1,88 @@
+"""
+Menu search test.
+GET /api/menu/search finds dishes across stalls from the in-memory index:
+every word must match (plurals fold), dietary flags, availability and
+price filter, lat/lng sorts by stall distance and radius_km limits it,
+and menu writes are reflected in the next search.
+"""
+
+import pytest
+
+from app.models.user import User, UserRole
+from app.models.stall import Stall
+from app.models.menu import MenuItem
+from app.routes.auth import create_access_token
+from app.services.spatial_index import stall_spatial_index
+
+OWNER_ID = "U7900001A"
+# The user stands next to the Near stall; the Far stall is about 2.2 km away
+USER_LAT, USER_LNG = 1.3470, 103.6800
+
+
+@pytest.fixture
+def database(database):
+    """The test database with a near and a far stall and their menus"""
+    db = database.Session()
+    try:
+        owner = User(ntu_email="search.owner@campuseats.com", student_id=OWNER_ID, name="Owner",
+                     phone="+65 97456780", hashed_password="not-used", role=UserRole.STALL_OWNER, is_verified=True)
+        db.add(owner)
+        db.flush()
+        near = Stall(name="Near", location="North Spine", owner_id=owner.id, latitude=1.3472, longitude=103.6801)
+        far = Stall(name="Far", location="Hall 16", owner_id=owner.id, latitude=1.3600, longitude=103.6950)
+        db.add_all([near, far])
+        db.flush()
+        db.add_all([
+            MenuItem(stall_id=far.id, name="Fishball Noodles", description="Soup noodle with fishballs",
+                     category="Noodles", price=4.0, is_halal=True, is_vegetarian=False, is_available=True),
+            MenuItem(stall_id=near.id, name="Mee Rebus", description="Yellow noodles in sweet potato gravy",
+                     category="Noodles", price=4.5, is_halal=True, is_vegetarian=True, is_available=True),
+            MenuItem(stall_id=near.id, name="Char Kway Teow", description="Fried flat noodles with lard",
+                     category="Noodles", price=5.0, is_halal=False, is_vegetarian=False, is_available=True),
+            MenuItem(stall_id=near.id, name="Laksa Noodle", description="Spicy coconut soup",
+                     category="Noodles", price=6.5, is_halal=True, is_vegetarian=False, is_available=True),
+            MenuItem(stall_id=far.id, name="Nasi Lemak", description="Coconut rice",
+                     category="Rice", price=3.5, is_halal=True, is_vegetarian=False, is_available=False),
+        ])
+        db.commit()
+        stall_spatial_index.rebuild(db)
+    finally:
+        db.close()
+    return database
+
+
+def names(response):
+    assert response.status_code == 200, response.text
+    return [item["name"] for item in response.json()]
+
+
+def test_search_filters_facets_price_and_distance(client):
+    # Plurals fold; name matches rank first, then cheapest
+    assert names(client.get("/api/menu/search", params={"q": "noodles"})) == [
+        "Fishball Noodles", "Laksa Noodle", "Mee Rebus", "Char Kway Teow"
+    ]
+    assert names(client.get("/api/menu/search", params={"q": "coconut soup"})) == ["Laksa Noodle"]
+    assert names(client.get("/api/menu/search", params={"q": "rice"})) == []
+    assert names(client.get("/api/menu/search", params={"q": "rice", "include_sold_out": "true"})) == ["Nasi Lemak"]
+
+    # Halal noodles under $5 near me
+    params = {"q": "noodles", "halal": "true", "max_price": 5, "lat": USER_LAT, "lng": USER_LNG}
+    hits = client.get("/api/menu/search", params=params).json()
+    assert [hit["name"] for hit in hits] == ["Mee Rebus", "Fishball Noodles"]
+    assert hits[0]["distance_km"] < 0.1 < 2 < hits[1]["distance_km"]
+    assert names(client.get("/api/menu/search", params={**params, "radius_km": 1})) == ["Mee Rebus"]
+    assert names(client.get("/api/menu/search", params={"q": "noodles", "vegetarian": "false", "halal": "false"})) == [
+        "Char Kway Teow"
+    ]
+    assert client.get("/api/menu/search", params={"lat": USER_LAT}).status_code == 400
+
+    # Writes are reindexed incrementally
+    owner = {"Authorization": f"Bearer {create_access_token({'sub': OWNER_ID})}"}
+    assert client.put("/api/menu/2", headers=owner, json={"is_available": False}).status_code == 200
+    assert client.put("/api/menu/4", headers=owner, json={"name": "Curry Laksa"}).status_code == 200
+    assert names(client.get("/api/menu/search", params={"q": "noodles", "halal": "true"})) == [
+        "Fishball Noodles", "Curry Laksa"
+    ]
+    assert names(client.get("/api/menu/search", params={"q": "curry"})) == ["Curry Laksa"]
+    assert client.delete("/api/menu/1", headers=owner).status_code == 200
+    assert names(client.get("/api/menu/search", params={"q": "fishball"})) == []
@@ -0,0 +1,81 @@
+"""
+Nearby stalls filter test.
+GET /api/stalls/nearby with radius_km only returns stalls within that
+distance, closest first, and pages through them with X-Next-Cursor;
+open_now checks opening hours in the campus timezone (Asia/Singapore),
+whatever timezone the server runs in.
+"""
+
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from app.models.stall import Stall
+from app.services.spatial_index import stall_spatial_index
+from app.utils.pagination import NEXT_CURSOR_HEADER
+
+USER_LAT, USER_LNG = 1.3470, 103.6800
+# About 0.11 km of latitude per 0.001 degree
+KM_PER_MILLIDEGREE = 0.1112
+
+
+def hours_around(now, start_hours, end_hours):
+    return (now + timedelta(hours=start_hours)).time(), (now + timedelta(hours=end_hours)).time()
+
+
+@pytest.fixture
+def database(database):
+    """The test database with stalls north of the user, some open now"""
+    campus_now = datetime.now(ZoneInfo("Asia/Singapore"))
+    utc_now = datetime.now(timezone.utc)
+    stalls = [
+        # (name, millidegrees north of the user, opening hours, is_open)
+        ("Open Here", 0, hours_around(campus_now, -1, 1), True),
+        ("Open By UTC Clock Only", 4, hours_around(utc_now, -1, 1), True),
+        ("No Hours", 8, (None, None), True),
+        ("Opens Later", 12, hours_around(campus_now, 2, 3), True),
+        ("Closed Flag", 16, (None, None), False),
+        ("Far Away", 40, (None, None), True),
+    ]
+    db = database.Session()
+    try:
+        for name, north, (opening_time, closing_time), is_open in stalls:
+            db.add(Stall(name=name, location="Campus", latitude=USER_LAT + north / 1000, longitude=USER_LNG,
+                         opening_time=opening_time, closing_time=closing_time, is_open=is_open))
+        db.commit()
+        stall_spatial_index.rebuild(db)
+    finally:
+        db.close()
+    return database
+
+
+def nearby(client, **params):
+    response = client.get("/api/stalls/nearby", params={"lat": USER_LAT, "lng": USER_LNG, **params})
+    assert response.status_code == 200, response.text
+    return response
+
+
+def test_radius_filter_and_pagination(client):
+    radius_km = 13 * KM_PER_MILLIDEGREE
+    stalls = nearby(client, radius_km=radius_km).json()
+    assert [stall["name"] for stall in stalls] == [
+        "Open Here", "Open By UTC Clock Only", "No Hours", "Opens Later"
+    ]
+    assert all(stall["distance_km"] <= radius_km for stall in stalls)
+
+    first = nearby(client, radius_km=radius_km, limit=3)
+    assert [stall["name"] for stall in first.json()] == ["Open Here", "Open By UTC Clock Only", "No Hours"]
+    second = nearby(client, radius_km=radius_km, limit=3, cursor=first.headers[NEXT_CURSOR_HEADER])
+    assert [stall["name"] for stall in second.json()] == ["Opens Later"]
+    assert NEXT_CURSOR_HEADER not in second.headers
+
+
+def test_open_now_uses_campus_time(client):
+    # Without a radius (spatial index path) and with one (bounding-box path)
+    assert [stall["name"] for stall in nearby(client, open_now=True).json()] == [
+        "Open Here", "No Hours", "Far Away"
+    ]
+    assert [stall["name"] for stall in nearby(client, open_now=True, radius_km=2).json()] == [
+        "Open Here", "No Hours"
+    ]
@@ -0,0 +1,157 @@
+"""
+Query-count regression test for checkout and the order listing endpoints.
+GET /api/orders/ and GET /api/orders/user/{id} must issue the same number of
+SQL statements no matter how many active orders the user has, and only page
+when asked to. POST /api/orders/ must issue a constant number of statements,
+none of them after the commit.
+"""
+
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app.models.user import User, UserRole
+from app.models.stall import Stall
+from app.models.menu import MenuItem
+from app.models.order import Order, OrderStatus
+from app.models.queue import QueueEntry, QueueStatus
+from app.routes.auth import create_access_token
+from app.services.prep_times import prep_time_model
+from app.services.queue_index import stall_queue_index
+from app.utils.campus_time import campus_wall_clock
+
+STUDENT_ID = "U7000001Q"
+
+
+@pytest.fixture
+def statements(database):
+    """Every statement the app runs, with a COMMIT marker for each commit"""
+    # Built at startup in production; build them here so no request pays for it
+    db = database.Session()
+    try:
+        stall_queue_index.rebuild(db)
+        prep_time_model.rebuild(db)
+    finally:
+        db.close()
+
+    statements = []
+    event.listen(database.engine, "before_cursor_execute", lambda conn, cursor, statement, *args: statements.append(statement))
+    event.listen(database.engine, "commit", lambda conn: statements.append("COMMIT"))
+    return statements
+
+
+def seed_orders(Session, order_count, stall_count=5):
+    db = Session()
+    try:
+        user = db.query(User).filter(User.student_id == STUDENT_ID).first()
+        if not user:
+            user = User(
+                ntu_email="query.counts@campuseats.com",
+                student_id=STUDENT_ID,
+                name="Query Count Student",
+                phone="+65 91234567",
+                hashed_password="not-used",
+                role=UserRole.STUDENT,
+                is_verified=True
+            )
+            db.add(user)
+            db.flush()
+
+        stalls = db.query(Stall).all()
+        while len(stalls) < stall_count:
+            stall = Stall(name=f"Stall {len(stalls) + 1}", location="North Spine", avg_prep_time=10)
+            db.add(stall)
+            db.flush()
+            stalls.append(stall)
+
+        for i in range(order_count):
+            stall = stalls[i % len(stalls)]
+            order = Order(
+                user_id=user.id,
+                stall_id=stall.id,
+                total_amount=5.0,
+                status=OrderStatus.CONFIRMED,
+                pickup_window_start=campus_wall_clock() + timedelta(minutes=30),
+                pickup_window_end=campus_wall_clock() + timedelta(minutes=45)
+            )
+            db.add(order)
+            db.flush()
+            order.order_number = f"ORD{order.id:05d}"
+            db.add(QueueEntry(stall_id=stall.id, order_id=order.id, queue_position=order.id, status=QueueStatus.WAITING))
+        db.commit()
+        return user.id
+    finally:
+        db.close()
+
+
+def count_statements(client, statements, url):
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': STUDENT_ID})}"}
+    statements.clear()
+    response = client.get(url, headers=headers)
+    assert response.status_code == 200, response.text
+    return len(statements), response.json()
+
+
+def test_order_listing_query_count_is_constant(client, database, statements):
+    user_id = seed_orders(database.Session, 3)
+    few_orders = {
+        url: count_statements(client, statements, url)
+        for url in ["/api/orders/?limit=200", f"/api/orders/user/{user_id}?limit=200"]
+    }
+
+    seed_orders(database.Session, 60)
+    for url, (few_count, few_body) in few_orders.items():
+        many_count, many_body = count_statements(client, statements, url)
+        assert len(few_body) == 3 and len(many_body) == 63
+        assert all(order["estimated_ready_time"] for order in many_body)
+        assert many_count == few_count, (
+            f"{url}: {few_count} statements for 3 orders but {many_count} for 63"
+        )
+
+
+def test_order_listing_pages_only_when_asked(client, database):
+    seed_orders(database.Session, 63)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': STUDENT_ID})}"}
+
+    # Clients that never follow X-Next-Cursor still get every order
+    everything = client.get("/api/orders/", headers=headers)
+    assert len(everything.json()) == 63 and "X-Next-Cursor" not in everything.headers
+
+    ids, cursor = [], None
+    while True:
+        params = {"limit": 25, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/api/orders/", headers=headers, params=params)
+        ids += [order["id"] for order in page.json()]
+        cursor = page.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert ids == [order["id"] for order in everything.json()]
+
+
+def test_checkout_query_count_is_constant(client, database, statements):
+    seed_orders(database.Session, 0, stall_count=1)
+    db = database.Session()
+    try:
+        db.add(MenuItem(stall_id=1, name="Chicken Rice", price=4.5, prep_time=8, is_available=True))
+        db.commit()
+    finally:
+        db.close()
+
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': STUDENT_ID})}"}
+    pickup = campus_wall_clock() + timedelta(hours=1)
+    counts = []
+    for _ in range(6):
+        statements.clear()
+        response = client.post("/api/orders/", headers=headers, json={
+            "stall_id": 1,
+            "items": [{"menu_item_id": 1, "quantity": 1}],
+            "pickup_window_start": pickup.isoformat(),
+            "pickup_window_end": (pickup + timedelta(minutes=10)).isoformat(),
+        })
+        assert response.status_code == 200, response.text
+        assert statements[-1] == "COMMIT", f"statements after the commit: {statements[statements.index('COMMIT') + 1:]}"
+        counts.append(len(statements))
+
+    # The first checkout at a stall also seeds its queue number counter
+    assert counts[1:] == [counts[1]] * 5, counts
@@ -0,0 +1,90 @@
+"""
+Pickup slot scheduling test.
+A stall whose kitchen fits one order per pickup slot takes one order per
+slot: a checkout into a full slot is rejected with 409 and offered the
+next free slot, the prep queue is ordered by pickup deadline rather than
+arrival, and GET /api/queue/{stall_id}/pickup-slots shows the bookings.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.user import User, UserRole
+from app.models.stall import Stall
+from app.models.menu import MenuItem
+from app.routes.auth import create_access_token
+from app.services.pickup_slots import pickup_slots
+from app.utils.campus_time import campus_wall_clock
+
+STUDENT_IDS = ["U7700001A", "U7700002B", "U7700003C"]
+
+
+@pytest.fixture
+def database(database):
+    """The test database with three students and a stall that fits one order per slot"""
+    db = database.Session()
+    try:
+        students = [
+            User(ntu_email=f"slots.student{i}@campuseats.com", student_id=student_id, name=f"Student {i}",
+                 phone=f"+65 9723456{i}", hashed_password="not-used", role=UserRole.STUDENT, is_verified=True)
+            for i, student_id in enumerate(STUDENT_IDS)
+        ]
+        db.add_all(students)
+        db.flush()
+        # Three orders at a time, 30 minutes each: one order per 15-minute slot
+        stall = Stall(name="Slow Stall", location="North Spine", avg_prep_time=30, max_concurrent_orders=3)
+        db.add(stall)
+        db.flush()
+        db.add(MenuItem(stall_id=stall.id, name="Claypot Rice", price=6.0, prep_time=6, is_available=True))
+        db.commit()
+    finally:
+        db.close()
+    return database
+
+
+def place_order(client, student_id, pickup):
+    return client.post("/api/orders/", headers={"Authorization": f"Bearer {create_access_token({'sub': student_id})}"}, json={
+        "stall_id": 1,
+        "items": [{"menu_item_id": 1, "quantity": 1}],
+        "pickup_window_start": pickup.isoformat(),
+        "pickup_window_end": (pickup + timedelta(minutes=10)).isoformat(),
+    })
+
+
+def test_slots_cap_bookings_and_order_the_queue(client):
+    noon, _ = pickup_slots.slot_of(campus_wall_clock() + timedelta(hours=2))
+    slot_length = pickup_slots.slot_length
+
+    late = place_order(client, STUDENT_IDS[0], noon + timedelta(minutes=5))
+    assert late.status_code == 200, late.text
+
+    # The slot is full; the next free one is offered
+    rejected = place_order(client, STUDENT_IDS[1], noon + timedelta(minutes=10))
+    assert rejected.status_code == 409, rejected.text
+    assert "fully booked" in rejected.json()["detail"]
+    assert datetime.fromisoformat(rejected.headers["X-Next-Pickup-Window-Start"]) == noon + slot_length
+    assert datetime.fromisoformat(rejected.headers["X-Next-Pickup-Window-End"]) == noon + 2 * slot_length
+
+    early = place_order(client, STUDENT_IDS[1], noon - slot_length)
+    assert early.status_code == 200, early.text
+    next_slot = place_order(client, STUDENT_IDS[2], noon + slot_length)
+    assert next_slot.status_code == 200, next_slot.text
+
+    # The kitchen works earliest deadline first, not in arrival order
+    board = client.get("/api/queue/1").json()
+    assert [entry["order_id"] for entry in board["queue_entries"]] == [
+        early.json()["id"], late.json()["id"], next_slot.json()["id"]
+    ]
+    student = {"Authorization": f"Bearer {create_access_token({'sub': STUDENT_IDS[0]})}"}
+    position = client.get(f"/api/queue/position/{late.json()['id']}", headers=student).json()
+    assert (position["queue_position"], position["orders_ahead"]) == (2, 1)
+
+    slots = client.get("/api/queue/1/pickup-slots").json()
+    booked = {datetime.fromisoformat(slot["start"]): slot["booked"] for slot in slots["slots"]}
+    assert [booked[noon - slot_length], booked[noon], booked[noon + slot_length]] == [1, 1, 1]
+    assert all(slot["capacity"] == 1 for slot in slots["slots"])
+    # Nothing can be ready before the three queued orders (made three at a time) and a new one
+    earliest = slots["earliest_available"]
+    assert earliest["available"]
+    assert datetime.fromisoformat(earliest["end"]) > campus_wall_clock() + timedelta(minutes=6 * 3 / 3 + 30)
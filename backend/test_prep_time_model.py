@@ -0,0 +1,158 @@
+"""
+Learned prep time (ETA) test.
+Checks the per-stall and per-item moving averages against hand-worked
+observations, then walks orders through checkout and mark-ready to check
+that checkout quotes, queue positions and the queue board all come from
+the same model and that a slow order raises the next quote.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.user import User, UserRole
+from app.models.stall import Stall
+from app.models.menu import MenuItem
+from app.models.queue import QueueEntry
+from app.routes.auth import create_access_token
+from app.services.prep_times import PrepTimeModel, prep_time_model
+from app.utils.campus_time import campus_wall_clock
+
+STUDENT_IDS = ["U7500001A", "U7500002B", "U7500003C"]
+OWNER_ID = "S7500001O"
+
+
+def test_moving_averages():
+    model = PrepTimeModel(alpha=0.5)
+    model.seed_stall(1, 10)
+    start = datetime(2026, 1, 5, 12, 0)
+
+    # 20 minutes from joining to ready: stall 10 -> 15, items scaled by their share
+    model.observe_ready(1, start, start + timedelta(minutes=20), [(1, 10), (2, 5)])
+    assert model.stall_minutes(1) == 15
+    assert model.order_minutes(1, [(1, 10)]) == 15
+    assert model.order_minutes(1, [(2, 5)]) == 8  # 7.5 rounded up
+
+    # Joined while the first was cooking, so only the 10 minutes after it count
+    model.observe_ready(1, start + timedelta(minutes=1), start + timedelta(minutes=30), [])
+    assert model.stall_minutes(1) == 12.5
+
+    # Next-day pickups are bad data, but still mark when the kitchen was last free
+    model.observe_ready(1, start, start + timedelta(days=1), [])
+    assert model.stall_minutes(1) == 12.5
+
+    # Stalls without observations use their seed; orders without items the stall average
+    assert model.stall_minutes(2) == 15
+    assert model.order_minutes(1, []) == 13
+
+
+def test_kitchen_slots():
+    model = PrepTimeModel(alpha=0.5)
+    model.seed_stall(1, 10, max_concurrent_orders=2)
+    start = datetime(2026, 1, 5, 12, 0)
+
+    # Two orders cook side by side, each observed from when it arrived
+    model.observe_ready(1, start, start + timedelta(minutes=10), [])
+    model.observe_ready(1, start, start + timedelta(minutes=10), [])
+    assert model.stall_minutes(1) == 10
+
+    # A third waited for a slot, which came free at 12:10
+    model.observe_ready(1, start + timedelta(minutes=1), start + timedelta(minutes=24), [])
+    assert model.stall_minutes(1) == 12
+
+    # Two slots: 20 minutes of orders ahead hold a new order up for 10
+    joined = datetime.utcnow()
+    assert model.wait_minutes(1, 20, 12) == 22
+    eta = model.estimate_ready_time(1, joined, 20, 12)
+    assert abs((eta - joined).total_seconds() / 60 - 22) < 0.01
+
+
+@pytest.fixture
+def database(database):
+    """The test database with an uncapped stall, its owner and three students"""
+    db = database.Session()
+    try:
+        owner = User(ntu_email="eta.owner@campuseats.com", student_id=OWNER_ID, name="ETA Owner",
+                     phone="+65 95234567", hashed_password="not-used", role=UserRole.STALL_OWNER, is_verified=True)
+        students = [
+            User(ntu_email=f"eta.student{i}@campuseats.com", student_id=student_id, name=f"Student {i}",
+                 phone=f"+65 9523456{i + 1}", hashed_password="not-used", role=UserRole.STUDENT, is_verified=True)
+            for i, student_id in enumerate(STUDENT_IDS)
+        ]
+        db.add_all([owner, *students])
+        db.flush()
+        stall = Stall(name="ETA Stall", location="North Spine", avg_prep_time=10, owner_id=owner.id)
+        db.add(stall)
+        db.flush()
+        # Uncapped, so the kitchen is modelled as making one order at a time
+        stall.max_concurrent_orders = None
+        db.add(MenuItem(stall_id=stall.id, name="Chicken Rice", price=4.0, prep_time=6, is_available=True))
+        db.commit()
+    finally:
+        db.close()
+    return database
+
+
+def headers_for(student_id):
+    return {"Authorization": f"Bearer {create_access_token({'sub': student_id})}"}
+
+
+def place_order(client, student_id):
+    pickup = campus_wall_clock() + timedelta(hours=1)
+    created = client.post("/api/orders/", headers=headers_for(student_id), json={
+        "stall_id": 1,
+        "items": [{"menu_item_id": 1, "quantity": 2}],
+        "pickup_window_start": pickup.isoformat(),
+        "pickup_window_end": (pickup + timedelta(minutes=15)).isoformat(),
+    })
+    assert created.status_code == 200, created.text
+    return created.json()["id"]
+
+
+def minutes_from_join(position):
+    ready = datetime.fromisoformat(position["estimated_ready_time"])
+    return (ready - datetime.fromisoformat(position["joined_at"])).total_seconds() / 60
+
+
+def test_etas_follow_learned_prep_times(client, database):
+    first = place_order(client, STUDENT_IDS[0])
+    second = place_order(client, STUDENT_IDS[1])
+
+    # Each order is quoted its own items' prep time plus the orders ahead
+    position = client.get(f"/api/queue/position/{second}", headers=headers_for(STUDENT_IDS[1])).json()
+    assert position["estimated_wait_time"] == 12
+    assert abs(minutes_from_join(position) - 12) < 0.1
+    board = client.get("/api/queue/1").json()
+    assert board["estimated_wait_time"] == 6 + 6 + 10
+
+    # The first order took 20 minutes
+    db = database.Session()
+    try:
+        entry = db.query(QueueEntry).filter(QueueEntry.order_id == first).one()
+        entry.joined_at = datetime.utcnow() - timedelta(minutes=20)
+        db.commit()
+    finally:
+        db.close()
+    owner = headers_for(OWNER_ID)
+    assert client.put(f"/api/orders/{first}/confirm-payment", headers=owner, json={"payment_confirmed": True}).status_code == 200
+    assert client.put(f"/api/orders/{first}/start-preparing", headers=owner).status_code == 200
+    assert client.put(f"/api/orders/{first}/mark-ready", headers=owner).status_code == 200
+
+    # 6 + 0.2 * (20 - 6) = 8.8 minutes for the item, 12 for the stall
+    assert abs(prep_time_model.stall_minutes(1) - 12) < 0.01
+    third = place_order(client, STUDENT_IDS[2])
+    db = database.Session()
+    try:
+        assert db.query(QueueEntry.prep_minutes).filter(QueueEntry.order_id == third).scalar() == 9
+    finally:
+        db.close()
+
+    # The second order now counts from when the first was ready
+    position = client.get(f"/api/queue/position/{second}", headers=headers_for(STUDENT_IDS[1])).json()
+    assert position["orders_ahead"] == 0
+    ready = datetime.fromisoformat(position["estimated_ready_time"])
+    assert timedelta(minutes=5.9) < ready - datetime.utcnow() < timedelta(minutes=6.1)
+
+    orders = client.get("/api/orders/", headers=headers_for(STUDENT_IDS[2])).json()
+    third_ready = datetime.fromisoformat(orders[0]["estimated_ready_time"])
+    assert timedelta(minutes=14.9) < third_ready - datetime.utcnow() < timedelta(minutes=15.1)
@@ -0,0 +1,130 @@
+"""
+Statement-count test for PUT /api/queue/update.
+Completing a batch of pickups must issue the same number of SQL statements
+whether the stall's queue holds a handful of entries or hundreds. Queue
+positions are tickets, so the remaining entries keep theirs (gaps and all)
+while GET /api/queue/position reports their place in line. Every order the
+queue endpoints complete shows up on the stall's live order board.
+"""
+
+from datetime import timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.main import app
+from app.models.user import User, UserRole
+from app.models.stall import Stall
+from app.models.order import Order, OrderStatus
+from app.models.queue import QueueEntry, QueueStatus
+from app.routes.auth import create_access_token
+from app.services.prep_times import prep_time_model
+from app.services.queue_index import stall_queue_index
+from app.services.stall_events import stall_event_hub
+from app.utils.campus_time import campus_wall_clock
+
+STUDENT_ID = "U7400001Q"
+OWNER_ID = "S7400001O"
+
+# Every event this process dispatches, for the order board checks
+dispatched = []
+stall_event_hub.add_listener(dispatched.append)
+
+
+def make_queue(database, queue_length):
+    """Seed one stall whose queue holds queue_length entries; returns its statement log"""
+    db = database.Session()
+    try:
+        owner = User(ntu_email="bulk.owner@campuseats.com", student_id=OWNER_ID, name="Bulk Owner",
+                     phone="+65 94234567", hashed_password="not-used", role=UserRole.STALL_OWNER, is_verified=True)
+        student = User(ntu_email="bulk.student@campuseats.com", student_id=STUDENT_ID, name="Bulk Student",
+                       phone="+65 94234568", hashed_password="not-used", role=UserRole.STUDENT, is_verified=True)
+        db.add_all([owner, student])
+        db.flush()
+        stall = Stall(name="Bulk Stall", location="North Spine", avg_prep_time=10, owner_id=owner.id)
+        db.add(stall)
+        db.flush()
+
+        for position in range(1, queue_length + 1):
+            order = Order(user_id=student.id, stall_id=stall.id, total_amount=4.0, status=OrderStatus.READY,
+                          queue_number=position, pickup_window_start=campus_wall_clock(),
+                          pickup_window_end=campus_wall_clock() + timedelta(minutes=15))
+            db.add(order)
+            db.flush()
+            db.add(QueueEntry(stall_id=stall.id, order_id=order.id, queue_position=position, status=QueueStatus.READY))
+        db.commit()
+    finally:
+        db.close()
+
+    statements = []
+    event.listen(database.engine, "before_cursor_execute", lambda conn, cursor, statement, *args: statements.append(statement))
+    return statements
+
+
+def complete_pickups(make_database, queue_length, completed_order_ids):
+    """Complete the given orders; returns (statement count, remaining order ids by ticket)"""
+    database = make_database(f"queue_{queue_length}")
+    statements = make_queue(database, queue_length)
+    database.serve_writes()
+    database.serve_reads()
+    stall_queue_index.reset()
+    prep_time_model.reset()
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': OWNER_ID})}"}
+    statements.clear()
+    response = client.put("/api/queue/update", headers=headers, json={"completed_order_ids": completed_order_ids})
+    assert response.status_code == 200, response.text
+    assert response.json()["completed_orders"] == completed_order_ids
+    statement_count = len(statements)
+
+    db = database.Session()
+    try:
+        entries = db.query(QueueEntry).filter(QueueEntry.status == QueueStatus.READY).order_by(QueueEntry.queue_position).all()
+        # Seeded tickets equal order ids and are never rewritten
+        assert [entry.queue_position for entry in entries] == [entry.order_id for entry in entries]
+        completed = db.query(Order).filter(Order.id.in_(completed_order_ids)).all()
+        assert all(order.status == OrderStatus.COMPLETED for order in completed)
+        assert stall_queue_index.reconcile(db) == []
+    finally:
+        db.close()
+
+    student = {"Authorization": f"Bearer {create_access_token({'sub': STUDENT_ID})}"}
+    last = client.get(f"/api/queue/position/{entries[-1].order_id}", headers=student).json()
+    assert last["queue_position"] == len(entries)
+    return statement_count, [entry.order_id for entry in entries]
+
+
+def test_queue_update_statement_count_is_constant(make_database):
+    short_count, short_remaining = complete_pickups(make_database, 5, [1, 3])
+    assert short_remaining == [2, 4, 5]
+
+    long_count, long_remaining = complete_pickups(make_database, 300, [1, 3, 150])
+    assert long_remaining == [2] + list(range(4, 150)) + list(range(151, 301))
+    assert long_count == short_count, f"{short_count} statements for 5 entries but {long_count} for 300"
+
+
+def order_events():
+    return [(event.type, event.data["id"]) for event in dispatched if event.type.startswith("order.")]
+
+
+def test_queue_endpoints_publish_order_events(client, database):
+    make_queue(database, 4)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': OWNER_ID})}"}
+    dispatched.clear()
+    response = client.put("/api/queue/update", headers=headers, json={"completed_order_ids": [1, 3]})
+    assert response.status_code == 200, response.text
+    assert order_events() == [("order.completed", 1), ("order.completed", 3)]
+    assert all(event.data["status"] == "completed" for event in dispatched if event.type.startswith("order."))
+
+    db = database.Session()
+    try:
+        entry_id = db.query(QueueEntry.id).filter(QueueEntry.order_id == 2).scalar()
+    finally:
+        db.close()
+
+    dispatched.clear()
+    # The order is already READY, so nothing changes on the order board
+    assert client.put(f"/api/queue/{entry_id}/status", headers=headers, json={"status": "ready"}).status_code == 200
+    assert order_events() == []
+    assert client.put(f"/api/queue/{entry_id}/status", headers=headers, json={"status": "collected"}).status_code == 200
+    assert order_events() == [("order.completed", 2)]
@@ -0,0 +1,105 @@
+"""
+Queue number allocation test.
+Concurrent checkouts at the same stalls get unique, consecutive queue numbers
+per stall and day; numbering continues from the day's existing orders,
+restarts at 1 when the campus day rolls over, and a caller a moment behind
+the rollover keeps counting the new day. Runs the in-process counter
+against SQLite; set TEST_POSTGRES_URL to an empty scratch PostgreSQL
+database to also check the UPDATE ... RETURNING counter row.
+"""
+
+import os
+import threading
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database.database import Base
+from app.models.user import User, UserRole
+from app.models.stall import Stall
+from app.models.order import Order
+from app.services.queue_numbers import QueueNumberAllocator
+from app.utils.campus_time import campus_day_start_utc
+
+DAY = date(2026, 3, 2)
+THREADS = 8
+PER_THREAD = 25
+
+
+def seed(Session):
+    """A student, three stalls and stall 3's orders from today and yesterday"""
+    db = Session()
+    try:
+        student = User(ntu_email="numbers.student@campuseats.com", student_id="U7920001A", name="Student",
+                       phone="+65 97456701", hashed_password="not-used", role=UserRole.STUDENT, is_verified=True)
+        db.add(student)
+        db.add_all([Stall(name=f"Stall {n}", location="North Spine") for n in (1, 2, 3)])
+        db.flush()
+        # Stall 3 already served numbers 1-7 today; yesterday's 30 doesn't count
+        for number, created_at in [(7, campus_day_start_utc(DAY) + timedelta(hours=9)),
+                                   (30, campus_day_start_utc(DAY) - timedelta(hours=1))]:
+            db.add(Order(user_id=student.id, stall_id=3, order_number=f"ORD-{number}", total_amount=5.0,
+                         queue_number=number, created_at=created_at))
+        db.commit()
+    finally:
+        db.close()
+    return Session
+
+
+def allocate_concurrently(Session, allocator, stall_ids):
+    numbers = {stall_id: [] for stall_id in stall_ids}
+    record = threading.Lock()
+    start = threading.Barrier(THREADS)
+
+    def worker(stall_id):
+        db = Session()
+        try:
+            start.wait()
+            for _ in range(PER_THREAD):
+                number = allocator.next_number(db, stall_id, DAY)
+                with record:
+                    numbers[stall_id].append(number)
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=worker, args=(stall_ids[i % len(stall_ids)],)) for i in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return numbers
+
+
+def check_allocator(Session, allocator):
+    numbers = allocate_concurrently(Session, allocator, [1, 2])
+    per_stall = THREADS // 2 * PER_THREAD
+    for stall_id in (1, 2):
+        assert sorted(numbers[stall_id]) == list(range(1, per_stall + 1))
+
+    db = Session()
+    try:
+        assert allocator.next_number(db, 3, DAY) == 8
+        assert allocator.next_number(db, 3, DAY) == 9
+
+        tomorrow = DAY + timedelta(days=1)
+        assert allocator.next_number(db, 1, tomorrow) == 1
+        assert allocator.next_number(db, 1, tomorrow) == 2
+        # A caller whose clock hasn't passed midnight yet keeps counting the new day
+        assert allocator.next_number(db, 1, DAY) == 3
+        assert allocator.next_number(db, 2, tomorrow) == 1
+    finally:
+        db.close()
+
+
+def test_in_process_numbers_are_unique_consecutive_and_daily(database):
+    check_allocator(seed(database.Session), QueueNumberAllocator())
+
+
+@pytest.mark.skipif(not os.getenv("TEST_POSTGRES_URL"), reason="TEST_POSTGRES_URL not set")
+def test_counter_row_numbers_are_unique_consecutive_and_daily():
+    engine = create_engine(os.environ["TEST_POSTGRES_URL"])
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    check_allocator(seed(sessionmaker(autocommit=False, autoflush=False, bind=engine)), QueueNumberAllocator())
@@ -0,0 +1,130 @@
+"""
+Live queue position test.
+Subscribes to GET /api/queue/position/{order_id}/events as a student with
+one order ahead of theirs and checks that a "position" event is pushed
+only when their place in line, orders ahead or status changes, and that the
+stream ends once the order is collected.
+"""
+
+import json
+import threading
+import time
+from datetime import timedelta
+
+import httpx
+import pytest
+
+from app.models.user import User, UserRole
+from app.models.stall import Stall
+from app.models.menu import MenuItem
+from app.routes.auth import create_access_token
+from app.services.stall_events import stall_event_hub
+from app.utils.campus_time import campus_wall_clock
+
+FIRST_STUDENT_ID = "U7200001A"
+SECOND_STUDENT_ID = "U7200002B"
+OWNER_ID = "S7200001O"
+
+
+@pytest.fixture
+def stall_id(database):
+    """The stall both students order from, owned by the stall owner"""
+    db = database.Session()
+    try:
+        owner = User(ntu_email="queue.owner@campuseats.com", student_id=OWNER_ID, name="Queue Owner",
+                     phone="+65 92234567", hashed_password="not-used", role=UserRole.STALL_OWNER, is_verified=True)
+        first = User(ntu_email="queue.first@campuseats.com", student_id=FIRST_STUDENT_ID, name="First Student",
+                     phone="+65 92234568", hashed_password="not-used", role=UserRole.STUDENT, is_verified=True)
+        second = User(ntu_email="queue.second@campuseats.com", student_id=SECOND_STUDENT_ID, name="Second Student",
+                      phone="+65 92234569", hashed_password="not-used", role=UserRole.STUDENT, is_verified=True)
+        db.add_all([owner, first, second])
+        db.flush()
+        stall = Stall(name="Queue Stall", location="South Spine", avg_prep_time=10, owner_id=owner.id)
+        db.add(stall)
+        db.flush()
+        db.add(MenuItem(stall_id=stall.id, name="Laksa", price=5.0, prep_time=8, is_available=True))
+        db.commit()
+        stall_id = stall.id
+    finally:
+        db.close()
+    return stall_id
+
+
+def headers_for(student_id):
+    return {"Authorization": f"Bearer {create_access_token({'sub': student_id})}"}
+
+
+def read_until_closed(url, received):
+    """Collect SSE events (name, data) from url into received until the server ends the stream"""
+    with httpx.stream("GET", url, timeout=10) as response:
+        assert response.status_code == 200
+        name = None
+        for line in response.iter_lines():
+            if line.startswith("event: "):
+                name = line[len("event: "):]
+            elif line.startswith("data: ") and name:
+                received.append((name, json.loads(line[len("data: "):])))
+
+
+def place_order(client, stall_id, student_id):
+    pickup = campus_wall_clock() + timedelta(hours=1)
+    created = client.post("/api/orders/", headers=headers_for(student_id), json={
+        "stall_id": stall_id,
+        "items": [{"menu_item_id": 1, "quantity": 1}],
+        "pickup_window_start": pickup.isoformat(),
+        "pickup_window_end": (pickup + timedelta(minutes=15)).isoformat(),
+    })
+    assert created.status_code == 200, created.text
+    return created.json()["id"]
+
+
+def serve_order(client, order_id):
+    owner = headers_for(OWNER_ID)
+    assert client.put(f"/api/orders/{order_id}/confirm-payment", json={"payment_confirmed": True}, headers=owner).status_code == 200
+    assert client.put(f"/api/orders/{order_id}/start-preparing", headers=owner).status_code == 200
+    assert client.put(f"/api/orders/{order_id}/mark-ready", headers=owner).status_code == 200
+    assert client.put(f"/api/orders/{order_id}/mark-completed", headers=owner).status_code == 200
+
+
+def test_queue_position_changes_are_pushed_to_student(live_server, stall_id):
+    base_url = live_server
+    client = httpx.Client(base_url=base_url, timeout=10)
+    try:
+        first_order = place_order(client, stall_id, FIRST_STUDENT_ID)
+        second_order = place_order(client, stall_id, SECOND_STUDENT_ID)
+
+        events_path = f"/api/queue/position/{second_order}/events"
+        assert client.get(events_path, headers=headers_for(FIRST_STUDENT_ID)).status_code == 403
+
+        token = create_access_token({"sub": SECOND_STUDENT_ID})
+        received = []
+        reader = threading.Thread(
+            target=read_until_closed, args=(f"{base_url}{events_path}?access_token={token}", received), daemon=True
+        )
+        reader.start()
+        deadline = time.time() + 5
+        while stall_event_hub.subscriber_count(stall_id) == 0 and time.time() < deadline:
+            time.sleep(0.01)
+        assert stall_event_hub.subscriber_count(stall_id) == 1
+
+        serve_order(client, first_order)
+        serve_order(client, second_order)
+
+        reader.join(timeout=5)
+        assert not reader.is_alive(), "stream should end once the order is collected"
+        assert {name for name, _ in received} == {"position"}
+        assert [(data["status"], data["queue_position"], data["orders_ahead"]) for _, data in received] == [
+            ("waiting", 2, 1),     # on connect
+            ("waiting", 2, 0),     # first order marked ready; its prep steps before that don't move us
+            ("waiting", 1, 0),     # first order collected
+            ("preparing", 1, 0),
+            ("ready", 1, 0),
+            ("collected", 1, 0),
+        ]
+        assert all(data["order_id"] == second_order for _, data in received)
+        assert received[0][1]["estimated_ready_time"] is not None
+
+        # Reconnecting after the order left the queue tells EventSource to stop
+        assert client.get(events_path, headers=headers_for(SECOND_STUDENT_ID)).status_code == 204
+    finally:
+        client.close()
@@ -0,0 +1,88 @@
+"""
+Stall rating aggregate test.
+Creating, updating and deleting reviews keeps stall_rating_stats and
+Stall.rating in step by delta, GET /api/reviews/stall/{id}/stats reads the
+aggregates without touching the reviews table, and a stall whose reviews
+predate the table is seeded from them on its next review write.
+"""
+
+import pytest
+from sqlalchemy import event
+
+from app.models.user import User, UserRole
+from app.models.stall import Stall
+from app.models.review import Review, StallRatingTotals
+from app.routes.auth import create_access_token
+
+STUDENT_IDS = ["U7910001A", "U7910002B", "U7910003C", "U7910004D"]
+
+
+@pytest.fixture
+def database(database):
+    """The test database with four students, a new stall and one with older reviews"""
+    db = database.Session()
+    try:
+        db.add_all([
+            User(ntu_email=f"rating.student{i}@campuseats.com", student_id=student_id, name=f"Student {i}",
+                 phone=f"+65 9734567{i}", hashed_password="not-used", role=UserRole.STUDENT, is_verified=True)
+            for i, student_id in enumerate(STUDENT_IDS)
+        ])
+        db.add_all([
+            Stall(name="Rated Stall", location="North Spine"),
+            Stall(name="Old Stall", location="South Spine"),
+        ])
+        db.flush()
+        # Reviews written before stall_rating_stats existed
+        db.add_all([Review(user_id=1, stall_id=2, rating=2.0), Review(user_id=2, stall_id=2, rating=4.5)])
+        db.commit()
+    finally:
+        db.close()
+    return database
+
+
+def auth(student_id):
+    return {"Authorization": f"Bearer {create_access_token({'sub': student_id})}"}
+
+
+def stall_rating(database, stall_id):
+    db = database.Session()
+    try:
+        return db.get(Stall, stall_id).rating
+    finally:
+        db.close()
+
+
+def test_rating_aggregates_follow_review_writes(client, database):
+    for student_id, rating in zip(STUDENT_IDS, [5.0, 4.0, 2.5]):
+        created = client.post("/api/reviews/", headers=auth(student_id), json={"stall_id": 1, "rating": rating})
+        assert created.status_code == 201, created.text
+    assert stall_rating(database, 1) == 3.8
+
+    statements = []
+    event.listen(database.engine, "before_cursor_execute", lambda conn, cursor, statement, *args: statements.append(statement))
+    stats = client.get("/api/reviews/stall/1/stats").json()
+    assert stats == {
+        "stall_id": 1, "average_rating": 3.8, "total_reviews": 3,
+        "rating_distribution": {"1": 0, "2": 1, "3": 0, "4": 1, "5": 1}
+    }
+    assert not any("FROM reviews" in statement for statement in statements)
+
+    updated = client.put("/api/reviews/5", headers=auth(STUDENT_IDS[2]), json={"rating": 1.0})
+    assert updated.status_code == 200, updated.text
+    assert client.delete("/api/reviews/3", headers=auth(STUDENT_IDS[0])).status_code == 204
+    stats = client.get("/api/reviews/stall/1/stats").json()
+    assert (stats["average_rating"], stats["total_reviews"]) == (2.5, 2)
+    assert stats["rating_distribution"] == {"1": 1, "2": 0, "3": 0, "4": 1, "5": 0}
+    assert stall_rating(database, 1) == 2.5
+
+    # The old stall is seeded from its reviews on the next write
+    created = client.post("/api/reviews/", headers=auth(STUDENT_IDS[3]), json={"stall_id": 2, "rating": 3.0})
+    assert created.status_code == 201, created.text
+    db = database.Session()
+    try:
+        totals = db.get(StallRatingTotals, 2)
+        assert (totals.review_count, totals.rating_sum) == (3, 9.5)
+        assert [totals.stars_2, totals.stars_3, totals.stars_4] == [1, 1, 1]
+    finally:
+        db.close()
+    assert stall_rating(database, 2) == 3.2
@@ -0,0 +1,76 @@
+"""
+Read-replica routing test.
+Binds the primary and the replica sessions to two different SQLite files and
+checks that read-only endpoints are answered from the replica while writes
+land on the primary, and that the menu cache is only filled from the primary.
+"""
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models.user import User, UserRole
+from app.models.stall import Stall
+from app.models.menu import MenuItem
+from app.routes.auth import create_access_token
+from app.services.menu_cache import menu_cache
+
+OWNER_ID = "S7000001R"
+
+
+def seed(database, stall_name):
+    """One owner and one stall named stall_name"""
+    db = database.Session()
+    try:
+        owner = User(
+            ntu_email="replica.owner@campuseats.com",
+            student_id=OWNER_ID,
+            name="Replica Owner",
+            phone="+65 91234567",
+            hashed_password="not-used",
+            role=UserRole.STALL_OWNER,
+            is_verified=True
+        )
+        db.add(owner)
+        db.flush()
+        db.add(Stall(name=stall_name, location="North Spine", latitude=1.347, longitude=103.68, owner_id=owner.id))
+        db.commit()
+    finally:
+        db.close()
+    return database
+
+
+def test_reads_use_replica_and_writes_use_primary(make_database):
+    primary = seed(make_database("primary"), "Primary Stall")
+    replica = seed(make_database("replica"), "Replica Stall")
+    primary.serve_writes()
+    replica.serve_reads()
+    client = TestClient(app)
+
+    assert client.get("/api/stalls/").json()[0]["name"] == "Replica Stall"
+    assert client.get("/api/stalls/1").json()["name"] == "Replica Stall"
+    nearby = client.get("/api/stalls/nearby", params={"lat": 1.347, "lng": 103.68})
+    assert nearby.status_code == 200, nearby.text
+    assert [stall["name"] for stall in nearby.json()] == ["Replica Stall"]
+    assert client.get("/api/reviews/stall/1/stats").json()["total_reviews"] == 0
+
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': OWNER_ID})}"}
+    updated = client.put("/api/stalls/1", json={"description": "Now serving breakfast"}, headers=headers)
+    assert updated.status_code == 200, updated.text
+
+    db = primary.Session()
+    try:
+        assert db.query(Stall).filter(Stall.id == 1).first().description == "Now serving breakfast"
+    finally:
+        db.close()
+    # The replica has not caught up, so reads from it still see the old row
+    assert client.get("/api/stalls/1").json()["description"] is None
+
+    # A menu item the replica has not seen yet still makes it into the cache
+    db = primary.Session()
+    try:
+        db.add(MenuItem(stall_id=1, name="Kaya Toast", price=2.0, is_available=True))
+        db.commit()
+    finally:
+        db.close()
+    menu_cache.reset()
+    assert [item["name"] for item in client.get("/api/menu/stall/1").json()] == ["Kaya Toast"]
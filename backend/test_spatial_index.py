@@ -0,0 +1,65 @@
+"""
+Stall spatial index test.
+k-nearest and radius lookups match a brute-force scan over every stall,
+and a nearest lookup only computes distances for stalls in the rings it
+expands, not for the whole grid.
+"""
+
+import random
+
+from app.services import spatial_index
+from app.services.spatial_index import StallSpatialIndex, _haversine_km
+
+CAMPUS_LAT, CAMPUS_LNG = 1.3483, 103.6831
+
+
+def make_index(count, spread_deg, seed):
+    rng = random.Random(seed)
+    index = StallSpatialIndex()
+    points = {}
+    for stall_id in range(1, count + 1):
+        lat = CAMPUS_LAT + rng.uniform(-spread_deg, spread_deg)
+        lng = CAMPUS_LNG + rng.uniform(-spread_deg, spread_deg)
+        index.upsert(stall_id, lat, lng)
+        points[stall_id] = (lat, lng)
+    return index, points
+
+
+def brute_force(points, lat, lng):
+    return sorted((_haversine_km(lat, lng, p_lat, p_lng), stall_id) for stall_id, (p_lat, p_lng) in points.items())
+
+
+def test_lookups_match_brute_force():
+    index, points = make_index(300, 0.05, seed=7)
+    # Move and remove a few stalls so the grid has been edited in place
+    for stall_id in (3, 30, 300):
+        index.remove(stall_id)
+        points.pop(stall_id)
+    index.upsert(42, CAMPUS_LAT + 0.001, CAMPUS_LNG - 0.002)
+    points[42] = (CAMPUS_LAT + 0.001, CAMPUS_LNG - 0.002)
+
+    rng = random.Random(11)
+    queries = [(CAMPUS_LAT, CAMPUS_LNG), (CAMPUS_LAT + 0.3, CAMPUS_LNG - 0.2)]  # inside and far outside the grid
+    queries += [(CAMPUS_LAT + rng.uniform(-0.06, 0.06), CAMPUS_LNG + rng.uniform(-0.06, 0.06)) for _ in range(20)]
+    for lat, lng in queries:
+        expected = brute_force(points, lat, lng)
+        assert list(index.iter_nearest(lat, lng)) == expected
+        for k in (1, 5, 40):
+            assert index.nearest(lat, lng, k) == expected[:k]
+        for radius_km in (0.3, 1.0, 4.0):
+            assert index.within_radius(lat, lng, radius_km) == [item for item in expected if item[0] <= radius_km]
+
+
+def test_nearest_stops_expanding_early(monkeypatch):
+    index, points = make_index(2000, 0.2, seed=3)
+    computed = []
+
+    def counting_haversine(*args):
+        computed.append(args)
+        return _haversine_km(*args)
+
+    monkeypatch.setattr(spatial_index, "_haversine_km", counting_haversine)
+    result = index.nearest(CAMPUS_LAT, CAMPUS_LNG, 3)
+
+    assert result == brute_force(points, CAMPUS_LAT, CAMPUS_LNG)[:3]
+    assert len(computed) < len(points) // 20
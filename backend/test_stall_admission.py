@@ -0,0 +1,171 @@
+"""
+Admission control test.
+A stall with max_concurrent_orders=2 takes two orders; the third checkout
+is rejected with 409 and offered the next pickup window the stall can meet,
+without querying queue_entries. Once an order leaves the queue a slot opens
+again, and concurrent checkouts never push a stall past its cap. Orders
+whose payment is rejected or never confirmed give their place back, and
+admin status changes move the queue like the stall owner's do.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app.models.user import User, UserRole
+from app.models.stall import Stall
+from app.models.menu import MenuItem
+from app.models.order import Order
+from app.models.queue import QueueEntry
+from app.routes.orders import expire_unpaid_orders
+from app.routes.auth import create_access_token
+from app.services.admission import stall_admission
+from app.services.prep_times import prep_time_model
+from app.services.queue_index import stall_queue_index
+from app.utils.campus_time import campus_wall_clock
+
+STUDENT_IDS = [f"U76000{i:02d}A" for i in range(8)]
+ADMIN_ID = "A7600001A"
+
+
+@pytest.fixture
+def capacity():
+    return 2
+
+
+@pytest.fixture
+def database(database, capacity):
+    """The test database with eight students, an admin and a stall capped at capacity orders"""
+    db = database.Session()
+    try:
+        students = [
+            User(ntu_email=f"admission.student{i}@campuseats.com", student_id=student_id, name=f"Student {i}",
+                 phone=f"+65 9623456{i}", hashed_password="not-used", role=UserRole.STUDENT, is_verified=True)
+            for i, student_id in enumerate(STUDENT_IDS)
+        ]
+        db.add_all(students)
+        db.add(User(ntu_email="admission.admin@campuseats.com", student_id=ADMIN_ID, name="Admin",
+                    phone="+65 96234599", hashed_password="not-used", role=UserRole.ADMIN, is_verified=True))
+        db.flush()
+        stall = Stall(name="Busy Stall", location="North Spine", avg_prep_time=10, max_concurrent_orders=capacity)
+        db.add(stall)
+        db.flush()
+        db.add(MenuItem(stall_id=stall.id, name="Nasi Lemak", price=4.0, prep_time=6, is_available=True))
+        db.commit()
+    finally:
+        db.close()
+    return database
+
+
+@pytest.fixture
+def statements(database):
+    """Statements touching queue_entries"""
+    statements = []
+    event.listen(
+        database.engine, "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement) if "queue_entries" in statement else None
+    )
+    return statements
+
+
+def headers_for(student_id):
+    return {"Authorization": f"Bearer {create_access_token({'sub': student_id})}"}
+
+
+def place_order(client, student_id):
+    pickup = campus_wall_clock() + timedelta(minutes=30)
+    return client.post("/api/orders/", headers=headers_for(student_id), json={
+        "stall_id": 1,
+        "items": [{"menu_item_id": 1, "quantity": 1}],
+        "pickup_window_start": pickup.isoformat(),
+        "pickup_window_end": (pickup + timedelta(minutes=15)).isoformat(),
+    })
+
+
+def test_full_stall_rejects_with_next_window(client, statements):
+    first = place_order(client, STUDENT_IDS[0])
+    assert first.status_code == 200, first.text
+    assert place_order(client, STUDENT_IDS[1]).status_code == 200
+
+    statements.clear()
+    rejected = place_order(client, STUDENT_IDS[2])
+    assert rejected.status_code == 409, rejected.text
+    assert statements == [], f"admission queried queue_entries: {statements}"
+    assert "at capacity" in rejected.json()["detail"]
+
+    # A slot frees once the first 6-minute order is done; this one takes 6 more
+    assert rejected.headers["Retry-After"] == "360"
+    window_start = datetime.fromisoformat(rejected.headers["X-Next-Pickup-Window-Start"])
+    window_end = datetime.fromisoformat(rejected.headers["X-Next-Pickup-Window-End"])
+    assert timedelta(minutes=11) < window_start - campus_wall_clock() <= timedelta(minutes=12)
+    assert window_end - window_start == timedelta(minutes=15)
+
+    # Cancelling frees the slot
+    assert client.delete(f"/api/orders/{first.json()['id']}", headers=headers_for(STUDENT_IDS[0])).status_code == 200
+    assert place_order(client, STUDENT_IDS[2]).status_code == 200
+
+
+@pytest.mark.parametrize("capacity", [3])
+def test_concurrent_checkouts_respect_capacity(client):
+    with ThreadPoolExecutor(max_workers=len(STUDENT_IDS)) as pool:
+        statuses = sorted(pool.map(lambda student_id: place_order(client, student_id).status_code, STUDENT_IDS))
+    assert statuses == [200] * 3 + [409] * (len(STUDENT_IDS) - 3)
+    assert stall_admission.in_flight(1) == 3
+
+
+def test_unpaid_orders_release_capacity(client, database):
+    rejected = place_order(client, STUDENT_IDS[0]).json()["id"]
+    unpaid = place_order(client, STUDENT_IDS[1]).json()["id"]
+    assert place_order(client, STUDENT_IDS[2]).status_code == 409
+
+    # Rejecting payment cancels the order and takes it out of the queue
+    response = client.put(f"/api/orders/{rejected}/confirm-payment", headers=headers_for(ADMIN_ID),
+                          json={"payment_confirmed": False})
+    assert response.status_code == 200, response.text
+    assert client.get("/api/queue/1").json()["current_queue_length"] == 1
+    assert place_order(client, STUDENT_IDS[2]).status_code == 200
+    assert place_order(client, STUDENT_IDS[3]).status_code == 409
+
+    # An order nobody confirms is cancelled once the payment timeout passes
+    db = database.Session()
+    try:
+        db.query(Order).filter(Order.id == unpaid).update({Order.created_at: datetime.utcnow() - timedelta(minutes=31)})
+        db.commit()
+        assert expire_unpaid_orders(db, timeout_minutes=30) == [unpaid]
+        assert expire_unpaid_orders(db, timeout_minutes=30) == []
+    finally:
+        db.close()
+    assert client.get(f"/api/orders/{unpaid}", headers=headers_for(STUDENT_IDS[1])).json()["status"] == "cancelled"
+    assert client.get("/api/queue/1").json()["current_queue_length"] == 1
+    assert place_order(client, STUDENT_IDS[3]).status_code == 200
+
+
+def test_admin_status_changes_move_the_queue(client, database):
+    cancelled = place_order(client, STUDENT_IDS[0]).json()["id"]
+    ready = place_order(client, STUDENT_IDS[1]).json()["id"]
+
+    def set_status(order_id, status):
+        response = client.put(f"/api/admin/orders/{order_id}/status", headers=headers_for(ADMIN_ID),
+                              json={"status": status})
+        assert response.status_code == 200, response.text
+
+    set_status(cancelled, "cancelled")
+    assert stall_queue_index.get(cancelled) is None
+    assert place_order(client, STUDENT_IDS[2]).status_code == 200
+
+    # The order took 20 minutes against a 10-minute seed, and the model learns from it
+    db = database.Session()
+    try:
+        db.query(QueueEntry).filter(QueueEntry.order_id == ready).update(
+            {QueueEntry.joined_at: datetime.utcnow() - timedelta(minutes=20)}
+        )
+        db.commit()
+    finally:
+        db.close()
+    set_status(ready, "ready")
+    assert prep_time_model.stall_minutes(1) > 10
+    set_status(ready, "completed")
+    assert stall_queue_index.get(ready) is None
+    assert place_order(client, STUDENT_IDS[3]).status_code == 200